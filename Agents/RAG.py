@@ -1,19 +1,253 @@
-from langchain.document_loaders import DirectoryLoader
-from langchain_community.document_loaders import PyPDFLoader
-from Utilities.Tools import create_vector_db, create_chunks
+import glob
+import hashlib
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfReader
+from langchain_core.documents import Document
+from Utilities import metrics
+from Utilities.Tools import open_vector_db, create_chunks, upsert_documents, delete_documents, chunker_version, resolve_backend, EMBEDDING_MODEL
 
 PDF_PATH = 'PDF/'
+CHROMA_PATH = 'Chroma/'
+COLLECTION_NAME = 'Document_Vector'
+PAGES_PER_TASK = 16
+PAGE_BATCH_SIZE = 64
+
+def batched(iterable, size):
+    """Yield lists of at most size items."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _extract_pages(path, start, end):
+    """
+    Worker: page count of one PDF and the text of its pages [start, end),
+    from a single parse. An unreadable PDF counts as 0 pages.
+    """
+    try:
+        reader = PdfReader(path)
+        count = len(reader.pages)
+    except Exception as e:
+        print(f"Skipping unreadable PDF {path}: {e}")
+        return 0, []
+    return count, [(number, reader.pages[number].extract_text() or '') for number in range(start, min(end, count))]
+
+def iter_pdf_pages(paths, max_workers=None, pages_per_task=PAGES_PER_TASK, start_pages=None, on_count=None):
+    """
+    Yield one Document per PDF page, in file and page order.
+    Page ranges are parsed on a process pool and only a bounded window of
+    ranges is in flight, so memory does not grow with the corpus size.
+    A file's page count comes back with its first range, so no PDF is opened
+    just to count pages; on_count(path, count) is called when it is known.
+    start_pages maps a path to the first page to read (for resuming).
+    """
+    workers = max_workers or os.cpu_count() or 1
+    start_pages = start_pages or {}
+    remaining = iter(paths)
+    files = deque()  # [path, next page to submit, page count or None, futures] in file order
+    in_flight = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def fill():
+            # Earlier files come first; a file's later ranges wait for its page count.
+            nonlocal in_flight
+            position = 0
+            while in_flight < workers * 2:
+                if position == len(files):
+                    path = next(remaining, None)
+                    if path is None:
+                        return
+                    files.append([path, start_pages.get(path, 0), None, deque()])
+                state = files[position]
+                path, start, count, futures = state
+                if (count is None and futures) or (count is not None and start >= count):
+                    position += 1
+                    continue
+                futures.append(pool.submit(_extract_pages, path, start, start + pages_per_task))
+                state[1] = start + pages_per_task
+                in_flight += 1
+
+        fill()
+        while files:
+            state = files[0]
+            if not state[3]:
+                # Every range of this file has been read.
+                files.popleft()
+                fill()
+                continue
+            count, pages = state[3].popleft().result()
+            in_flight -= 1
+            if state[2] is None:
+                state[2] = count
+                if on_count is not None:
+                    on_count(state[0], count)
+            fill()
+            for number, text in pages:
+                yield Document(page_content=text, metadata={"source": state[0], "page": number})
 
 def load_pdf(path: str):
     """Load all PDFs from a directory."""
-    loader = DirectoryLoader(path, glob="*.pdf", loader_cls=PyPDFLoader)
-    return loader.load()
+    paths = sorted(glob.glob(os.path.join(path, "*.pdf")))
+    return list(iter_pdf_pages(paths))
+
+def file_hash(path: str) -> str:
+    """Return the SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def manifest_path(chroma_path: str, collection_name: str) -> str:
+    return os.path.join(chroma_path, f'{collection_name}.manifest.json')
+
+def load_manifest(path: str) -> dict:
+    """Read the ingestion manifest, or return an empty one."""
+    if not os.path.exists(path):
+        return {"version": None, "files": {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(path: str, manifest: dict):
+    """Atomically write the ingestion manifest."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def document_RAG(pdf_path: str = PDF_PATH, chroma_path: str = CHROMA_PATH, collection_name: str = COLLECTION_NAME,
+                 max_workers=None, batch_size=PAGE_BATCH_SIZE, progress=None):
+    """
+    Incrementally sync the vector DB with the PDFs in pdf_path.
+    Only new or changed files are loaded, chunked and embedded; vectors of removed
+    files are deleted. Files are tracked by content hash together with the chunker
+    and embedding-model versions, so a version bump re-ingests everything.
+    Pages stream from a process pool and are chunked and embedded batch_size
+    pages at a time. Progress inside a file is checkpointed after every batch,
+    so an interrupted run resumes after the last committed batch.
+    progress, if given, is called as progress(pages_done, pages_total).
+    """
+    with metrics.trace("ingest_pdf"):
+        return _sync_documents(pdf_path, chroma_path, collection_name, max_workers, batch_size, progress)
+
+def _sync_documents(pdf_path, chroma_path, collection_name, max_workers, batch_size, progress):
+    version = {"chunker": chunker_version(), "embedding": EMBEDDING_MODEL,
+               "backend": resolve_backend(chroma_path, collection_name)}
+    path = manifest_path(chroma_path, collection_name)
+    manifest = load_manifest(path)
+    same_version = manifest.get("version") == version
+    previous = manifest.get("files", {})
+    previous_partial = manifest.get("partial", {})
+
+    current = {}
+    if os.path.isdir(pdf_path):
+        for name in sorted(os.listdir(pdf_path)):
+            if name.lower().endswith('.pdf'):
+                current[name] = file_hash(os.path.join(pdf_path, name))
+
+    files = {
+        name: entry for name, entry in previous.items()
+        if same_version and current.get(name) == entry["hash"]
+    }
+    partial = {
+        name: entry for name, entry in previous_partial.items()
+        if same_version and name not in files and current.get(name) == entry["hash"]
+    }
+    kept_ids = {
+        chunk_id for entries in (files, partial) for entry in entries.values() for chunk_id in entry["ids"]
+    }
+    stale_ids = [
+        chunk_id for entries in (previous, previous_partial) for name, entry in entries.items()
+        if name not in files and name not in partial
+        for chunk_id in entry["ids"] if chunk_id not in kept_ids
+    ]
+
+    db = open_vector_db(chroma_path, collection_name)
+    if stale_ids:
+        delete_documents(db, stale_ids)
+    manifest = {"version": version, "files": files, "partial": partial}
+    save_manifest(path, manifest)
+
+    known_hashes = {entry["hash"]: entry["ids"] for entry in files.values()}
+    to_load, aliases = {}, {}
+    for name, digest in current.items():
+        if name in files:
+            continue
+        if digest in known_hashes or digest in to_load.values():
+            # Identical content under another name is embedded only once.
+            aliases[name] = digest
+        else:
+            to_load[name] = digest
+
+    def finish(name):
+        files[name] = {"hash": to_load[name], "ids": pending_ids.pop(name, [])}
+        partial.pop(name, None)
+        known_hashes[to_load[name]] = files[name]["ids"]
+        save_manifest(path, manifest)
+
+    # A file enters "files" only once all of its pages are embedded; until then
+    # "partial" records the next page and the ids written so far. After a crash
+    # at most one batch is redone, and stable ids make that upsert idempotent.
+    pending_ids = {name: list(partial[name]["ids"]) for name in to_load if name in partial}
+    counters = {name: len(ids) for name, ids in pending_ids.items()}
+    start_pages = {os.path.join(pdf_path, name): partial[name]["next_page"] for name in pending_ids}
+    current_file = None
+    paths = [os.path.join(pdf_path, name) for name in to_load]
+    done = total = 0
+
+    def counted(page_path, count):
+        # The total grows as the workers report each file's page count.
+        nonlocal total
+        total += max(0, count - start_pages.get(page_path, 0))
+        progress(done, total)
+
+    if progress is not None:
+        progress(done, total)
+    pages_iter = iter_pdf_pages(paths, max_workers=max_workers, start_pages=start_pages,
+                                on_count=counted if progress is not None else None)
+    for pages in metrics.timed_iter(batched(pages_iter, batch_size), "load"):
+        metrics.count("pages", len(pages))
+        chunks = create_chunks(pages, metadata=True)
+        ids = []
+        for chunk in chunks:
+            name = os.path.basename(chunk.metadata["source"])
+            index = counters.get(name, 0)
+            counters[name] = index + 1
+            chunk.metadata["chunk_id"] = index
+            chunk.metadata["source_type"] = "pdf"
+            ids.append(f"{to_load[name]}-{index}")
+            pending_ids.setdefault(name, []).append(ids[-1])
+        if chunks:
+            upsert_documents(db, chunks, ids=ids)
+        for page in pages:
+            name = os.path.basename(page.metadata["source"])
+            if current_file is not None and name != current_file:
+                finish(current_file)
+            current_file = name
+            partial[name] = {
+                "hash": to_load[name], "next_page": page.metadata["page"] + 1, "ids": pending_ids.get(name, [])
+            }
+        save_manifest(path, manifest)
+        if progress is not None:
+            done += len(pages)
+            progress(done, total)
+    if current_file is not None:
+        finish(current_file)
+    for name in to_load:
+        if name not in files:
+            finish(name)
+    for name, digest in aliases.items():
+        files[name] = {"hash": digest, "ids": known_hashes[digest]}
+    save_manifest(path, manifest)
 
-def document_RAG():
-    """Create a vector DB from PDF documents."""
-    pages = load_pdf(PDF_PATH)
-    if not pages:
+    if not current:
         return "No PDF documents found."
-    chunks = create_chunks(pages, metadata=True)
-    db = create_vector_db(chunks, CHROMA_PATH='Chroma/', collection_name='Document_Vector')
     return db
@@ -1,22 +1,104 @@
-from langchain.document_loaders import WebBaseLoader
-from Utilities.Tools import create_vector_db, create_chunks
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+import requests
+from bs4 import BeautifulSoup
+from langchain_core.documents import Document
+from Utilities import metrics
+from Utilities.Tools import open_vector_db, delete_documents, http_session, source_vector_ids, sync_sources
+
+CHROMA_PATH = 'Chroma/'
+COLLECTION_NAME = 'URL_Vector'
+EMBED_BATCH_SIZE = 64
+
+class URLFetcher:
+    """
+    Bounded thread-pool fetcher.
+    Connections are pooled in one requests.Session, every request has a timeout
+    and at most per_host requests run against the same host at once.
+    """
+
+    def __init__(self, max_workers=8, per_host=2, timeout=15):
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.session = http_session(max_workers)
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.Semaphore(self.per_host)
+            return self._hosts[host]
+
+    def fetch(self, url):
+        """Fetch one URL and return a cleaned Document, or None on failure."""
+        try:
+            with self._host_slot(url):
+                response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"Failed to fetch {url}: {e}")
+            return None
+        soup = BeautifulSoup(response.text, "html.parser")
+        for tag in soup(["script", "style", "noscript"]):
+            tag.decompose()
+        title = soup.title.get_text(strip=True) if soup.title else url
+        return Document(
+            page_content=preprocess(soup.get_text(" ")),
+            metadata={"source": url, "title": title, "source_type": "url"}
+        )
+
+    def fetch_all(self, urls):
+        """Yield Documents in completion order while remaining fetches continue."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self.fetch, url) for url in urls]
+            for future in as_completed(futures):
+                doc = future.result()
+                if doc is not None and doc.page_content:
+                    yield doc
 
 def process_url(url: str):
     """Load and return documents from a URL."""
-    loader = WebBaseLoader(url, show_progress=True, continue_on_failure=True)
-    return loader.load()
+    doc = URLFetcher(max_workers=1).fetch(url)
+    return [doc] if doc is not None else []
 
 def preprocess(text: str) -> str:
     """Remove excessive whitespace and line breaks."""
     return ' '.join(text.replace('\n', ' ').split())
 
-def url_RAG(url: str):
-    """Create a vector DB from web page content."""
-    docs = process_url(url)
-    if not docs:
-        return "No content loaded from URL."
-    raw_text = ' '.join([doc.page_content for doc in docs])
-    cleaned = preprocess(raw_text)
-    chunks = create_chunks(cleaned, metadata=False)
-    db = create_vector_db(chunks, 'Chroma/', 'URL_Vector')
+def remove_url_vectors(urls, chroma_path: str = CHROMA_PATH, collection_name: str = COLLECTION_NAME):
+    """Delete the stored chunks of the given URLs."""
+    db = open_vector_db(chroma_path, collection_name)
+    stale = [chunk_id for url in urls for chunk_id in source_vector_ids(db, url)]
+    if stale:
+        delete_documents(db, stale)
     return db
+
+def url_RAG(urls, chroma_path: str = CHROMA_PATH, collection_name: str = COLLECTION_NAME):
+    """
+    Create or update a vector DB from one or more web pages.
+    Pages are fetched concurrently; each finished page is cleaned and chunked
+    while the others are still downloading, and chunks are embedded in batches.
+    Every chunk keeps its source URL, and re-processing a URL replaces its chunks.
+    """
+    with metrics.trace("ingest_url"):
+        if isinstance(urls, str):
+            urls = [urls]
+        db = open_vector_db(chroma_path, collection_name)
+        if not sync_urls(urls, db):
+            return "No content loaded from URL."
+        return db
+
+def sync_urls(urls, db, max_workers=8, batch_size=EMBED_BATCH_SIZE, on_commit=None):
+    """
+    Fetches, chunks and upserts URLs in embedding batches, replacing any chunks
+    previously stored for the same URL. on_commit(committed) is called after
+    each batch with {url: chunk count} of the URLs it committed. Returns the
+    number of URLs stored.
+    """
+    fetcher = URLFetcher(max_workers=max_workers)
+    pages = metrics.timed_iter(fetcher.fetch_all(list(dict.fromkeys(urls))), "load")
+    return sync_sources(([doc] for doc in pages), db, batch_size=batch_size, on_commit=on_commit)
@@ -1,38 +1,286 @@
-from langchain.utilities import WikipediaAPIWrapper
-from Utilities.Tools import LLM, create_vector_db, create_chunks
-from langchain.memory import ConversationSummaryBufferMemory
-
-# Set up LLM and memory
-llm = LLM().model()
-memory = ConversationSummaryBufferMemory(
-    llm=llm,
-    max_token_limit=5000,
-    return_messages=True,
-    memory_key="history"
-)
-
-# Configure Wikipedia wrapper
-wiki = WikipediaAPIWrapper(
-    wiki_client=None,
-    lang="en",
-    top_k_results=1,
-    load_all_available_meta=True,
-    doc_content_chars_max=10000
-)
+import bz2
+import gzip
+import html
+import json
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote
+import requests
+from langchain_core.documents import Document
+from Utilities import metrics
+from Utilities.Tools import open_vector_db, http_session, sync_sources
+
+CHROMA_PATH = 'Chroma/'
+COLLECTION_NAME = 'Wiki_Vector'
+EMBED_BATCH_SIZE = 64
+WIKI_LANG = os.getenv("WORDSMITH_WIKI_LANG", "en")
+WIKI_TOP_K = int(os.getenv("WORDSMITH_WIKI_TOP_K", "3"))
+LEAD_SECTION = "Introduction"
+
+SECTION_HEADING = re.compile(r"^(={2,6})\s*(.+?)\s*\1\s*$", re.MULTILINE)
+COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+REFERENCE = re.compile(r"<ref[^>/]*/>|<ref[^>]*>.*?</ref>", re.DOTALL | re.IGNORECASE)
+TEMPLATE = re.compile(r"\{\{[^{}]*\}\}")
+TABLE = re.compile(r"\{\|(?:(?!\{\|).)*?\|\}", re.DOTALL)
+LINK = re.compile(r"\[\[([^\[\]]*)\]\]")
+EXTERNAL_LINK = re.compile(r"\[(?:https?:)?//[^\s\]]+\s*([^\]]*)\]")
+EMPHASIS = re.compile(r"'{2,5}")
+TAG = re.compile(r"<[^>]+>")
+EXTRA_BLANK_LINES = re.compile(r"\n{3,}")
+DROPPED_LINKS = ("file:", "image:", "category:")
+
+
+def article_url(title, lang=WIKI_LANG):
+    return f"https://{lang}.wikipedia.org/wiki/{quote(title.replace(' ', '_'))}"
+
+
+def _strip_repeatedly(pattern, replacement, text):
+    # Nested markup ({{a|{{b}}}}) is removed from the inside out.
+    previous = None
+    while previous != text:
+        previous, text = text, pattern.sub(replacement, text)
+    return text
+
+
+def _link_text(match):
+    target, _, label = match.group(1).partition("|")
+    if target.strip().lower().startswith(DROPPED_LINKS):
+        return ""
+    return label or target
+
+
+def clean_wikitext(text):
+    """Plain text from wikitext, keeping == Section == headings."""
+    text = COMMENT.sub("", text)
+    text = REFERENCE.sub("", text)
+    text = _strip_repeatedly(TEMPLATE, "", text)
+    text = _strip_repeatedly(TABLE, "", text)
+    text = _strip_repeatedly(LINK, _link_text, text)
+    text = EXTERNAL_LINK.sub(r"\1", text)
+    text = EMPHASIS.sub("", text)
+    text = html.unescape(TAG.sub("", text))
+    return EXTRA_BLANK_LINES.sub("\n\n", text).strip()
+
+
+def article_sections(title, text, source=None):
+    """
+    Splits a plain-text article on its == Section == headings into one Document
+    per non-empty section. Nested sections are named by their path
+    ("History > Early life"), and each Document starts with a Markdown heading
+    so the structure-aware chunker keeps sections apart.
+    """
+    source = source or article_url(title)
+    path = []
+    sections = []
+    position, name = 0, LEAD_SECTION
+    for match in SECTION_HEADING.finditer(text):
+        sections.append((name, text[position:match.start()]))
+        level = len(match.group(1)) - 1
+        path = path[:level - 1] + [match.group(2).strip()]
+        name = " > ".join(path)
+        position = match.end()
+    sections.append((name, text[position:]))
+
+    documents = []
+    for name, body in sections:
+        body = body.strip()
+        if not body:
+            continue
+        heading = f"# {title}" if name == LEAD_SECTION else f"## {title}: {name}"
+        documents.append(Document(
+            page_content=f"{heading}\n\n{body}",
+            metadata={"source": source, "title": title, "section": name, "source_type": "wiki"}
+        ))
+    return documents
+
+
+class WikipediaClient:
+    """
+    Searches Wikipedia and fetches full plain-text articles through the
+    MediaWiki API. Articles are fetched concurrently over one pooled
+    requests.Session, and every request has a timeout.
+    """
+
+    def __init__(self, lang=WIKI_LANG, max_workers=4, timeout=15, api_url=None):
+        self.lang = lang
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.api_url = api_url or os.getenv("WORDSMITH_WIKI_API", f"https://{lang}.wikipedia.org/w/api.php")
+        self.session = http_session(max_workers)
+
+    def _query(self, **params):
+        params.update(action="query", format="json", formatversion=2)
+        response = self.session.get(self.api_url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json().get("query", {})
+
+    def search(self, topic, k=WIKI_TOP_K):
+        """Titles of the k articles most related to topic."""
+        result = self._query(list="search", srsearch=topic, srlimit=k, srprop="")
+        return [hit["title"] for hit in result.get("search", [])]
+
+    def fetch(self, title):
+        """Full text of one article as section Documents, or [] on failure."""
+        try:
+            result = self._query(prop="extracts|info", inprop="url", explaintext=1,
+                                 exsectionformat="wiki", redirects=1, titles=title)
+        except (requests.RequestException, ValueError) as e:
+            print(f"Failed to fetch Wikipedia article {title}: {e}")
+            return []
+        pages = [page for page in result.get("pages", []) if not page.get("missing")]
+        if not pages or not pages[0].get("extract"):
+            return []
+        page = pages[0]
+        return article_sections(page["title"], page["extract"], page.get("fullurl") or article_url(page["title"], self.lang))
+
+    def fetch_all(self, titles):
+        """Yield each article's section Documents in completion order."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self.fetch, title) for title in titles]
+            for future in as_completed(futures):
+                sections = future.result()
+                if sections:
+                    yield sections
+
+    def related(self, topic, k=WIKI_TOP_K):
+        """Search for topic and fetch the top k articles concurrently."""
+        return self.fetch_all(self.search(topic, k))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_wiki_client():
+    """Configure the Wikipedia client on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = WikipediaClient()
+    return _client
+
+
+def _open_dump(path):
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _iter_xml_dump(path):
+    with _open_dump(path) as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event != "end" or _local_name(elem.tag) != "page":
+                continue
+            fields = {_local_name(child.tag): child for child in elem.iter()}
+            namespace = fields.get("ns")
+            text = fields.get("text")
+            if "redirect" not in fields and text is not None and text.text \
+                    and (namespace is None or namespace.text == "0"):
+                yield fields["title"].text, clean_wikitext(text.text), None
+            # Pages are dropped once read, so memory stays flat on multi-GB dumps.
+            root.clear()
+
+
+def _iter_jsonl_dump(path):
+    with _open_dump(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if record.get("title") and record.get("text"):
+                    yield record["title"], record["text"], record.get("url")
+
+
+def iter_dump(path, titles=None, limit=None):
+    """
+    Streams articles from a local Wikipedia dump as lists of section Documents.
+    Reads MediaWiki XML exports (.xml, optionally .bz2/.gz compressed) or JSONL
+    with one {"title", "text"[, "url"]} object per line. Redirects and non-article
+    namespaces are skipped. titles restricts the dump to those articles
+    (case-insensitive); limit stops after that many articles.
+    """
+    is_jsonl = ".json" in os.path.basename(path)
+    records = _iter_jsonl_dump(path) if is_jsonl else _iter_xml_dump(path)
+    wanted = {title.lower() for title in titles} if titles else None
+    produced = 0
+    for title, text, url in records:
+        if wanted is not None and title.lower() not in wanted:
+            continue
+        sections = article_sections(title, text, url)
+        if not sections:
+            continue
+        yield sections
+        produced += 1
+        if limit and produced >= limit:
+            return
+
+
+def sync_articles(articles, db, batch_size=EMBED_BATCH_SIZE, on_commit=None):
+    """
+    Chunks and upserts articles (lists of section Documents) in embedding
+    batches, replacing any chunks previously stored for the same article.
+    on_commit(count) is called after each batch with the number of articles
+    committed so far. Returns the number of articles stored.
+    """
+    stored = 0
+
+    def committed(batch_sources):
+        nonlocal stored
+        stored += len(batch_sources)
+        if on_commit:
+            on_commit(stored)
+
+    return sync_sources(articles, db, batch_size=batch_size, on_commit=committed)
+
 
 def get_wiki_summary(topic: str) -> str:
-    """Fetch a summary from Wikipedia for a given topic."""
+    """Fetch the full text of the Wikipedia article that best matches a topic."""
     try:
-        result = wiki.run(topic)
-        return result['content']
+        client = get_wiki_client()
+        titles = client.search(topic, k=1)
+        sections = client.fetch(titles[0]) if titles else []
+        return "\n\n".join(section.page_content for section in sections)
     except Exception as e:
         return f"Error fetching summary: {e}"
 
-def create_wiki_db(topic: str):
-    """Create a vector DB from Wikipedia content."""
-    content = get_wiki_summary(topic)
-    if not content:
-        return "No content retrieved from Wikipedia."
-    chunks = create_chunks(content, metadata=False)
-    db = create_vector_db(chunks, 'Chroma/', 'Wiki_Vector')
-    return db
+
+def create_wiki_db(topic: str, chroma_path: str = CHROMA_PATH, collection_name: str = COLLECTION_NAME,
+                   top_k: int = WIKI_TOP_K):
+    """
+    Create or update a vector DB from the top_k Wikipedia articles related to a topic.
+    Articles are fetched concurrently and keep their full text; every chunk
+    records its article title and section.
+    """
+    with metrics.trace("ingest_wiki"):
+        try:
+            articles = metrics.timed_iter(get_wiki_client().related(topic, top_k), "load")
+            db = open_vector_db(chroma_path, collection_name)
+            if not sync_articles(articles, db):
+                return "No content retrieved from Wikipedia."
+            return db
+        except requests.RequestException as e:
+            return f"Error fetching from Wikipedia: {e}"
+
+
+def wiki_dump_RAG(dump_path: str, chroma_path: str = CHROMA_PATH, collection_name: str = COLLECTION_NAME,
+                  titles=None, limit=None):
+    """
+    Create or update a vector DB from a local Wikipedia dump (see iter_dump),
+    without network access. The dump is parsed as a stream.
+    """
+    with metrics.trace("ingest_wiki"):
+        db = open_vector_db(chroma_path, collection_name)
+        articles = metrics.timed_iter(iter_dump(dump_path, titles=titles, limit=limit), "load")
+        if not sync_articles(articles, db):
+            return "No articles found in the Wikipedia dump."
+        return db
@@ -1,34 +1,71 @@
+import threading
+from Utilities import metrics
 from Utilities.Tools import LLM
-from langchain.memory import ConversationSummaryBufferMemory
-from langchain.prompts import PromptTemplate
-from langchain.chains.llm import LLMChain
-
-# Setup
-llm = LLM().model()
-memory = ConversationSummaryBufferMemory(
-    llm=llm,
-    max_token_limit=5000,
-    return_messages=True,
-    memory_key="history"
-)
-
-prompt = PromptTemplate(
-    input_variables=["history", "input"],
-    template="""
+from Utilities.session_memory import SessionMemoryStore
+
+PROMPT_TEMPLATE = """
     The conversation so far:
     {history}
 
     User: {input}
     AI:"""
-)
-
-# Create chain
-chain = LLMChain(llm=llm, prompt=prompt, memory=memory)
-
-def chat_with_llm(query: str) -> str:
-    """Interact with LLM using a conversational chain."""
-    try:
-        response = chain.invoke({"input": query})
-        return response['text']
-    except Exception as e:
-        return f"Error during LLM interaction: {e}"
+DEFAULT_SESSION = "default"
+
+# One memory per chat session; summaries are produced in the background.
+memory_store = SessionMemoryStore(llm_factory=lambda: LLM().model(), max_token_limit=5000)
+
+_components = None
+_components_lock = threading.Lock()
+
+def _get_components():
+    """
+    Builds the LLM and prompt on first use instead of at import,
+    so the app starts without LangChain or a GOOGLE_API_KEY until chat is used.
+    """
+    global _components
+    if _components is None:
+        with _components_lock:
+            if _components is None:
+                from langchain.prompts import PromptTemplate
+
+                llm = LLM().model()
+                prompt = PromptTemplate(input_variables=["history", "input"], template=PROMPT_TEMPLATE)
+                _components = {"llm": llm, "prompt": prompt}
+    return _components
+
+def chat_with_llm(query: str, session_id: str = DEFAULT_SESSION) -> str:
+    """Interact with the LLM using the session's conversation memory."""
+    with metrics.trace("general_chat"):
+        try:
+            components = _get_components()
+            with metrics.stage("format"):
+                prompt = components["prompt"].format(history=memory_store.history(session_id), input=query)
+            with metrics.stage("llm"):
+                response = components["llm"].invoke(prompt)
+            memory_store.add_turn(session_id, query, response.content)
+            return response.content
+        except Exception as e:
+            return f"Error during LLM interaction: {e}"
+
+def stream_chat_with_llm(query: str, session_id: str = DEFAULT_SESSION):
+    """
+    Streams the LLM reply as {"type": "token", "text": ...} events.
+    The session's memory is updated once the full reply has arrived.
+    """
+    with metrics.trace("general_chat"):
+        try:
+            components = _get_components()
+            with metrics.stage("format"):
+                prompt = components["prompt"].format(history=memory_store.history(session_id), input=query)
+            answer = []
+            for chunk in metrics.timed_iter(components["llm"].stream(prompt), "llm"):
+                if chunk.content:
+                    answer.append(chunk.content)
+                    yield {"type": "token", "text": chunk.content}
+            memory_store.add_turn(session_id, query, "".join(answer))
+        except Exception as e:
+            yield {"type": "token", "text": f"Error during LLM interaction: {e}"}
+
+def clear_session(session_id: str):
+    """Forget a session's conversation."""
+    memory_store.clear(session_id)
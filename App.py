@@ -1,13 +1,19 @@
+import os
+import sys
+import uuid
 import streamlit as st
 import time
-from Utilities.setup import create_directory, HTML_Template
-from Agents.RAG import document_RAG
-from Agents.URL import url_RAG
-from Agents.Wiki import create_wiki_db
-from Agents.chat_interface import chat_with_llm
-from Utilities.Tools import chat_with_bot
+from Utilities import metrics
+from Utilities.embeddings import EmbeddingEngine, warm_up_in_background
+from Utilities.setup import create_directory, upload_file, HTML_Template
+from Utilities.store import CorpusStore, valid_namespace
+# Mode-specific agents are imported where they are used so the app starts
+# without loading LangChain, Chroma or the embedding stack up front.
 
 create_directory()
+# Serve collections built offline (python ingest.py ...) without ingestion controls.
+READ_ONLY = os.getenv("WORDSMITH_READ_ONLY") == "1"
+metrics.start_metrics_server()
 st.set_page_config(page_title="WordSmith Chatbot", layout="wide", initial_sidebar_state="expanded")
 st.markdown(HTML_Template, unsafe_allow_html=True)
 
@@ -30,22 +36,67 @@ if "vector_db" not in st.session_state:
     st.session_state.vector_db = None
 if "wiki_topic" not in st.session_state:
     st.session_state.wiki_topic = ""
+if "chat_session_id" not in st.session_state:
+    st.session_state.chat_session_id = uuid.uuid4().hex
+if "namespace" not in st.session_state:
+    # The namespace lives in the URL so a reload or restart reopens the same collections.
+    namespace = st.query_params.get("ns")
+    if not valid_namespace(namespace):
+        namespace = os.getenv("WORDSMITH_NAMESPACE", "default") if READ_ONLY else uuid.uuid4().hex[:12]
+        st.query_params["ns"] = namespace
+    st.session_state.namespace = namespace
+
+store = CorpusStore(namespace=st.session_state.namespace)
+MODE_COLLECTIONS = {
+    "Chat with Documents (RAG)": ("Document_Vector", "pdf"),
+    "Chat with URLs": ("URL_Vector", "url"),
+    "Wikipedia Search": ("Wiki_Vector", "wiki"),
+}
+ALL_SOURCES_MODE = "Search All Sources"
+
+
+def keep_ingested(result, base, source_type):
+    """
+    Uses a vector DB returned by an ingestion agent and registers its
+    collection. Agents report failures as a message string, which is shown
+    instead and leaves the current DB and the registry untouched.
+    """
+    if isinstance(result, str):
+        st.error(result)
+        return False
+    st.session_state.vector_db = result
+    store.register(base, source_type)
+    return True
 
 # ------------- SIDEBAR CONTROLS -------------
 with st.sidebar:
     st.markdown("<div class='sidebar-title'>🛠️ Configuration</div>", unsafe_allow_html=True)
     selected_mode = st.radio(
         "Choose Interaction Mode:",
-        options=["General Chatbot", "Chat with Documents (RAG)", "Chat with URLs", "Wikipedia Search"],
+        options=["General Chatbot", "Chat with Documents (RAG)", "Chat with URLs", "Wikipedia Search", ALL_SOURCES_MODE],
         key="mode_selection",
         on_change=lambda: st.session_state.update(mode=st.session_state.mode_selection)
     )
     if st.session_state.mode != st.session_state.mode_selection:
         st.session_state.mode = st.session_state.mode_selection
         st.rerun()
+    if st.session_state.mode != "General Chatbot":
+        # Load the embedding model while the user is still picking sources; the
+        # General Chatbot never needs it.
+        warm_up_in_background()
+    if st.session_state.get("vector_db_mode") != st.session_state.mode:
+        base = MODE_COLLECTIONS.get(st.session_state.mode, (None,))[0]
+        st.session_state.vector_db = store.open(base) if base else None
+        st.session_state.vector_db_mode = st.session_state.mode
+        st.session_state.unified_sources = None
     st.divider()
     files_uploaded_now = []
-    if st.session_state.mode == "Chat with Documents (RAG)":
+    if READ_ONLY and st.session_state.mode in MODE_COLLECTIONS:
+        if st.session_state.vector_db is None:
+            st.warning(f"No collection for this mode in namespace '{store.namespace}'. Build one with ingest.py.")
+        else:
+            st.info(f"📦 Serving the pre-built '{store.namespace}' collection (read-only).")
+    elif st.session_state.mode == "Chat with Documents (RAG)":
         st.markdown("📄 **Upload Documents**")
         files_uploaded_now = st.file_uploader(
             "Add files to chat with",
@@ -75,21 +126,28 @@ with st.sidebar:
                     if st.button("🗑️", key=f"del_file_{i}", help="Remove this file"):
                         removed_file = st.session_state.uploaded_files_list.pop(i)
                         st.session_state.processed_file_names.discard(removed_file.name)
+                        removed_path = os.path.join(store.pdf_dir(), removed_file.name)
+                        if os.path.exists(removed_path):
+                            os.remove(removed_path)
+                        st.session_state.needs_processing = True
                         st.toast(f"Removed {removed_file.name}", icon="➖")
                         st.rerun()
             if st.session_state.needs_processing or any(f.name not in st.session_state.processed_file_names for f in st.session_state.uploaded_files_list):
                 if st.button("⚙️ Process Uploaded Files"):
                     with st.spinner("Processing files and building vector DB..."):
-                        # Save files to PDF/ directory
+                        # Save files to this session's PDF/ directory
                         for file in st.session_state.uploaded_files_list:
-                            file_path = f"PDF/{file.name}"
-                            with open(file_path, "wb") as f:
-                                f.write(file.getbuffer())
-                            st.session_state.processed_file_names.add(file.name)
-                        st.session_state.vector_db = document_RAG()
-                    st.session_state.needs_processing = False
-                    st.success("✅ PDF files processed and vector DB ready.")
-                    st.rerun()
+                            upload_file(file, store.pdf_dir())
+                        from Agents.RAG import document_RAG
+                        ok = keep_ingested(document_RAG(
+                            pdf_path=store.pdf_dir(),
+                            collection_name=store.collection_name("Document_Vector")
+                        ), "Document_Vector", "pdf")
+                    if ok:
+                        st.session_state.processed_file_names.update(f.name for f in st.session_state.uploaded_files_list)
+                        st.session_state.needs_processing = False
+                        st.success("✅ PDF files processed and vector DB ready.")
+                        st.rerun()
             elif st.session_state.uploaded_files_list:
                 st.success("✅ All uploaded files processed.")
     elif st.session_state.mode == "Chat with URLs":
@@ -117,19 +175,28 @@ with st.sidebar:
                 with col2:
                     if st.button("❌", key=f"del_url_{i}", help="Remove this URL"):
                         removed_url = st.session_state.urls.pop(i)
+                        if removed_url in st.session_state.processed_urls:
+                            from Agents.URL import remove_url_vectors
+                            remove_url_vectors([removed_url], collection_name=store.collection_name("URL_Vector"))
                         st.session_state.processed_urls.discard(removed_url)
                         st.toast(f"Removed {removed_url}", icon="➖")
                         st.rerun()
             if st.session_state.needs_processing or any(url not in st.session_state.processed_urls for url in st.session_state.urls):
                 if st.button("⚙️ Process Added URLs"):
+                    ok = True
                     with st.spinner("Processing URLs and building vector DB..."):
-                        # Only process the first URL for demo; extend as needed
-                        url = st.session_state.urls[-1]
-                        st.session_state.vector_db = url_RAG(url)
-                        st.session_state.processed_urls.add(url)
-                    st.session_state.needs_processing = False
-                    st.success("✅ URLs processed and vector DB ready.")
-                    st.rerun()
+                        pending_urls = [url for url in st.session_state.urls if url not in st.session_state.processed_urls]
+                        if pending_urls:
+                            from Agents.URL import url_RAG
+                            ok = keep_ingested(url_RAG(
+                                pending_urls, collection_name=store.collection_name("URL_Vector")
+                            ), "URL_Vector", "url")
+                            if ok:
+                                st.session_state.processed_urls.update(pending_urls)
+                    if ok:
+                        st.session_state.needs_processing = False
+                        st.success("✅ URLs processed and vector DB ready.")
+                        st.rerun()
             elif st.session_state.urls:
                 st.success("✅ All added URLs processed.")
         if urls_added_now:
@@ -144,18 +211,36 @@ with st.sidebar:
             if st.session_state.needs_processing:
                 if st.button("⚙️ Process Wikipedia Topic"):
                     with st.spinner("Processing Wikipedia content and building vector DB..."):
-                        st.session_state.vector_db = create_wiki_db(st.session_state.wiki_topic)
-                    st.session_state.needs_processing = False
-                    st.success("✅ Wikipedia topic processed and vector DB ready.")
-                    st.rerun()
+                        from Agents.Wiki import create_wiki_db
+                        ok = keep_ingested(create_wiki_db(
+                            st.session_state.wiki_topic, collection_name=store.collection_name("Wiki_Vector")
+                        ), "Wiki_Vector", "wiki")
+                    if ok:
+                        st.session_state.needs_processing = False
+                        st.success("✅ Wikipedia topic processed and vector DB ready.")
+                        st.rerun()
             else:
                 st.success(f"✅ Wikipedia topic '{st.session_state.wiki_topic}' processed.")
+    elif st.session_state.mode == ALL_SOURCES_MODE:
+        st.markdown("🗂️ **Search Across Sources**")
+        available = sorted({entry.get("source_type", base) for base, entry in store.collections().items()})
+        if not available:
+            st.info("Process documents, URLs or a Wikipedia topic first.")
+        else:
+            selected = st.multiselect("Source types to search", options=available, default=available, key="source_filter")
+            wanted = sorted(selected or available)
+            # Collections are queried in place; changing the selection only changes the pre-filter.
+            if st.session_state.unified_sources != wanted:
+                st.session_state.vector_db = store.open_unified(source_types=wanted)
+                st.session_state.unified_sources = wanted
     st.divider()
     if st.button("🗑️ Clear Chat History"):
         st.session_state.chat_history = []
+        if "Agents.chat_interface" in sys.modules:
+            sys.modules["Agents.chat_interface"].clear_session(st.session_state.chat_session_id)
         st.toast("Chat history cleared!", icon="🧹")
         st.rerun()
-    if st.button("🧹 Clear All Data Sources"):
+    if not READ_ONLY and st.button("🧹 Clear All Data Sources"):
         st.session_state.uploaded_files_list = []
         st.session_state.processed_file_names = set()
         st.session_state.urls = []
@@ -163,16 +248,50 @@ with st.sidebar:
         st.session_state.vector_db = None
         st.session_state.wiki_topic = ""
         st.session_state.needs_processing = False
+        store.drop_all()
         if "file_uploader" in st.session_state:
             st.session_state.file_uploader = []
         st.toast("All documents and URLs cleared!", icon="💥")
         st.rerun()
+    if metrics.enabled():
+        # Shown with WORDSMITH_METRICS=1; exclusive milliseconds per stage of recent requests.
+        with st.expander("⏱️ Request Timings"):
+            if EmbeddingEngine._instance is not None and EmbeddingEngine._instance.query_cache is not None:
+                query_cache = EmbeddingEngine._instance.query_cache_stats()
+                st.caption(
+                    f"Query embedding cache: {query_cache['hit_rate']:.0%} hits, "
+                    f"~{query_cache['saved_seconds'] * 1000:.0f} ms saved"
+                )
+            # Only read once chat has loaded Utilities.Tools; the sidebar must not import it.
+            llm = getattr(sys.modules.get("Utilities.Tools"), "LLM", None)
+            if llm is not None and llm._instance is not None and hasattr(llm._instance.llm_model, "stats"):
+                gateway = llm._instance.llm_model.stats()
+                st.caption(f"LLM gateway: {gateway['running']} running, {gateway['waiting']} waiting")
+            traces = metrics.registry.recent(int(os.getenv("WORDSMITH_METRICS_PANEL", "10")))
+            if not traces:
+                st.caption("No requests recorded yet.")
+            for trace in reversed(traces):
+                st.markdown(f"**{trace['kind']}** `{trace['trace_id']}` · {trace['total'] * 1000:.0f} ms")
+                st.caption(" · ".join(
+                    f"{name} {trace['stages'][name] * 1000:.0f} ms"
+                    for name in metrics.STAGES if name in trace["stages"]
+                ) or "no stages")
 
 # ------------- MAIN INTERFACE -------------
 st.markdown("<h1 class='chat-title'>💬 WordSmith Chatbot</h1>", unsafe_allow_html=True)
 st.markdown(f"<p class='chat-subtitle'>Interacting via: <strong>{st.session_state.mode}</strong></p>", unsafe_allow_html=True)
 
 # ------------- CHAT DISPLAY -------------
+def show_sources(sources):
+    with st.expander("📚 Sources"):
+        for j, source in enumerate(sources):
+            st.markdown(f"""
+            <div class=\"source-box\">
+               <strong>Source {j+1}:</strong><br/>
+               {source}
+            </div>
+            """, unsafe_allow_html=True)
+
 chat_container = st.container()
 with chat_container:
     if not st.session_state.chat_history:
@@ -183,14 +302,7 @@ with chat_container:
         with st.chat_message(role, avatar=avatar):
             st.write(chat["content"])
             if role == "assistant" and "sources" in chat and chat["sources"]:
-                with st.expander("📚 Sources"):
-                    for j, source in enumerate(chat["sources"]):
-                        st.markdown(f"""
-                        <div class=\"source-box\">
-                           <strong>Source {j+1}:</strong><br/>
-                           {source}
-                        </div>
-                        """, unsafe_allow_html=True)
+                show_sources(chat["sources"])
 
 # ------------- CHAT INPUT -------------
 user_question = st.chat_input("Ask anything...", key="user_input")
@@ -201,27 +313,54 @@ if user_question:
         st.write(user_question)
     response = "Sorry, something went wrong."
     sources = []
+    stream = None
     mode = st.session_state.mode
     with st.chat_message("assistant", avatar="🤖"):
-        with st.spinner("Thinking..."):
-            if mode == "Chat with Documents (RAG)":
-                if not st.session_state.vector_db:
-                    response = "⚠️ Please process the uploaded documents using the 'Process Uploaded Files' button in the sidebar before asking questions."
-                else:
-                    response, _ = chat_with_bot(user_question, [], st.session_state.vector_db)
-            elif mode == "Chat with URLs":
-                if not st.session_state.vector_db:
-                    response = "⚠️ Please process the added URLs using the 'Process Added URLs' button in the sidebar before asking questions."
-                else:
-                    response, _ = chat_with_bot(user_question, [], st.session_state.vector_db)
-            elif mode == "Wikipedia Search":
-                if not st.session_state.vector_db:
-                    response = "⚠️ Please process the Wikipedia topic using the 'Process Wikipedia Topic' button in the sidebar before asking questions."
-                else:
-                    response, _ = chat_with_bot(user_question, [], st.session_state.vector_db)
+        if mode == "General Chatbot":
+            from Agents.chat_interface import stream_chat_with_llm
+        else:
+            from Utilities.Tools import stream_chat_with_bot
+        if mode == "Chat with Documents (RAG)":
+            if not st.session_state.vector_db:
+                response = "⚠️ Please process the uploaded documents using the 'Process Uploaded Files' button in the sidebar before asking questions."
+            else:
+                stream = stream_chat_with_bot(user_question, st.session_state.vector_db)
+        elif mode == "Chat with URLs":
+            if not st.session_state.vector_db:
+                response = "⚠️ Please process the added URLs using the 'Process Added URLs' button in the sidebar before asking questions."
+            else:
+                stream = stream_chat_with_bot(user_question, st.session_state.vector_db)
+        elif mode == "Wikipedia Search":
+            if not st.session_state.vector_db:
+                response = "⚠️ Please process the Wikipedia topic using the 'Process Wikipedia Topic' button in the sidebar before asking questions."
             else:
-                response = chat_with_llm(user_question)
-        st.write(response)
+                stream = stream_chat_with_bot(user_question, st.session_state.vector_db)
+        elif mode == ALL_SOURCES_MODE:
+            if not st.session_state.vector_db:
+                response = "⚠️ Please process at least one document, URL or Wikipedia topic before searching all sources."
+            else:
+                stream = stream_chat_with_bot(user_question, st.session_state.vector_db)
+        else:
+            stream = stream_chat_with_llm(user_question, session_id=st.session_state.chat_session_id)
+
+        if stream is None:
+            st.write(response)
+        else:
+            answer_area, sources_area = st.container(), st.container()
+
+            def answer_tokens():
+                # Sources arrive before the first token and are shown below the
+                # answer right away; tokens are shown as they stream in.
+                for event in stream:
+                    if event["type"] == "sources":
+                        from Utilities.Tools import format_citation
+                        sources.extend(f"{format_citation(src)}\n{src['text']}" for src in event["sources"])
+                        if sources:
+                            with sources_area:
+                                show_sources(sources)
+                    else:
+                        yield event["text"]
+            response = answer_area.write_stream(answer_tokens())
     st.session_state.chat_history.append({
         "role": "assistant",
         "content": response,
@@ -1,36 +1,48 @@
+import hashlib
 import os
+import threading
+import uuid
+from collections import OrderedDict
 from dotenv import load_dotenv
-from langchain_community.vectorstores import Chroma
-from langchain.embeddings import HuggingFaceInstructEmbeddings
-from langchain_google_genai import ChatGoogleGenerativeAI 
-from langchain.chains import RetrievalQA
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from Utilities import metrics
+from Utilities.chunking import get_chunker, iter_chunks
+from Utilities.embeddings import EmbeddingEngine, EMBEDDING_MODEL
+from Utilities.answer_cache import SemanticAnswerCache
+from Utilities.sparse_index import get_sparse_index
 load_dotenv()
 
+# LangChain, Chroma and the Gemini client are imported inside the functions that
+# need them so importing this module (and starting the app) stays cheap.
+
+answer_cache = SemanticAnswerCache(
+    threshold=float(os.getenv("WORDSMITH_ANSWER_CACHE_THRESHOLD", "0.92")),
+    ttl=float(os.getenv("WORDSMITH_ANSWER_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("WORDSMITH_ANSWER_CACHE_SIZE", "1024"))
+)
+
 class LLM:
     _instance = None
 
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance.llm_model = cls._instance._create_chat_model()
+            instance = super().__new__(cls)
+            instance.llm_model = instance._create_chat_model()
+            cls._instance = instance
         return cls._instance
 
     def _create_chat_model(self):
         """
-        Creates a Google Generative AI model using Gemini.
+        Creates the chat model from the WORDSMITH_LLM_BACKEND backend ('gemini' by
+        default, or 'fake' for the offline FakeChatModel) behind an LLMGateway,
+        which rate-limits, queues, retries and coalesces every call.
+        Set WORDSMITH_LLM_GATEWAY=0 to call the backend directly.
         """
-        google_api_key = os.getenv("GOOGLE_API_KEY")
-        if not google_api_key:
-            raise EnvironmentError("Missing GOOGLE_API_KEY in .env.")
-        try:
-            return ChatGoogleGenerativeAI(
-                api_key=google_api_key,
-                model='gemini-1.5-flash-latest',
-                temperature=0.5
-            )
-        except Exception as e:
-            raise RuntimeError(f"Failed to initialize Gemini model: {e}")
+        from Utilities.llm_gateway import LLMGateway, create_backend
+
+        backend = create_backend()
+        if os.getenv("WORDSMITH_LLM_GATEWAY", "1") == "0":
+            return backend
+        return LLMGateway.from_env(backend)
 
     def model(self):
         return self.llm_model
@@ -39,122 +51,501 @@ class LLM:
 def create_chunks(pages, metadata=False):
     """
     Splits documents into chunks with optional metadata.
+    pages may be a string, a Document or an iterable of either; splitting is
+    delegated to Utilities.chunking (token-sized, strategy from
+    WORDSMITH_CHUNK_STRATEGY). With metadata, each chunk is mapped to its page
+    and line.
     """
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=512,
-        chunk_overlap=100,
-        length_function=len,
-        add_start_index=True
-    )
-    chunks = text_splitter.split_documents(pages)
-
-    if metadata:
-        for i, chunk in enumerate(chunks):
-            normalized_text = chunk.page_content.replace("\r\n", "\n").replace("\r", "\n")
-            start_index = chunk.metadata.get("start_index", 0)
-            page_number = chunk.metadata.get("page", i + 1)
-            preceding_text = normalized_text[:start_index]
-            line_number = preceding_text.count("\n") + 1
-            exact_words = normalized_text[start_index:start_index + 512]
-
-            chunk.metadata.update({
-                "page_number": page_number,
-                "line_number": line_number,
-                "exact_words": exact_words.strip(),
-                "chunk_id": i
-            })
-
+    with metrics.stage("split"):
+        chunks = list(iter_chunks(pages, metadata=metadata))
+    metrics.count("chunks", len(chunks))
     return chunks
 
+def chunker_version():
+    """Version of the active chunking configuration, recorded in ingestion manifests."""
+    return get_chunker().version
+
+_hash_embeddings = None
+
 def load_embeddings():
     """
-    Loads HuggingFace sentence embeddings for instruction tuning.
+    Returns the process-wide instruction embedding engine (loaded on first use).
+    Set WORDSMITH_EMBEDDING_BACKEND=hash to use the offline HashEmbeddings instead.
     """
-    return HuggingFaceInstructEmbeddings(
-        cache_folder='Embeddings',
-        model_name="all-mpnet-base-v2",
-        model_kwargs={"device": "cpu"},
-        encode_kwargs={"normalize_embeddings": True},
-        embed_instruction="Encode this document to make its content easily retrievable by relevant questions.",
-        query_instruction="Embed this question to retrieve the most relevant information from stored documents."
-    )
+    global _hash_embeddings
+    if os.getenv("WORDSMITH_EMBEDDING_BACKEND") == "hash":
+        if _hash_embeddings is None:
+            from Utilities.fakes import HashEmbeddings
+            _hash_embeddings = HashEmbeddings()
+        return _hash_embeddings
+    return EmbeddingEngine()
+
+
+def _chroma_collection_exists(CHROMA_PATH, collection_name):
+    if not os.path.exists(os.path.join(CHROMA_PATH, "chroma.sqlite3")):
+        return False
+    import chromadb
+    try:
+        collections = chromadb.PersistentClient(path=CHROMA_PATH).list_collections()
+    except Exception:
+        return False
+    # Chroma >= 0.6 lists names; older versions list Collection objects.
+    return collection_name in [c if isinstance(c, str) else c.name for c in collections]
+
 
+def resolve_backend(CHROMA_PATH, collection_name, backend=None):
+    """
+    Picks the vector backend of a collection: an explicit choice, else the
+    backend an existing collection was created with, else WORDSMITH_VECTOR_BACKEND
+    ('chroma' or 'ann'). Changing WORDSMITH_VECTOR_BACKEND therefore only
+    affects new collections; drop a collection to rebuild it on another backend.
+    """
+    if backend:
+        return backend
+    if os.path.isdir(os.path.join(CHROMA_PATH, f"{collection_name}.ann")):
+        return "ann"
+    if _chroma_collection_exists(CHROMA_PATH, collection_name):
+        return "chroma"
+    return os.getenv("WORDSMITH_VECTOR_BACKEND", "chroma")
+
+
+def _vector_store_class(backend):
+    if backend == "ann":
+        from Utilities.ann_store import AnnVectorStore
+        return AnnVectorStore
+    if backend == "chroma":
+        from langchain_community.vectorstores import Chroma
+        return Chroma
+    raise ValueError(f"Unknown vector backend: {backend}")
 
-def create_vector_db(chunks, CHROMA_PATH, collection_name='default'):
+
+def create_vector_db(chunks, CHROMA_PATH, collection_name='default', ids=None, backend=None):
     """
     Creates and returns a persistent vector database.
+    Passing stable ids makes re-ingestion an upsert instead of a duplicate insert.
+    The collection's BM25 index is updated alongside.
     """
+    store_class = _vector_store_class(resolve_backend(CHROMA_PATH, collection_name, backend))
+    if ids is None:
+        ids = [str(uuid.uuid4()) for _ in chunks]
     embedding = load_embeddings()
-    vectordb = Chroma.from_documents(
-        documents=chunks,
+    with metrics.stage("upsert"):
+        vectordb = store_class.from_documents(
+            documents=chunks,
+            collection_name=collection_name,
+            embedding=embedding,
+            persist_directory=CHROMA_PATH,
+            ids=ids
+        )
+        update_sparse_index(CHROMA_PATH, collection_name, add=(ids, [chunk.page_content for chunk in chunks]))
+    mark_corpus_changed(CHROMA_PATH, collection_name)
+    return vectordb
+
+
+def open_vector_db(CHROMA_PATH, collection_name='default', backend=None):
+    """
+    Opens an existing (or empty) persistent collection without embedding anything.
+    """
+    store_class = _vector_store_class(resolve_backend(CHROMA_PATH, collection_name, backend))
+    return store_class(
         collection_name=collection_name,
-        embedding=embedding,
+        embedding_function=load_embeddings(),
         persist_directory=CHROMA_PATH
     )
-    return vectordb
+
+
+def collection_name_of(db):
+    """Name of the collection behind a vector DB handle."""
+    return getattr(db, "collection_name", None) or db._collection.name
+
+
+def collection_id_of(db):
+    """
+    Identity of the collection behind a handle. It changes when a collection is
+    dropped and created again under the same name, which makes old handles stale.
+    """
+    if hasattr(db, "_collection"):
+        return str(db._collection.id)
+    return getattr(db, "collection_id", id(db))
+
+
+def version_path(CHROMA_PATH, collection_name):
+    return os.path.join(CHROMA_PATH, f"{collection_name}.version")
+
+
+def corpus_version(db):
+    """
+    Version stamp of the collection behind a handle. It is read from disk on
+    every call, so writes by other processes (e.g. ingest.py) are noticed.
+    Handles without a directory of their own, such as a UnifiedCorpus whose
+    name already carries its members' versions, report "0".
+    """
+    directory = getattr(db, "_persist_directory", None)
+    if directory is None:
+        return "0"
+    try:
+        with open(version_path(directory, collection_name_of(db))) as f:
+            return f.read().strip() or "0"
+    except FileNotFoundError:
+        return "0"
+
+
+def mark_corpus_changed(CHROMA_PATH, collection_name):
+    """
+    Stamps a new version on a collection and drops its cached answers.
+    The stamp is a random token, so concurrent writers never produce the same one.
+    """
+    path = version_path(CHROMA_PATH, collection_name)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(uuid.uuid4().hex)
+    os.replace(tmp_path, path)
+    answer_cache.invalidate(collection_name)
+
+
+def update_sparse_index(CHROMA_PATH, collection_name, add=None, remove=None):
+    """
+    Applies additions ((ids, texts)) and removals (ids) to a collection's BM25
+    index and appends them to its change log next to the collection.
+    """
+    get_sparse_index(CHROMA_PATH, collection_name).update(add=add, remove=remove)
+
+
+def upsert_documents(db, documents, ids=None):
+    """Adds (or replaces, for known ids) documents in an open vector DB."""
+    with metrics.stage("upsert"):
+        ids = db.add_documents(documents, ids=ids)
+        update_sparse_index(db._persist_directory, collection_name_of(db), add=(ids, [doc.page_content for doc in documents]))
+    mark_corpus_changed(db._persist_directory, collection_name_of(db))
+
+
+def delete_documents(db, ids):
+    """Deletes documents by id from an open vector DB."""
+    with metrics.stage("upsert"):
+        db.delete(ids=ids)
+        update_sparse_index(db._persist_directory, collection_name_of(db), remove=ids)
+    mark_corpus_changed(db._persist_directory, collection_name_of(db))
+
+
+def http_session(max_workers, user_agent="WordSmith-Chatbot/1.0"):
+    """requests.Session whose connection pool serves max_workers concurrent requests."""
+    import requests
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = user_agent
+    return session
+
+
+def source_chunk_ids(source, count):
+    """Stable ids of a source's chunks, so re-ingesting a source overwrites them."""
+    digest = hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+    return [f"{digest}-{i}" for i in range(count)]
+
+
+def source_vector_ids(db, source):
+    """Ids of the chunks stored for a source (a web page or an article)."""
+    return db.get(where={"source": source}).get("ids", [])
+
+
+def sync_sources(groups, db, batch_size=64, on_commit=None):
+    """
+    Chunks and upserts sources in embedding batches. Each group is a list of
+    Documents sharing one metadata["source"] (a web page, the sections of an
+    article); chunks previously stored for that source are replaced. New
+    chunks are upserted first and only old ids missing from the new set are
+    deleted afterwards, so a source never drops out of the collection.
+    on_commit(committed) is called after each batch with {source: chunk count}
+    of the sources it committed. Returns the number of sources stored.
+    """
+    batch, batch_ids, batch_sources, stale = [], [], {}, []
+    stored = 0
+
+    def commit():
+        if batch:
+            upsert_documents(db, batch, ids=batch_ids)
+        if stale:
+            delete_documents(db, stale)
+        if on_commit:
+            on_commit(batch_sources)
+
+    for documents in groups:
+        metrics.count("pages")
+        source = documents[0].metadata["source"]
+        chunks = create_chunks(documents, metadata=False)
+        ids = source_chunk_ids(source, len(chunks))
+        current = set(ids)
+        stale.extend(chunk_id for chunk_id in source_vector_ids(db, source) if chunk_id not in current)
+        batch.extend(chunks)
+        batch_ids.extend(ids)
+        batch_sources[source] = len(chunks)
+        if len(batch) >= batch_size:
+            commit()
+            stored += len(batch_sources)
+            batch, batch_ids, batch_sources, stale = [], [], {}, []
+    if batch_sources:
+        commit()
+        stored += len(batch_sources)
+    return stored
 
 
 ### ----------- Retrieval & QA -----------
 
+def format_sources(documents):
+    """
+    Converts retrieved documents into citation dictionaries.
+    """
+    formatted_sources = []
+    for doc in documents:
+        metadata = doc.metadata
+        formatted_sources.append({
+            "file": metadata.get("source", "N/A"),
+            "page": metadata.get("page_number", "N/A"),
+            "line": metadata.get("line_number", "N/A"),
+            "chunk": metadata.get("chunk_id", "N/A"),
+            "type": metadata.get("source_type", "N/A"),
+            "section": metadata.get("section", "N/A"),
+            # A chunk is its page's text from char_start to char_end; it is not
+            # copied into the metadata as well.
+            "text": doc.page_content
+        })
+    return formatted_sources
+
+
+def format_citation(source):
+    """
+    One-line citation of a formatted source: "[type] file (where)", where the
+    location is the section for wiki pages, the page and line for PDFs and
+    omitted for web pages.
+    """
+    prefix = "" if source.get("type", "N/A") == "N/A" else f"[{source['type']}] "
+    if source.get("section", "N/A") != "N/A":
+        location = f" ({source['section']})"
+    elif source.get("page", "N/A") != "N/A":
+        location = f" (Page {source['page']}, Line {source.get('line', 'N/A')})"
+    else:
+        location = ""
+    return f"{prefix}{source['file']}{location}"
+
+
+class QueryEngine:
+    """
+    Long-lived retriever and QA chain bound to one vector DB handle.
+    Both are built once, so each query only pays for vector search and the LLM call.
+    With hybrid=True (WORDSMITH_HYBRID, on by default) dense results are fused
+    with the collection's BM25 index. With a token_budget (WORDSMITH_CONTEXT_TOKENS,
+    default 768; 0 disables packing) fetch_k candidates are retrieved, merged and
+    de-duplicated, and the best ones are packed until the budget is full (or
+    max_chunks are used); without packing k chunks are retrieved.
+    """
+
+    def __init__(self, db, k=3, chain_type='stuff', verbose=False, hybrid=None, fetch_k=12, token_budget=None,
+                 max_chunks=None):
+        from langchain.chains import RetrievalQA
+        from langchain.chains.question_answering.stuff_prompt import PROMPT_SELECTOR
+
+        if hybrid is None:
+            hybrid = os.getenv("WORDSMITH_HYBRID", "1") == "1"
+        if token_budget is None:
+            token_budget = int(os.getenv("WORDSMITH_CONTEXT_TOKENS", "768"))
+        self.db = db
+        self.k = k
+        self.chain_type = chain_type
+        self.verbose = verbose
+        self.token_budget = token_budget
+        self.llm = LLM().model()
+        candidates = fetch_k if token_budget else k
+        if hybrid and hasattr(db, "_persist_directory"):
+            from Utilities.retrievers import HybridRetriever
+
+            sparse_index = get_sparse_index(db._persist_directory, collection_name_of(db))
+            self.retriever = HybridRetriever(vectorstore=db, sparse_index=sparse_index, k=candidates)
+        else:
+            self.retriever = db.as_retriever(search_kwargs={'k': candidates})
+        if token_budget:
+            from Utilities.retrievers import ContextPackingRetriever
+
+            self.retriever = ContextPackingRetriever(base_retriever=self.retriever, token_budget=token_budget,
+                                                     max_chunks=max_chunks)
+        self.prompt = PROMPT_SELECTOR.get_prompt(self.llm)
+        self.chain = RetrievalQA.from_chain_type(
+            llm=self.llm,
+            chain_type=chain_type,
+            retriever=self.retriever,
+            return_source_documents=True,
+            chain_type_kwargs={'verbose': verbose}
+        )
+
+    def ask(self, query):
+        """
+        Answers a query and returns {"answer": ..., "sources": [...]}.
+        """
+        # Retrieval inside the chain is timed by the retrievers; the rest is the LLM call.
+        with metrics.stage("llm"):
+            result = self.chain.invoke({"query": query})
+        with metrics.stage("format"):
+            sources = format_sources(result['source_documents'])
+        return {"answer": result['result'], "sources": sources}
+
+    def stream(self, query):
+        """
+        Retrieves first, yields {"type": "sources"} right away, then yields
+        {"type": "token"} events as the LLM produces them.
+        """
+        with metrics.stage("retrieve"):
+            documents = self.retriever.invoke(query)
+        with metrics.stage("format"):
+            sources = format_sources(documents)
+            context = "\n\n".join(doc.page_content for doc in documents)
+            prompt = self.prompt.format_prompt(context=context, question=query)
+        yield {"type": "sources", "sources": sources}
+        for chunk in metrics.timed_iter(self.llm.stream(prompt), "llm"):
+            if chunk.content:
+                yield {"type": "token", "text": chunk.content}
+
+
+_query_engines = OrderedDict()
+_query_engines_lock = threading.Lock()
+QUERY_ENGINE_CACHE_SIZE = int(os.getenv("WORDSMITH_QUERY_ENGINES", "16"))
+
+def _engine_location(CHROMA_PATH, collection_name):
+    return os.path.abspath(CHROMA_PATH), collection_name
+
+def get_query_engine(db, k=3, chain_type='stuff', verbose=False):
+    """
+    Returns the cached QueryEngine for a collection, creating it on first use.
+    Engines are keyed by persist directory and collection name, not by handle,
+    so reopening a collection reuses its engine. An engine built on an earlier
+    incarnation of the collection (dropped and re-created since) is rebuilt on
+    the given handle. The least recently used engines are dropped past
+    WORDSMITH_QUERY_ENGINES.
+    """
+    if hasattr(db, "_persist_directory"):
+        location = _engine_location(db._persist_directory, collection_name_of(db))
+    else:
+        location = (id(db), collection_name_of(db))
+    key = location + (k, chain_type, verbose)
+    collection_id = collection_id_of(db)
+    with _query_engines_lock:
+        engine = _query_engines.get(key)
+        if engine is not None and collection_id_of(engine.db) == collection_id:
+            _query_engines.move_to_end(key)
+            return engine
+    engine = QueryEngine(db, k=k, chain_type=chain_type, verbose=verbose)
+    with _query_engines_lock:
+        cached = _query_engines.get(key)
+        if cached is not None and collection_id_of(cached.db) == collection_id:
+            engine = cached
+        _query_engines[key] = engine
+        _query_engines.move_to_end(key)
+        while len(_query_engines) > QUERY_ENGINE_CACHE_SIZE:
+            _query_engines.popitem(last=False)
+    return engine
+
+def forget_query_engines(CHROMA_PATH, collection_name):
+    """Drops the cached engines of a collection, e.g. when it is deleted."""
+    location = _engine_location(CHROMA_PATH, collection_name)
+    with _query_engines_lock:
+        for key in [key for key in _query_engines if key[:2] == location]:
+            del _query_engines[key]
+
 def retrieve_info(db, query, return_source=False):
     """
     Uses RetrievalQA to answer a query using the vector database.
     """
-    llm = LLM().model()
-    retriever = db.as_retriever(search_kwargs={'k': 3})
-    qa = RetrievalQA.from_chain_type(
-        llm=llm,
-        chain_type='stuff',
-        retriever=retriever,
-        return_source_documents=return_source,
-        chain_type_kwargs={'verbose': True}
-    )
-
-    result = qa.invoke(query)
+    response = get_query_engine(db).ask(query)
     if return_source:
-        answer = result['result']
-        sources = result['source_documents']
-
-        formatted_sources = []
-        for doc in sources:
-            metadata = doc.metadata
-            formatted_sources.append({
-                "file": metadata.get("source", "N/A"),
-                "page": metadata.get("page_number", "N/A"),
-                "line": metadata.get("line_number", "N/A"),
-                "chunk": metadata.get("chunk_id", "N/A"),
-                "text": metadata.get("exact_words", doc.page_content[:200])
-            })
-
-        return {"answer": answer, "sources": formatted_sources}
+        return response
     else:
-        return result
+        return {"query": query, "result": response["answer"]}
+
+def lookup_cached_answer(db, query):
+    """
+    Checks the semantic answer cache for a query.
+    Returns (entry, query_vector, version); entry is None on a miss and the
+    vector is None when an exact repeat was served without embedding.
+    """
+    collection = collection_name_of(db)
+    version = corpus_version(db)
+    entry = answer_cache.get_exact(collection, version, query)
+    if entry is not None:
+        return entry, None, version
+    vector = load_embeddings().embed_query(query)
+    return answer_cache.get_similar(collection, version, vector), vector, version
+
+def store_answer(db, query, vector, version, answer, sources):
+    """Caches an answer computed against the given corpus version."""
+    if vector is None:
+        vector = load_embeddings().embed_query(query)
+    answer_cache.put(collection_name_of(db), version, query, vector, answer, sources)
 
 def chat_with_bot(user_input, history, db):
     """
     Handles a conversation with the LLM using the vector DB.
+    With WORDSMITH_METRICS=1 each call is recorded as a "chat" trace.
     """
-    try:
-        if db is None:
-            return "Database is not initialized. Please upload a document first.", history
+    with metrics.trace("chat"):
+        try:
+            if db is None:
+                return "Database is not initialized. Please upload a document first.", history
 
-        response = retrieve_info(db, query=user_input, return_source=True)
-        answer = response.get("answer", "No answer found.")
-        sources = response.get("sources", [])
+            entry, vector, version = lookup_cached_answer(db, user_input)
+            if entry is not None:
+                metrics.count("answer_cache_hit")
+                response = {"answer": entry["answer"], "sources": entry["sources"]}
+            else:
+                metrics.count("answer_cache_miss")
+                response = retrieve_info(db, query=user_input, return_source=True)
+                store_answer(db, user_input, vector, version, response["answer"], response["sources"])
+            answer = response.get("answer", "No answer found.")
+            sources = response.get("sources", [])
 
-        if not sources:
-            bot_response = answer
-        else:
-            sources_text = "\n".join(
-                f"{src['file']} (Page {src['page']}, Line {src['line']})"
-                for src in sources
-            )
-            bot_response = f"{answer}\n\nSources:\n{sources_text}"
-
-        history.append((user_input, bot_response, sources))
-        return bot_response, history
-
-    except Exception as e:
-        error_message = f"Error: {str(e)}"
-        history.append((user_input, error_message))
-        return error_message, history
+            with metrics.stage("format"):
+                if not sources:
+                    bot_response = answer
+                else:
+                    sources_text = "\n".join(format_citation(src) for src in sources)
+                    bot_response = f"{answer}\n\nSources:\n{sources_text}"
+
+            history.append((user_input, bot_response, sources))
+            return bot_response, history
+
+        except Exception as e:
+            error_message = f"Error: {str(e)}"
+            trace_id = metrics.current_trace_id()
+            if trace_id:
+                error_message += f" (trace {trace_id})"
+            history.append((user_input, error_message))
+            return error_message, history
+
+def stream_chat_with_bot(user_input, db):
+    """
+    Streaming variant of chat_with_bot: yields a sources event, then answer tokens.
+    Usable from any caller that can consume a generator, not only Streamlit.
+    """
+    if db is None:
+        yield {"type": "token", "text": "Database is not initialized. Please upload a document first."}
+        return
+    with metrics.trace("chat"):
+        try:
+            entry, vector, version = lookup_cached_answer(db, user_input)
+            if entry is not None:
+                metrics.count("answer_cache_hit")
+                yield {"type": "sources", "sources": entry["sources"]}
+                yield {"type": "token", "text": entry["answer"]}
+                return
+            metrics.count("answer_cache_miss")
+            answer, sources = [], []
+            for event in get_query_engine(db).stream(user_input):
+                if event["type"] == "sources":
+                    sources = event["sources"]
+                else:
+                    answer.append(event["text"])
+                yield event
+            store_answer(db, user_input, vector, version, "".join(answer), sources)
+        except Exception as e:
+            trace_id = metrics.current_trace_id()
+            suffix = f" (trace {trace_id})" if trace_id else ""
+            yield {"type": "token", "text": f"Error: {str(e)}{suffix}"}
@@ -0,0 +1,400 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+FREE = -2
+UNASSIGNED = -1
+SEARCH_BLOCK = 65536
+
+
+def ann_path(persist_directory, collection_name):
+    return os.path.join(persist_directory, f"{collection_name}.ann")
+
+
+def _where_clauses(where):
+    """SQL clauses for a flat metadata equality filter."""
+    clauses, params = [], []
+    for key, value in (where or {}).items():
+        clauses.append("json_extract(metadata, ?) = ?")
+        params.extend([f"$.{key}", value])
+    return clauses, params
+
+
+def quantize(vectors):
+    """Symmetric per-vector int8 quantization; returns (codes, scales)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def nearest_centroids(vectors, centroids):
+    """Index of the closest (L2) centroid for every row, computed in blocks."""
+    half_norms = 0.5 * (centroids * centroids).sum(axis=1)
+    assignment = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), SEARCH_BLOCK):
+        block = vectors[start:start + SEARCH_BLOCK]
+        assignment[start:start + len(block)] = np.argmax(block @ centroids.T - half_norms, axis=1)
+    return assignment
+
+
+def kmeans(data, nlist, iterations=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = nearest_centroids(data, centroids)
+        counts = np.bincount(assignment, minlength=nlist)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = data[rng.choice(len(data), int(empty.sum()))]
+    return centroids
+
+
+class AnnVectorStore(VectorStore):
+    """
+    Embedded IVF vector store with int8-quantized vectors.
+    Codes, scales and IVF list assignments live in memory-mapped files under
+    <persist_directory>/<collection>.ann/, texts and metadata in SQLite.
+    Until train_threshold vectors exist, search is exact over the quantized
+    codes; after that an IVF index is trained and nprobe lists are scanned.
+    Exposes the subset of the Chroma API the agents use (get, delete,
+    delete_collection), so either backend works unchanged.
+
+    Any number of handles, in this or other processes, may share a collection
+    like Chroma handles do. Writes run in a SQLite IMMEDIATE transaction, which
+    serializes writers, and re-read the slot state before allocating. Every
+    write bumps a generation counter, and handles reload their cached state
+    when it has moved.
+    """
+
+    def __init__(self, collection_name='default', embedding_function=None, persist_directory='Chroma',
+                 nlist=None, nprobe=16, train_threshold=20000):
+        self.collection_name = collection_name
+        self._embedding = embedding_function
+        self._persist_directory = persist_directory
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_threshold = train_threshold
+        self.path = ann_path(persist_directory, collection_name)
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(self.path, "docs.sqlite3"), timeout=60, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "slot INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, text TEXT, metadata TEXT)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        # Identifies this incarnation of the collection, like a Chroma collection id.
+        self._db.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('uid', ?)", (uuid.uuid4().hex,))
+        self._db.commit()
+        self.collection_id = self._db.execute("SELECT value FROM meta WHERE name = 'uid'").fetchone()[0]
+        self.dim = None
+        self.capacity = self.next_slot = 0
+        self.centroids = None
+        self._inverted = None
+        self._codes = self._scales = self._lists = None
+        self._free = []
+        self._generation = None
+        self._refresh()
+
+    # ----------- storage -----------
+
+    def _get_meta(self, name):
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return int(row[0]) if row else None
+
+    def _set_meta(self, name, value):
+        self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, str(value)))
+
+    def _refresh(self):
+        """Reloads the cached slot state if another handle has written since it was read."""
+        generation = self._get_meta("generation") or 0
+        if generation == self._generation:
+            return
+        self.dim = self._get_meta("dim")
+        self.next_slot = self._get_meta("next_slot") or 0
+        capacity = self._get_meta("capacity") or 0
+        if self.dim and (self._codes is None or capacity != self.capacity):
+            self.capacity = capacity
+            self._open_arrays()
+        centroids_path = os.path.join(self.path, "centroids.npy")
+        self.centroids = np.load(centroids_path) if os.path.exists(centroids_path) else None
+        self._free = np.nonzero(self._lists[:self.next_slot] == FREE)[0].tolist() if self.dim else []
+        self._inverted = None
+        self._generation = generation
+
+    @contextmanager
+    def _writing(self):
+        """Exclusive write transaction across handles and processes, on fresh state."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                yield
+                self._generation = (self._get_meta("generation") or 0) + 1
+                self._set_meta("generation", self._generation)
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                self._generation = None
+                raise
+
+    def _open_arrays(self):
+        def open_array(name, dtype, shape, fill=None):
+            path = os.path.join(self.path, name)
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            existing = os.path.getsize(path) if os.path.exists(path) else 0
+            if existing < size:
+                with open(path, "ab") as f:
+                    f.truncate(size)
+            array = np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+            if fill is not None and existing < size:
+                array[existing // np.dtype(dtype).itemsize:] = fill
+            return array
+
+        self._codes = open_array("vectors.i8", np.int8, (self.capacity, self.dim))
+        self._scales = open_array("scales.f32", np.float32, (self.capacity,))
+        self._lists = open_array("lists.i32", np.int32, (self.capacity,), fill=FREE)
+
+    def _ensure_capacity(self, needed):
+        if needed <= self.capacity:
+            return
+        capacity = max(needed, self.capacity * 2, 1024)
+        for array in (self._codes, self._scales, self._lists):
+            if array is not None:
+                array.flush()
+        self._codes = self._scales = self._lists = None
+        self.capacity = capacity
+        self._set_meta("capacity", capacity)
+        self._open_arrays()
+
+    def _flush(self):
+        self._codes.flush()
+        self._scales.flush()
+        self._lists.flush()
+        self._set_meta("next_slot", self.next_slot)
+        self._inverted = None
+
+    # ----------- writes -----------
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def add_embeddings(self, texts, embeddings, metadatas=None, ids=None):
+        """Upserts precomputed vectors; returns their ids."""
+        texts = list(texts)
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        if not texts:
+            return ids
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._writing():
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._set_meta("dim", self.dim)
+            slots = self._slots_for(ids)
+            for i, slot in enumerate(slots):
+                if slot is None:
+                    if self._free:
+                        slots[i] = self._free.pop()
+                    else:
+                        slots[i] = self.next_slot
+                        self.next_slot += 1
+            self._ensure_capacity(self.next_slot)
+            slots = np.asarray(slots, dtype=np.int64)
+            self._codes[slots], self._scales[slots] = quantize(vectors)
+            self._lists[slots] = nearest_centroids(vectors, self.centroids) if self.centroids is not None else UNASSIGNED
+            self._db.executemany(
+                "INSERT OR REPLACE INTO docs (slot, id, text, metadata) VALUES (?, ?, ?, ?)",
+                [(int(slot), doc_id, text, json.dumps(metadata or {}))
+                 for slot, doc_id, text, metadata in zip(slots, ids, texts, metadatas)]
+            )
+            self._flush()
+            train = self.centroids is None and len(self) >= self.train_threshold
+        if train:
+            self.train()
+        return ids
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        return self.add_embeddings(texts, self._embedding.embed_documents(texts), metadatas, ids)
+
+    def _slots_for(self, ids):
+        found = {}
+        for start in range(0, len(ids), 500):
+            part = ids[start:start + 500]
+            found.update(self._db.execute(
+                f"SELECT id, slot FROM docs WHERE id IN ({','.join('?' * len(part))})", part
+            ).fetchall())
+        return [found.get(doc_id) for doc_id in ids]
+
+    def delete(self, ids=None, **kwargs):
+        if not ids:
+            return None
+        with self._writing():
+            slots = [slot for slot in self._slots_for(list(ids)) if slot is not None]
+            if slots:
+                self._db.executemany("DELETE FROM docs WHERE slot = ?", [(slot,) for slot in slots])
+                self._lists[np.asarray(slots)] = FREE
+                self._free.extend(slots)
+                self._flush()
+        return True
+
+    def delete_collection(self):
+        with self._lock:
+            self._db.close()
+            self._codes = self._scales = self._lists = None
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def train(self, nlist=None):
+        """Trains IVF centroids on the stored vectors and assigns every vector."""
+        with self._writing():
+            live = np.nonzero(self._lists[:self.next_slot] != FREE)[0]
+            if not len(live):
+                return
+            nlist = min(nlist or self.nlist or max(1, int(np.sqrt(len(live)))), len(live))
+            rng = np.random.default_rng(0)
+            sample = live if len(live) <= nlist * 30 else rng.choice(live, nlist * 30, replace=False)
+            self.centroids = kmeans(self._dequantize(np.sort(sample)), nlist).astype(np.float32)
+            # Written aside and swapped in, so other handles never load a partial file.
+            staged = os.path.join(self.path, "centroids.tmp.npy")
+            np.save(staged, self.centroids)
+            os.replace(staged, os.path.join(self.path, "centroids.npy"))
+            for start in range(0, len(live), SEARCH_BLOCK):
+                block = live[start:start + SEARCH_BLOCK]
+                self._lists[block] = nearest_centroids(self._dequantize(block), self.centroids)
+            self._flush()
+
+    def _dequantize(self, slots):
+        return self._codes[slots].astype(np.float32) * self._scales[slots, None]
+
+    # ----------- reads -----------
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def _inverted_lists(self):
+        if self._inverted is None:
+            lists = np.asarray(self._lists[:self.next_slot])
+            order = np.argsort(lists, kind="stable")
+            keys, starts = np.unique(lists[order], return_index=True)
+            bounds = list(starts[1:]) + [len(order)]
+            self._inverted = {
+                int(key): order[start:end] for key, start, end in zip(keys, starts, bounds) if key != FREE
+            }
+        return self._inverted
+
+    def _candidates(self, query):
+        inverted = self._inverted_lists()
+        if self.centroids is None:
+            parts = list(inverted.values())
+        else:
+            half_norms = 0.5 * (self.centroids * self.centroids).sum(axis=1)
+            probes = np.argsort(half_norms - self.centroids @ query)[:self.nprobe]
+            parts = [inverted[int(p)] for p in probes if int(p) in inverted]
+            if UNASSIGNED in inverted:
+                parts.append(inverted[UNASSIGNED])
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def search_slots(self, vector, k, slots=None):
+        """
+        Returns [(slot, score)] of the best k inner-product matches.
+        With slots (e.g. from a metadata filter) only those are scanned, exactly.
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._refresh()
+            if self.dim is None:
+                return []
+            candidates = self._candidates(query) if slots is None else np.asarray(slots, dtype=np.int64)
+            best_slots, best_scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            for start in range(0, len(candidates), SEARCH_BLOCK):
+                block = candidates[start:start + SEARCH_BLOCK]
+                scores = (self._codes[block].astype(np.float32) @ query) * self._scales[block]
+                best_slots = np.concatenate([best_slots, block])
+                best_scores = np.concatenate([best_scores, scores])
+                if len(best_scores) > k:
+                    top = np.argpartition(-best_scores, k)[:k]
+                    best_slots, best_scores = best_slots[top], best_scores[top]
+            order = np.argsort(-best_scores)
+            return [(int(best_slots[i]), float(best_scores[i])) for i in order[:k]]
+
+    def _documents(self, slot_scores):
+        if not slot_scores:
+            return []
+        slots = [slot for slot, _ in slot_scores]
+        rows = {
+            slot: (doc_id, text, metadata) for slot, doc_id, text, metadata in self._db.execute(
+                f"SELECT slot, id, text, metadata FROM docs WHERE slot IN ({','.join('?' * len(slots))})", slots
+            ).fetchall()
+        }
+        results = []
+        for slot, score in slot_scores:
+            if slot in rows:
+                doc_id, text, metadata = rows[slot]
+                results.append((Document(id=doc_id, page_content=text, metadata=json.loads(metadata)), score))
+        return results
+
+    def _filtered_slots(self, filter):
+        clauses, params = _where_clauses(filter)
+        return [row[0] for row in self._db.execute(
+            "SELECT slot FROM docs WHERE " + " AND ".join(clauses), params
+        ).fetchall()]
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None):
+        """Metadata equality filters are applied before the vector scan."""
+        with self._lock:
+            slots = self._filtered_slots(filter) if filter else None
+            return self._documents(self.search_slots(embedding, k, slots=slots))
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter=filter)]
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k, filter=filter)
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter=filter)]
+
+    def get(self, ids=None, where=None, **kwargs):
+        """Chroma-style get by ids and/or metadata equality filter."""
+        clauses, params = [], []
+        if ids is not None:
+            if not ids:
+                return {"ids": [], "documents": [], "metadatas": []}
+            clauses.append(f"id IN ({','.join('?' * len(ids))})")
+            params.extend(ids)
+        where_clauses, where_params = _where_clauses(where)
+        clauses.extend(where_clauses)
+        params.extend(where_params)
+        sql = "SELECT id, text, metadata FROM docs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return {
+            "ids": [row[0] for row in rows],
+            "documents": [row[1] for row in rows],
+            "metadatas": [json.loads(row[2]) for row in rows],
+        }
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, collection_name='default',
+                   persist_directory='Chroma', **kwargs):
+        store = cls(collection_name=collection_name, embedding_function=embedding,
+                    persist_directory=persist_directory, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
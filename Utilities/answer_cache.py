@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+
+def normalize_query(query):
+    """Lower-cases and collapses whitespace so trivial variants share a key."""
+    return " ".join(query.lower().split())
+
+
+class SemanticAnswerCache:
+    """
+    In-memory answer cache keyed by collection and corpus version.
+    Exact repeats are a dictionary lookup; paraphrases match when the cosine
+    similarity of their (normalized) query embeddings reaches the threshold.
+    Entries expire after ttl seconds and the least recently used are evicted
+    beyond max_entries.
+    """
+
+    def __init__(self, threshold=0.92, ttl=3600, max_entries=1024):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _live(self, key, entry, now):
+        if now - entry["created"] > self.ttl:
+            del self._entries[key]
+            return False
+        return True
+
+    def get_exact(self, collection, version, query):
+        """Returns the cached entry for an exact (normalized) repeat, or None."""
+        key = (collection, version, normalize_query(query))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._live(key, entry, now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        return None
+
+    def get_similar(self, collection, version, vector):
+        """Returns the most similar cached entry above the threshold, or None."""
+        now = time.time()
+        with self._lock:
+            candidates = [
+                (key, entry) for key, entry in list(self._entries.items())
+                if key[0] == collection and key[1] == version and self._live(key, entry, now)
+            ]
+            if candidates:
+                matrix = np.asarray([entry["vector"] for _, entry in candidates], dtype=np.float32)
+                scores = matrix @ np.asarray(vector, dtype=np.float32)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.semantic_hits += 1
+                    return entry
+            self.misses += 1
+        return None
+
+    def put(self, collection, version, query, vector, answer, sources):
+        key = (collection, version, normalize_query(query))
+        with self._lock:
+            self._entries[key] = {
+                "answer": answer,
+                "sources": sources,
+                "vector": vector,
+                "created": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, collection):
+        """Drops every entry of a collection (called when it is re-ingested)."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == collection]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "entries": entries,
+            "exact_hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,300 @@
+import bisect
+import os
+import re
+import threading
+from langchain_core.documents import Document
+from Utilities.embeddings import EMBEDDING_CACHE_FOLDER, EMBEDDING_MODEL
+
+STRATEGIES = ("recursive", "structure", "chars")
+# all-mpnet-base-v2 truncates at 384 tokens; leave room for the instruction prefix.
+DEFAULT_CHUNK_TOKENS = 256
+DEFAULT_CHUNK_OVERLAP = 32
+CHUNKING_REVISION = "v3"
+SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+LINE_BREAK = re.compile(r"\r\n|\r|\n")
+BLANK_LINES = re.compile(r"(?:\r\n|\r|\n)[ \t]*(?:\r\n|\r|\n)\s*")
+HEADING = re.compile(
+    r"^(?:#{1,6}\s+\S.*"                        # Markdown heading
+    r"|\d+(?:\.\d+)*\.?\s+[A-Z][^.!?]{0,80}"    # numbered heading: "2.1 Installation"
+    r"|[A-Z][A-Z0-9 ,:&/()-]{3,80})$"           # ALL CAPS heading
+)
+
+
+def line_offsets(text):
+    """
+    Start offset of every line in text; \r\n, \r and \n all end a line.
+    """
+    return [0] + [match.end() for match in LINE_BREAK.finditer(text)]
+
+
+_length_function = None
+_length_lock = threading.Lock()
+
+def get_length_function():
+    """
+    Returns (name, fn) measuring text length in tokens, as pinned by
+    WORDSMITH_CHUNK_TOKENIZER: 'model' (default) uses the embedding model's
+    own tokenizer, 'tiktoken' the cl100k_base encoding and 'chars' plain
+    characters. The chosen tokenizer is loaded explicitly and an error is
+    raised when it is unavailable, so chunk boundaries (and Chunker.version)
+    never depend on which files happen to be cached.
+    """
+    global _length_function
+    if _length_function is None:
+        with _length_lock:
+            if _length_function is None:
+                _length_function = _load_length_function(os.getenv("WORDSMITH_CHUNK_TOKENIZER", "model"))
+    return _length_function
+
+
+def _load_length_function(preference):
+    if preference == "chars":
+        return "chars", len
+    if preference == "tiktoken":
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return "cl100k", lambda text: len(encoding.encode(text, disallowed_special=()))
+    if preference == "model":
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        try:
+            # Same repository and cache folder the embedding model is loaded from.
+            path = hf_hub_download(f"sentence-transformers/{EMBEDDING_MODEL}", "tokenizer.json",
+                                   cache_dir=EMBEDDING_CACHE_FOLDER)
+        except Exception as e:
+            raise RuntimeError(
+                f"Tokenizer of {EMBEDDING_MODEL} is unavailable ({e}); download the model "
+                "or set WORDSMITH_CHUNK_TOKENIZER to 'tiktoken' or 'chars'"
+            ) from e
+        tokenizer = Tokenizer.from_file(path)
+        tokenizer.no_truncation()
+        tokenizer.no_padding()
+        return EMBEDDING_MODEL, lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+    raise ValueError(f"Unknown chunk tokenizer: {preference}")
+
+
+class Chunker:
+    """
+    Splits text into (start offset, text, extra metadata) pieces.
+
+    Strategies:
+      recursive: paragraph > line > sentence > word boundaries, sized in tokens.
+      structure: chunks never cross a heading; whole paragraphs are packed up
+                 to the token budget and each chunk records its section heading.
+                 Paragraphs over the budget fall back to the recursive splitter.
+      chars:     the former fixed 512/100-character splitter, for comparison.
+    """
+
+    def __init__(self, strategy="recursive", chunk_tokens=DEFAULT_CHUNK_TOKENS,
+                 chunk_overlap=DEFAULT_CHUNK_OVERLAP, length_function=None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown chunking strategy: {strategy}")
+        self.strategy = strategy
+        if strategy == "chars":
+            self.tokenizer_name, self.length, self.chunk_tokens, self.chunk_overlap = "chars", len, 512, 100
+        else:
+            self.tokenizer_name, self.length = length_function or get_length_function()
+            self.chunk_tokens, self.chunk_overlap = chunk_tokens, chunk_overlap
+
+    @property
+    def version(self):
+        """Identifies the chunk boundaries this configuration produces."""
+        return f"{self.strategy}-{self.chunk_tokens}-{self.chunk_overlap}-{self.tokenizer_name}-{CHUNKING_REVISION}"
+
+    def _recursive(self, text, offset=0):
+        for start, end in self._spans(text, 0, len(text), SEPARATORS):
+            yield offset + start, text[start:end], {}
+
+    def _spans(self, text, start, end, separators):
+        """
+        (start, end) chunk spans of text[start:end]. Same splits and merges as
+        LangChain's RecursiveCharacterTextSplitter (keep_separator="end"), but
+        offsets are carried along instead of searched for afterwards, which
+        goes wrong once a passage repeats.
+        """
+        segment = text[start:end]
+        separator, remaining = "", []
+        for i, candidate in enumerate(separators):
+            if candidate == "" or candidate in segment:
+                separator, remaining = candidate, separators[i + 1:]
+                break
+        pending = []
+        for piece_start, piece_end in _pieces(text, start, end, separator):
+            if self.length(text[piece_start:piece_end]) < self.chunk_tokens:
+                pending.append((piece_start, piece_end))
+                continue
+            if pending:
+                yield from self._merge(text, pending)
+                pending = []
+            if remaining:
+                yield from self._spans(text, piece_start, piece_end, remaining)
+            else:
+                yield piece_start, piece_end
+        if pending:
+            yield from self._merge(text, pending)
+
+    def _merge(self, text, pieces):
+        """Packs adjacent pieces up to chunk_tokens, repeating up to chunk_overlap tokens."""
+        current, sizes = [], []
+        for piece_start, piece_end in pieces:
+            size = self.length(text[piece_start:piece_end])
+            if current and sum(sizes) + size > self.chunk_tokens:
+                span = _stripped(text, current[0][0], current[-1][1])
+                if span:
+                    yield span
+                while sizes and (sum(sizes) > self.chunk_overlap or sum(sizes) + size > self.chunk_tokens):
+                    current.pop(0)
+                    sizes.pop(0)
+            current.append((piece_start, piece_end))
+            sizes.append(size)
+        if current:
+            span = _stripped(text, current[0][0], current[-1][1])
+            if span:
+                yield span
+
+    def _blocks(self, text):
+        """Paragraph spans (start, end, section), with headings starting sections."""
+        section = None
+        position = 0
+        for separator in list(BLANK_LINES.finditer(text)) + [None]:
+            end = separator.start() if separator else len(text)
+            start = position
+            for line_start, line in _lines(text, start, end):
+                stripped = line.strip()
+                if stripped and len(stripped) <= 100 and HEADING.match(stripped):
+                    if line_start > start:
+                        yield start, line_start, section
+                    section = stripped.lstrip("#").strip()
+                    start = line_start
+            if text[start:end].strip():
+                yield start, end, section
+            position = separator.end() if separator else end
+
+    def _structure(self, text):
+        pending = None  # [start, end, section, tokens]
+        for start, end, section in self._blocks(text):
+            tokens = self.length(text[start:end])
+            if pending is not None and self._heading_only(text, pending) and pending[3] + tokens <= self.chunk_tokens:
+                # A heading followed by a subsection heading stays with its first paragraph.
+                pending[1:] = [end, section, pending[3] + tokens]
+                continue
+            if pending is not None and (section != pending[2] or pending[3] + tokens > self.chunk_tokens):
+                yield pending[0], text[pending[0]:pending[1]], {"section": pending[2]} if pending[2] else {}
+                pending = None
+            if tokens > self.chunk_tokens:
+                for piece_start, piece, _ in self._recursive(text[start:end], start):
+                    yield piece_start, piece, {"section": section} if section else {}
+            elif pending is None:
+                pending = [start, end, section, tokens]
+            else:
+                pending[1] = end
+                pending[3] += tokens
+        if pending is not None:
+            yield pending[0], text[pending[0]:pending[1]], {"section": pending[2]} if pending[2] else {}
+
+    @staticmethod
+    def _heading_only(text, block):
+        lines = [line.strip() for _, line in _lines(text, block[0], block[1])]
+        return all(not line or HEADING.match(line) for line in lines)
+
+    def split(self, text):
+        """Yields (start offset, chunk text, extra metadata) for one text."""
+        if self.strategy == "structure":
+            return self._structure(text)
+        return self._recursive(text)
+
+
+def _pieces(text, start, end, separator):
+    """Spans of text[start:end] split after every separator ("" splits characters)."""
+    if separator == "":
+        return [(i, i + 1) for i in range(start, end)]
+    pieces = []
+    position = start
+    while position < end:
+        found = text.find(separator, position, end)
+        piece_end = end if found < 0 else found + len(separator)
+        pieces.append((position, piece_end))
+        position = piece_end
+    return pieces
+
+
+def _stripped(text, start, end):
+    """(start, end) without surrounding whitespace, or None when nothing is left."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
+
+
+def _lines(text, start, end):
+    position = start
+    for match in LINE_BREAK.finditer(text, start, end):
+        yield position, text[position:match.start()]
+        position = match.end()
+    if position < end:
+        yield position, text[position:end]
+
+
+def _documents(source):
+    """Flattens a string, a Document or an iterable of either into Documents."""
+    if isinstance(source, str):
+        yield Document(page_content=source)
+    elif isinstance(source, Document):
+        yield source
+    else:
+        for item in source:
+            yield from _documents(item)
+
+
+def iter_chunks(source, metadata=False, chunker=None):
+    """
+    Streams chunk Documents from a string, a Document or an iterable/generator
+    of either, without materializing the input. Every chunk keeps its source
+    metadata plus start_index. With metadata, chunks also get page_number,
+    line_number, end_line_number, char_start/char_end (the chunk is
+    page_content[char_start:char_end] of its page) and a running chunk_id.
+    """
+    chunker = chunker or get_chunker()
+    count = 0
+    for position, page in enumerate(_documents(source)):
+        text = page.page_content
+        offsets = line_offsets(text) if metadata else None
+        page_number = page.metadata.get("page")
+        page_number = page_number + 1 if isinstance(page_number, int) else position + 1
+        for start, chunk_text, extra in chunker.split(text):
+            chunk_metadata = dict(page.metadata, start_index=start, **extra)
+            if metadata:
+                end = start + len(chunk_text)
+                chunk_metadata.update({
+                    "page_number": page_number,
+                    "line_number": bisect.bisect_right(offsets, start),
+                    "end_line_number": bisect.bisect_right(offsets, max(start, end - 1)),
+                    "char_start": start,
+                    "char_end": end,
+                    "chunk_id": count
+                })
+            count += 1
+            yield Document(page_content=chunk_text, metadata=chunk_metadata)
+
+
+_chunker = None
+_chunker_lock = threading.Lock()
+
+def get_chunker():
+    """
+    Process-wide default Chunker, configured by WORDSMITH_CHUNK_STRATEGY
+    (recursive, structure or chars), WORDSMITH_CHUNK_TOKENS and WORDSMITH_CHUNK_OVERLAP.
+    """
+    global _chunker
+    if _chunker is None:
+        with _chunker_lock:
+            if _chunker is None:
+                _chunker = Chunker(
+                    strategy=os.getenv("WORDSMITH_CHUNK_STRATEGY", "recursive"),
+                    chunk_tokens=int(os.getenv("WORDSMITH_CHUNK_TOKENS", str(DEFAULT_CHUNK_TOKENS))),
+                    chunk_overlap=int(os.getenv("WORDSMITH_CHUNK_OVERLAP", str(DEFAULT_CHUNK_OVERLAP)))
+                )
+    return _chunker
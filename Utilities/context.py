@@ -0,0 +1,120 @@
+import re
+import threading
+from langchain_core.documents import Document
+
+WORD = re.compile(r"\w+")
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def count_tokens(text):
+    """
+    Token count with tiktoken's cl100k_base encoding, falling back to a
+    4-characters-per-token estimate when the encoding is unavailable.
+    """
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    _encoding = False
+    if _encoding is False:
+        return max(1, len(text) // 4)
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def _shingles(text, size=3):
+    words = WORD.findall(text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+def _span(doc):
+    metadata = doc.metadata
+    if "char_start" not in metadata or "char_end" not in metadata:
+        return None
+    return metadata.get("source"), metadata.get("page_number", metadata.get("page"))
+
+
+def _merge_groups(documents):
+    """Returns [(merged_document, members)] in the order of each group's best rank."""
+    groups, order = {}, []
+    for rank, doc in enumerate(documents):
+        key = _span(doc)
+        if key is None:
+            order.append((rank, [doc]))
+            continue
+        if key not in groups:
+            groups[key] = []
+            order.append((rank, groups[key]))
+        groups[key].append(doc)
+
+    merged = []
+    for rank, members in order:
+        members = sorted(members, key=lambda d: d.metadata.get("char_start", 0))
+        current, parts = None, []
+        for doc in members:
+            start, end = doc.metadata.get("char_start"), doc.metadata.get("char_end")
+            if current is not None and start is not None and start <= current.metadata["char_end"]:
+                overlap = current.metadata["char_end"] - start
+                if end > current.metadata["char_end"]:
+                    current.page_content += doc.page_content[overlap:]
+                    current.metadata["char_end"] = end
+                    current.metadata["end_line_number"] = doc.metadata.get("end_line_number")
+                parts.append(doc)
+                continue
+            if current is not None:
+                merged.append((rank, current, parts))
+            current, parts = Document(page_content=doc.page_content, metadata=dict(doc.metadata)), [doc]
+        merged.append((rank, current, parts))
+    merged.sort(key=lambda item: item[0])
+    return [(doc, parts) for _, doc, parts in merged]
+
+
+def merge_adjacent(documents):
+    """
+    Merges overlapping or touching chunks of the same source page into one
+    Document spanning both. The result keeps the order of each group's best
+    ranked member.
+    """
+    return [doc for doc, _ in _merge_groups(documents)]
+
+
+def drop_near_duplicates(documents, threshold=0.85):
+    """Drops documents whose 3-word shingles overlap a better ranked one by >= threshold (Jaccard)."""
+    kept, kept_shingles = [], []
+    for doc in documents:
+        shingles = _shingles(doc.page_content)
+        if any(len(shingles & other) / max(1, len(shingles | other)) >= threshold for other in kept_shingles):
+            continue
+        kept.append(doc)
+        kept_shingles.append(shingles)
+    return kept
+
+
+def pack_context(documents, token_budget=768, tokenizer=count_tokens, dedupe_threshold=0.85, max_chunks=None):
+    """
+    Builds the prompt context from ranked candidates: merges adjacent chunks,
+    drops near-duplicates, then adds documents in rank order while they fit in
+    token_budget and, with max_chunks, while at most that many retrieved chunks
+    are used (a merged span counts each chunk it covers). A merged span that
+    does not fit is retried as its original chunks. Returns the selected Documents.
+    """
+    groups = _merge_groups(documents)
+    parts_of = {id(doc): parts for doc, parts in groups}
+    max_chunks = max_chunks or len(documents)
+    packed, used, chunks = [], 0, 0
+    for doc in drop_near_duplicates([doc for doc, _ in groups], dedupe_threshold):
+        parts = parts_of[id(doc)]
+        fits = tokenizer(doc.page_content) + used <= token_budget and chunks + len(parts) <= max_chunks
+        for candidate in [doc] if fits else parts:
+            tokens = tokenizer(candidate.page_content)
+            if used + tokens <= token_budget and chunks < max_chunks:
+                packed.append(candidate)
+                used += tokens
+                chunks += 1 if candidate is not doc else len(parts)
+        if chunks >= max_chunks:
+            break
+    return packed
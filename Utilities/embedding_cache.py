@@ -0,0 +1,249 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache.
+    Vectors live in a memory-mapped float32 matrix and a SQLite index maps
+    sha256(model, instruction, text) to a row of that matrix. When the matrix
+    is full the least recently used rows are overwritten. Lookups and writes
+    run in BEGIN IMMEDIATE transactions, so processes sharing the cache never
+    hand out the same row twice or read a row while it is being rewritten.
+    """
+
+    def __init__(self, path='Embeddings/cache', max_bytes=512 * 1024 * 1024):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.matrix_path = os.path.join(path, 'vectors.f32')
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(path, 'index.sqlite3'), timeout=60, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, slot INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_used)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        self._db.commit()
+        self._matrix = None
+        self.dim = self._get_meta("dim")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_served = 0
+        if self.dim:
+            self._open_matrix()
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model, instruction, text):
+        """Cache key for one text under a model and instruction."""
+        payload = "\0".join((model, instruction, text)).encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def _get_meta(self, name):
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name, value):
+        self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    @property
+    def capacity(self):
+        return max(1, self.max_bytes // (self.dim * 4)) if self.dim else 0
+
+    def _open_matrix(self):
+        expected = self.capacity * self.dim * 4
+        if os.path.exists(self.matrix_path) and os.path.getsize(self.matrix_path) != expected:
+            # Size budget changed since the cache was written; start over.
+            os.remove(self.matrix_path)
+            self._db.execute("DELETE FROM entries")
+            self._set_meta("next_slot", 0)
+        mode = 'r+' if os.path.exists(self.matrix_path) else 'w+'
+        self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode=mode, shape=(self.capacity, self.dim))
+
+    @contextmanager
+    def _transaction(self):
+        """Exclusive transaction across threads and processes."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if self._matrix is None and self._get_meta("dim"):
+                    # Another process stored the first vectors.
+                    self.dim = self._get_meta("dim")
+                    self._open_matrix()
+                yield
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+
+    def get_many(self, keys):
+        """
+        Returns {key: vector} for the keys that are cached.
+        """
+        found = {}
+        if not keys:
+            return found
+        with self._transaction():
+            if self._matrix is None:
+                self.misses += len(keys)
+                return found
+            unique = list(dict.fromkeys(keys))
+            for start in range(0, len(unique), 500):
+                part = unique[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for key, slot in rows:
+                    found[key] = self._matrix[slot].tolist()
+            if found:
+                now = time.time()
+                self._db.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+        hits = sum(1 for k in keys if k in found)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        self.bytes_served += hits * self.dim * 4
+        return found
+
+    def put_many(self, items):
+        """
+        Stores {key: vector}, evicting least recently used rows when full.
+        """
+        if not items:
+            return
+        with self._transaction():
+            if self._matrix is None:
+                self.dim = len(next(iter(items.values())))
+                self._set_meta("dim", self.dim)
+                self._set_meta("next_slot", 0)
+                self._open_matrix()
+            items = list(items.items())[-self.capacity:]
+            existing = {}
+            for start in range(0, len(items), 500):
+                part = [k for k, _ in items[start:start + 500]]
+                existing.update(self._db.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall())
+            now = time.time()
+            # Touch rows being rewritten so eviction never picks them.
+            self._db.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, k) for k in existing])
+            next_slot = self._get_meta("next_slot") or 0
+            needed = sum(1 for k, _ in items if k not in existing)
+            fresh = min(needed, self.capacity - next_slot)
+            slots = list(range(next_slot, next_slot + fresh))
+            if needed > fresh:
+                victims = self._db.execute(
+                    "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (needed - fresh,)
+                ).fetchall()
+                self._db.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in victims])
+                slots.extend(slot for _, slot in victims)
+                self.evictions += len(victims)
+            self._set_meta("next_slot", next_slot + fresh)
+            rows = []
+            slot_iter = iter(slots)
+            for key, vector in items:
+                slot = existing.get(key)
+                if slot is None:
+                    slot = next(slot_iter)
+                self._matrix[slot] = np.asarray(vector, dtype=np.float32)
+                rows.append((key, slot, now))
+            # Vectors reach the file before the rows pointing at them are committed.
+            self._matrix.flush()
+            self._db.executemany("INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)", rows)
+
+    def stats(self):
+        """Hit/miss counters and storage usage."""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "capacity": self.capacity,
+            "bytes_stored": entries * (self.dim or 0) * 4,
+            "bytes_served": self.bytes_served,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class QueryVectorCache:
+    """
+    In-memory LRU of query text to vector, bounded by max_bytes of vector data.
+    Keys are normalized (case and whitespace) so trivial variants of a question
+    share an entry. Each hit is credited with the running average encode time
+    of a miss, which is reported as saved_seconds.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        from Utilities.answer_cache import normalize_query
+
+        self.max_bytes = max_bytes
+        self._normalize = normalize_query
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes_stored = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+        self._miss_seconds = None
+
+    def key(self, instruction, text):
+        return (instruction, self._normalize(text))
+
+    def get(self, key):
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += self._miss_seconds or 0.0
+            return vector.tolist()
+
+    def put(self, key, vector, encode_seconds=None):
+        """Stores a vector; encode_seconds is what computing it cost."""
+        array = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            if encode_seconds is not None:
+                previous = self._miss_seconds
+                self._miss_seconds = encode_seconds if previous is None else 0.9 * previous + 0.1 * encode_seconds
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes_stored -= old.nbytes
+            if array.nbytes > self.max_bytes:
+                return
+            self._entries[key] = array
+            self.bytes_stored += array.nbytes
+            while self.bytes_stored > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes_stored -= evicted.nbytes
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "evictions": self.evictions,
+                "bytes_stored": self.bytes_stored,
+                "max_bytes": self.max_bytes,
+                "saved_seconds": self.saved_seconds,
+                "avg_miss_ms": (self._miss_seconds or 0.0) * 1000,
+            }
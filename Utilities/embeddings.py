@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+from langchain_core.embeddings import Embeddings
+from Utilities import metrics
+from Utilities.embedding_cache import EmbeddingCache, QueryVectorCache
+
+EMBEDDING_MODEL = "all-mpnet-base-v2"
+EMBEDDING_CACHE_FOLDER = 'Embeddings'
+EMBED_INSTRUCTION = "Encode this document to make its content easily retrievable by relevant questions."
+QUERY_INSTRUCTION = "Embed this question to retrieve the most relevant information from stored documents."
+
+
+def _default_threads():
+    """Number of CPUs this process may actually run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+class EmbeddingEngine(Embeddings):
+    """
+    Process-wide instruction embedding model.
+    The model is loaded once and shared by every Streamlit session. Inputs are
+    sorted by length before batching so each batch pads to similar lengths.
+    Batch size and thread count come from WORDSMITH_EMBED_BATCH_SIZE and
+    WORDSMITH_EMBED_THREADS. Vectors are persisted in an EmbeddingCache
+    (WORDSMITH_EMBED_CACHE_MB, 0 disables it) so only cache misses reach the model.
+    Query vectors are additionally kept in an in-memory LRU shared by all
+    sessions (WORDSMITH_QUERY_CACHE_MB, 0 disables it).
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._load()
+                    cls._instance = instance
+        return cls._instance
+
+    def __init__(self):
+        # All state is set once in _load; repeated construction is a lookup.
+        pass
+
+    def _load(self):
+        import torch
+        from InstructorEmbedding import INSTRUCTOR
+
+        self.model_name = EMBEDDING_MODEL
+        self.embed_instruction = EMBED_INSTRUCTION
+        self.query_instruction = QUERY_INSTRUCTION
+        self.batch_size = int(os.getenv("WORDSMITH_EMBED_BATCH_SIZE", "32"))
+        self.num_threads = int(os.getenv("WORDSMITH_EMBED_THREADS", str(_default_threads())))
+        torch.set_num_threads(self.num_threads)
+        self.client = INSTRUCTOR(self.model_name, cache_folder=EMBEDDING_CACHE_FOLDER, device="cpu")
+        self._encode_lock = threading.Lock()
+        cache_mb = int(os.getenv("WORDSMITH_EMBED_CACHE_MB", "512"))
+        self.cache = EmbeddingCache(
+            os.path.join(EMBEDDING_CACHE_FOLDER, 'cache'), max_bytes=cache_mb * 1024 * 1024
+        ) if cache_mb > 0 else None
+        query_cache_mb = float(os.getenv("WORDSMITH_QUERY_CACHE_MB", "32"))
+        self.query_cache = QueryVectorCache(
+            max_bytes=int(query_cache_mb * 1024 * 1024)
+        ) if query_cache_mb > 0 else None
+        self.warmed_up = False
+
+    def encode(self, texts, instruction):
+        """
+        Encodes texts with an instruction and returns vectors in input order.
+        Cached vectors are reused; only misses are sent to the model.
+        """
+        texts = list(texts)
+        with metrics.stage("embed"):
+            return self._encode_cached(texts, instruction)
+
+    def _encode_cached(self, texts, instruction):
+        if self.cache is None:
+            return self._encode_uncached(texts, instruction)
+        keys = [EmbeddingCache.make_key(self.model_name, instruction, text) for text in texts]
+        found = self.cache.get_many(keys)
+        missing = list({key: text for key, text in zip(keys, texts) if key not in found}.items())
+        if missing:
+            encoded = self._encode_uncached([text for _, text in missing], instruction)
+            computed = {key: vector for (key, _), vector in zip(missing, encoded)}
+            self.cache.put_many(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def _encode_uncached(self, texts, instruction):
+        vectors = [None] * len(texts)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            with self._encode_lock:
+                encoded = self.client.encode(
+                    [[instruction, texts[i]] for i in batch],
+                    batch_size=len(batch),
+                    normalize_embeddings=True,
+                    show_progress_bar=False
+                )
+            for i, vector in zip(batch, encoded):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def warm_up(self):
+        """
+        Runs a throwaway document and query batch through the model so kernel
+        initialization and allocations happen before the first real request.
+        Bypasses both caches.
+        """
+        if not self.warmed_up:
+            self._encode_uncached(["warm-up document"], self.embed_instruction)
+            self._encode_uncached(["warm-up question?"], self.query_instruction)
+            self.warmed_up = True
+
+    def cache_stats(self):
+        """Embedding cache counters, or None when the cache is disabled."""
+        return self.cache.stats() if self.cache is not None else None
+
+    def query_cache_stats(self):
+        """Query LRU hit rate and estimated time saved, or None when disabled."""
+        return self.query_cache.stats() if self.query_cache is not None else None
+
+    def embed_documents(self, texts):
+        return self.encode(texts, self.embed_instruction)
+
+    def embed_query(self, text):
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts):
+        """
+        Embeds several queries; those in the query LRU are served from memory
+        and the rest are encoded in one batched call.
+        """
+        texts = list(texts)
+        if self.query_cache is None:
+            return self.encode(texts, self.query_instruction)
+        keys = [self.query_cache.key(self.query_instruction, text) for text in texts]
+        vectors = [self.query_cache.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        metrics.count("query_cache_hit", len(texts) - len(missing))
+        if missing:
+            metrics.count("query_cache_miss", len(missing))
+            started = time.perf_counter()
+            encoded = self.encode([texts[i] for i in missing], self.query_instruction)
+            per_query = (time.perf_counter() - started) / len(missing)
+            for i, vector in zip(missing, encoded):
+                self.query_cache.put(keys[i], vector, encode_seconds=per_query)
+                vectors[i] = vector
+        return vectors
+
+
+_warm_up_started = False
+_warm_up_lock = threading.Lock()
+
+def warm_up_in_background():
+    """
+    Loads and warms the embedding engine on a daemon thread, once per process,
+    so the first user does not pay for model loading. Disabled with WORDSMITH_WARMUP=0.
+    """
+    global _warm_up_started
+    if os.getenv("WORDSMITH_WARMUP", "1") != "1" or os.getenv("WORDSMITH_EMBEDDING_BACKEND") == "hash":
+        return
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+
+    def run():
+        try:
+            EmbeddingEngine().warm_up()
+        except Exception as e:
+            print(f"Embedding warm-up failed: {e}")
+
+    threading.Thread(target=run, daemon=True, name="embedding-warm-up").start()
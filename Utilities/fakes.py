@@ -0,0 +1,109 @@
+import asyncio
+import hashlib
+import math
+import re
+import time
+from functools import lru_cache
+from typing import List
+from pydantic import PrivateAttr
+from Utilities import metrics
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+WORD = re.compile(r"[a-z]+")
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline stand-in for the Gemini chat model.
+    Cycles through canned responses and streams them word by word, with optional
+    delays to mimic time-to-first-token and per-token latency. The async methods
+    sleep without blocking the event loop, for concurrency tests. With fail_every=n
+    every n-th call raises ConnectionError, to exercise retries.
+    """
+    responses: List[str] = ["This is a fake answer generated offline."]
+    first_token_delay: float = 0.0
+    token_delay: float = 0.0
+    fail_every: int = 0
+    _calls: int = PrivateAttr(default=0)
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _next_tokens(self):
+        text = self.responses[self._calls % len(self.responses)]
+        self._calls += 1
+        if self.fail_every and self._calls % self.fail_every == 0:
+            raise ConnectionError("Injected fake LLM failure")
+        words = text.split(" ")
+        return [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._next_tokens()
+        time.sleep(self.first_token_delay + self.token_delay * len(tokens))
+        message = AIMessage(content="".join(tokens))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_delay)
+        for token in self._next_tokens():
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+            time.sleep(self.token_delay)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._next_tokens()
+        await asyncio.sleep(self.first_token_delay + self.token_delay * len(tokens))
+        message = AIMessage(content="".join(tokens))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token_delay)
+        for token in self._next_tokens():
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+            await asyncio.sleep(self.token_delay)
+
+
+@lru_cache(maxsize=65536)
+def _trigram_bucket(gram):
+    return int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=4).digest(), "little")
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Offline, deterministic stand-in for the instruction embedding model:
+    hashed character trigrams, L2 normalized.
+    Trigrams make it tolerant to inflections; digits are ignored on purpose so,
+    like subword encoders, it is weak at telling identifiers apart.
+    """
+
+    def __init__(self, dim=512):
+        self.dim = dim
+
+    def _embed(self, text):
+        vector = [0.0] * self.dim
+        for token in WORD.findall(text.lower()):
+            padded = f" {token} "
+            for start in range(len(padded) - 2):
+                vector[_trigram_bucket(padded[start:start + 3]) % self.dim] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        with metrics.stage("embed"):
+            return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        with metrics.stage("embed"):
+            return self._embed(text)
+
+    def embed_queries(self, texts):
+        return self.embed_documents(texts)
@@ -0,0 +1,545 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import weakref
+from typing import Any, Optional
+from pydantic import PrivateAttr
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from Utilities import metrics
+
+# Provider errors worth retrying, matched by class name so no provider SDK is imported here.
+RETRYABLE_ERRORS = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded",
+                    "InternalServerError", "GatewayTimeout"}
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class GatewayOverloaded(RuntimeError):
+    """Raised when more LLM calls are waiting than the gateway accepts."""
+
+
+class GatewayTimeout(TimeoutError):
+    """Raised when an LLM call cannot be started or finished before its deadline."""
+
+
+def is_retryable(error):
+    """True for rate-limit, overload and transient network errors."""
+    if isinstance(error, (ConnectionError, TimeoutError)) and not isinstance(error, GatewayTimeout):
+        return True
+    if type(error).__name__ in RETRYABLE_ERRORS:
+        return True
+    status = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return status in RETRYABLE_STATUS
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: rate tokens per second, up to burst at once.
+    A rate of 0 or less disables limiting. Tokens are reserved ahead of time, so
+    threads and coroutines share one limit and each sleeps in its own way.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, deadline):
+        """Reserves one token; returns the seconds until it is available, or None if that is past deadline."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if now + wait > deadline:
+                return None
+            self._tokens -= 1
+            return wait
+
+    def acquire(self, deadline):
+        """Takes one token, waiting for it; False if it would only arrive after deadline."""
+        wait = self.reserve(deadline)
+        if wait is None:
+            return False
+        if wait:
+            time.sleep(wait)
+        return True
+
+    async def acquire_async(self, deadline):
+        """acquire() for coroutines: waits with asyncio.sleep."""
+        wait = self.reserve(deadline)
+        if wait is None:
+            return False
+        if wait:
+            await asyncio.sleep(wait)
+        return True
+
+
+class _Flight:
+    """Results of one backend call, replayed to every caller that asked for the same prompt."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.items = []
+        self.done = False
+        self.error = None
+
+    def publish(self, item):
+        with self.condition:
+            self.items.append(item)
+            self.condition.notify_all()
+
+    def finish(self, error=None):
+        with self.condition:
+            self.done = True
+            self.error = error
+            self.condition.notify_all()
+
+    def follow(self, deadline):
+        index = 0
+        while True:
+            with self.condition:
+                while index >= len(self.items) and not self.done:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        metrics.count("llm_timeout")
+                        raise GatewayTimeout("Timed out waiting for an identical in-flight LLM call")
+                    self.condition.wait(remaining)
+                if index < len(self.items):
+                    item = self.items[index]
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            index += 1
+            yield item
+
+
+class _AsyncFlight:
+    """_Flight for coroutines of one event loop."""
+
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, item):
+        self.items.append(item)
+        self._notify()
+
+    def finish(self, error=None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+    async def follow(self, deadline):
+        index = 0
+        while True:
+            if index < len(self.items):
+                index += 1
+                yield self.items[index - 1]
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    metrics.count("llm_timeout")
+                    raise GatewayTimeout("Timed out waiting for an identical in-flight LLM call")
+
+
+class _LoopState:
+    """Concurrency slots and in-flight prompts of the async path, per event loop."""
+
+    def __init__(self, max_concurrency):
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.flights = {}
+
+
+class LLMGateway(BaseChatModel):
+    """
+    Chat model wrapper that every LLM call in the app goes through.
+
+    - Rate limiting: a token bucket allows requests_per_minute calls, with bursts of up to burst.
+    - Concurrency: at most max_concurrency backend calls run at once; up to
+      max_queue more wait for a slot, beyond that calls fail fast with GatewayOverloaded.
+    - Deadlines: a call that cannot get a slot, a rate token or a retry within
+      timeout seconds raises GatewayTimeout.
+    - Retries: rate-limit and transient errors are retried up to max_retries
+      times with exponential backoff and full jitter. A stream is only retried
+      before its first chunk.
+    - Single-flight: identical prompts issued while one is in flight share its
+      result (or its stream) instead of calling the backend again.
+
+    ainvoke/astream have native async paths: they wait on asyncio primitives
+    and call the backend's async methods, so waiting coroutines hold no threads.
+    The rate limit and queue bound are shared with the sync path; concurrency
+    slots and single-flight are kept per event loop.
+    """
+    backend: Any
+    requests_per_minute: float = 60.0
+    burst: int = 10
+    max_concurrency: int = 8
+    max_queue: int = 64
+    timeout: float = 60.0
+    max_retries: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    _bucket: Any = PrivateAttr(default=None)
+    _slots: Any = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _flights: dict = PrivateAttr(default_factory=dict)
+    _waiting: int = PrivateAttr(default=0)
+    _running: int = PrivateAttr(default=0)
+    _loops: Any = PrivateAttr(default_factory=weakref.WeakKeyDictionary)
+
+    def model_post_init(self, __context):
+        super().model_post_init(__context)
+        self._bucket = TokenBucket(self.requests_per_minute / 60.0, self.burst)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    @classmethod
+    def from_env(cls, backend):
+        """Gateway configured from the WORDSMITH_LLM_* environment variables."""
+        return cls(
+            backend=backend,
+            requests_per_minute=float(os.getenv("WORDSMITH_LLM_RPM", "60")),
+            burst=int(os.getenv("WORDSMITH_LLM_BURST", "10")),
+            max_concurrency=int(os.getenv("WORDSMITH_LLM_CONCURRENCY", "8")),
+            max_queue=int(os.getenv("WORDSMITH_LLM_QUEUE", "64")),
+            timeout=float(os.getenv("WORDSMITH_LLM_TIMEOUT", "60")),
+            max_retries=int(os.getenv("WORDSMITH_LLM_RETRIES", "3"))
+        )
+
+    @property
+    def _llm_type(self):
+        return "wordsmith-gateway"
+
+    @property
+    def _identifying_params(self):
+        return {"backend": getattr(self.backend, "_llm_type", type(self.backend).__name__)}
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._flights) + sum(len(state.flights) for state in self._loops.values())
+            return {"waiting": self._waiting, "running": self._running, "in_flight_prompts": in_flight}
+
+    def _key(self, kind, messages, stop, kwargs):
+        payload = json.dumps([kind, [(m.type, m.content) for m in messages], stop, kwargs],
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _join(self, key):
+        """Returns (flight, leader): a new flight when none is running for key, else the running one."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                metrics.count("llm_coalesced")
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            return flight, True
+
+    def _land(self, key, flight, error=None):
+        with self._lock:
+            self._flights.pop(key, None)
+        flight.finish(error)
+
+    def _enqueue(self):
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                metrics.count("llm_rejected")
+                raise GatewayOverloaded(f"{self._waiting} LLM calls already waiting")
+            self._waiting += 1
+
+    def _acquire_slot(self, deadline):
+        self._enqueue()
+        try:
+            acquired = self._slots.acquire(timeout=max(0.0, deadline - time.monotonic()))
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            metrics.count("llm_timeout")
+            raise GatewayTimeout("Timed out waiting for a free LLM slot")
+        with self._lock:
+            self._running += 1
+
+    def _release_slot(self):
+        with self._lock:
+            self._running -= 1
+        self._slots.release()
+
+    def _attempt(self, call, deadline):
+        """Runs call under the rate limit, retrying transient errors until deadline."""
+        for attempt in range(self.max_retries + 1):
+            if not self._bucket.acquire(deadline):
+                metrics.count("llm_timeout")
+                raise GatewayTimeout("Rate limit leaves no room before the deadline")
+            try:
+                metrics.count("llm_calls")
+                return call()
+            except Exception as e:
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                if attempt == self.max_retries or not is_retryable(e) or time.monotonic() + delay >= deadline:
+                    raise
+                metrics.count("llm_retries")
+                time.sleep(delay)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        deadline = time.monotonic() + self.timeout
+        key = self._key("generate", messages, stop, kwargs)
+        flight, leader = self._join(key)
+        if not leader:
+            return next(flight.follow(deadline))
+        try:
+            self._acquire_slot(deadline)
+            try:
+                message = self._attempt(lambda: self.backend.invoke(messages, stop=stop, **kwargs), deadline)
+            finally:
+                self._release_slot()
+        except Exception as e:
+            self._land(key, flight, e)
+            raise
+        result = ChatResult(generations=[ChatGeneration(message=message)])
+        flight.publish(result)
+        self._land(key, flight)
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        deadline = time.monotonic() + self.timeout
+        key = self._key("stream", messages, stop, kwargs)
+        flight, leader = self._join(key)
+        chunks = flight.follow(deadline) if not leader else self._lead_stream(key, flight, messages, stop, kwargs, deadline)
+        try:
+            for chunk in chunks:
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        finally:
+            chunks.close()
+
+    def _lead_stream(self, key, flight, messages, stop, kwargs, deadline):
+        error = None
+        try:
+            self._acquire_slot(deadline)
+            try:
+                def start():
+                    stream = iter(self.backend.stream(messages, stop=stop, **kwargs))
+                    return stream, next(stream, None)
+                stream, first = self._attempt(start, deadline)
+                if first is not None:
+                    for message in _chain(first, stream):
+                        chunk = ChatGenerationChunk(message=message)
+                        flight.publish(chunk)
+                        yield chunk
+            finally:
+                self._release_slot()
+        except GeneratorExit:
+            error = GatewayTimeout("The identical LLM stream being shared was abandoned")
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._land(key, flight, error)
+
+
+    def _loop_state(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._loops.get(loop)
+            if state is None:
+                state = self._loops[loop] = _LoopState(self.max_concurrency)
+            return state
+
+    def _join_async(self, state, key):
+        flight = state.flights.get(key)
+        if flight is not None:
+            metrics.count("llm_coalesced")
+            return flight, False
+        flight = state.flights[key] = _AsyncFlight()
+        return flight, True
+
+    def _land_async(self, state, key, flight, error=None):
+        state.flights.pop(key, None)
+        flight.finish(error)
+
+    async def _acquire_slot_async(self, state, deadline):
+        if not state.slots.locked():
+            # A free slot is taken without suspending, so it never counts as queued.
+            await state.slots.acquire()
+        else:
+            self._enqueue()
+            try:
+                await asyncio.wait_for(state.slots.acquire(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                metrics.count("llm_timeout")
+                raise GatewayTimeout("Timed out waiting for a free LLM slot")
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+        with self._lock:
+            self._running += 1
+
+    def _release_slot_async(self, state):
+        with self._lock:
+            self._running -= 1
+        state.slots.release()
+
+    async def _attempt_async(self, call, deadline):
+        """_attempt for coroutines: call is an async function."""
+        for attempt in range(self.max_retries + 1):
+            if not await self._bucket.acquire_async(deadline):
+                metrics.count("llm_timeout")
+                raise GatewayTimeout("Rate limit leaves no room before the deadline")
+            try:
+                metrics.count("llm_calls")
+                return await call()
+            except Exception as e:
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                if attempt == self.max_retries or not is_retryable(e) or time.monotonic() + delay >= deadline:
+                    raise
+                metrics.count("llm_retries")
+                await asyncio.sleep(delay)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        deadline = time.monotonic() + self.timeout
+        state = self._loop_state()
+        key = self._key("generate", messages, stop, kwargs)
+        flight, leader = self._join_async(state, key)
+        if not leader:
+            follower = flight.follow(deadline)
+            try:
+                return await follower.__anext__()
+            finally:
+                await follower.aclose()
+        error = None
+        try:
+            await self._acquire_slot_async(state, deadline)
+            try:
+                message = await self._attempt_async(
+                    lambda: self.backend.ainvoke(messages, stop=stop, **kwargs), deadline
+                )
+            finally:
+                self._release_slot_async(state)
+            result = ChatResult(generations=[ChatGeneration(message=message)])
+            flight.publish(result)
+            return result
+        except asyncio.CancelledError:
+            error = GatewayTimeout("The identical LLM call being shared was cancelled")
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._land_async(state, key, flight, error)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        deadline = time.monotonic() + self.timeout
+        state = self._loop_state()
+        key = self._key("stream", messages, stop, kwargs)
+        flight, leader = self._join_async(state, key)
+        chunks = flight.follow(deadline) if not leader else \
+            self._lead_astream(state, key, flight, messages, stop, kwargs, deadline)
+        try:
+            async for chunk in chunks:
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        finally:
+            # Closing here releases the slot and flight of an abandoned stream right away.
+            await chunks.aclose()
+
+    async def _lead_astream(self, state, key, flight, messages, stop, kwargs, deadline):
+        error = None
+        try:
+            await self._acquire_slot_async(state, deadline)
+            try:
+                async def start():
+                    stream = self.backend.astream(messages, stop=stop, **kwargs).__aiter__()
+                    try:
+                        return stream, await stream.__anext__()
+                    except StopAsyncIteration:
+                        return stream, None
+                stream, first = await self._attempt_async(start, deadline)
+                if first is not None:
+                    async for message in _achain(first, stream):
+                        chunk = ChatGenerationChunk(message=message)
+                        flight.publish(chunk)
+                        yield chunk
+            finally:
+                self._release_slot_async(state)
+        except (GeneratorExit, asyncio.CancelledError):
+            error = GatewayTimeout("The identical LLM stream being shared was abandoned")
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._land_async(state, key, flight, error)
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+async def _achain(first, rest):
+    yield first
+    async for item in rest:
+        yield item
+
+
+### ----------- Backends -----------
+
+def _gemini_backend():
+    google_api_key = os.getenv("GOOGLE_API_KEY")
+    if not google_api_key:
+        raise EnvironmentError("Missing GOOGLE_API_KEY in .env.")
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    try:
+        return ChatGoogleGenerativeAI(
+            api_key=google_api_key,
+            model='gemini-1.5-flash-latest',
+            temperature=0.5
+        )
+    except Exception as e:
+        raise RuntimeError(f"Failed to initialize Gemini model: {e}")
+
+
+def _fake_backend():
+    from Utilities.fakes import FakeChatModel
+    return FakeChatModel(
+        first_token_delay=float(os.getenv("WORDSMITH_FAKE_LLM_LATENCY", "0")),
+        fail_every=int(os.getenv("WORDSMITH_FAKE_LLM_FAIL_EVERY", "0"))
+    )
+
+
+BACKENDS = {"gemini": _gemini_backend, "fake": _fake_backend}
+
+
+def register_backend(name, factory):
+    """Makes a chat model factory selectable with WORDSMITH_LLM_BACKEND=name."""
+    BACKENDS[name] = factory
+
+
+def create_backend(name: Optional[str] = None):
+    name = name or os.getenv("WORDSMITH_LLM_BACKEND", "gemini")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {name}")
+    return BACKENDS[name]()
@@ -0,0 +1,237 @@
+import contextvars
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+STAGES = ("load", "split", "embed", "upsert", "retrieve", "llm", "format")
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_enabled = os.getenv("WORDSMITH_METRICS") == "1"
+_NULL = nullcontext()
+_frame = contextvars.ContextVar("wordsmith_metrics_frame", default=None)
+_trace = contextvars.ContextVar("wordsmith_metrics_trace", default=None)
+
+
+def enabled():
+    return _enabled
+
+
+def enable(flag=True):
+    """Turns collection on or off at runtime (WORDSMITH_METRICS=1 enables it at start)."""
+    global _enabled
+    _enabled = flag
+
+
+class Registry:
+    """
+    Process-wide stage histograms, counters and the most recent request traces.
+    Stage times are exclusive: time spent in a nested stage (e.g. embed inside
+    retrieve) is only counted once, under the inner stage.
+    """
+
+    def __init__(self, recent=50):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+        self._recent = deque(maxlen=recent)
+        self._sinks = []
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = self._stages[stage] = {"count": 0, "sum": 0.0, "buckets": [0] * len(BUCKETS)}
+            entry["count"] += 1
+            entry["sum"] += seconds
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    entry["buckets"][i] += 1
+                    break
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def finish(self, trace):
+        with self._lock:
+            self._recent.append(trace)
+            sinks = list(self._sinks)
+        for sink in sinks:
+            try:
+                sink(trace)
+            except Exception as e:
+                print(f"Metrics sink failed: {e}")
+
+    def add_sink(self, sink):
+        """Registers a callable that receives every finished trace dict."""
+        with self._lock:
+            self._sinks.append(sink)
+
+    def recent(self, n=None):
+        with self._lock:
+            traces = list(self._recent)
+        return traces[-n:] if n else traces
+
+    def snapshot(self):
+        with self._lock:
+            stages = {name: {"count": e["count"], "sum": e["sum"]} for name, e in self._stages.items()}
+            return {"stages": stages, "counters": dict(self._counters)}
+
+    def render_prometheus(self):
+        """Current values in the Prometheus text exposition format."""
+        with self._lock:
+            stages = {name: (e["count"], e["sum"], list(e["buckets"])) for name, e in self._stages.items()}
+            counters = dict(self._counters)
+        lines = [
+            "# HELP wordsmith_stage_seconds Exclusive time spent per pipeline stage.",
+            "# TYPE wordsmith_stage_seconds histogram",
+        ]
+        for name, (count, total, buckets) in sorted(stages.items()):
+            cumulative = 0
+            for bound, hits in zip(BUCKETS, buckets):
+                cumulative += hits
+                lines.append(f'wordsmith_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'wordsmith_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {count}')
+            lines.append(f'wordsmith_stage_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'wordsmith_stage_seconds_count{{stage="{name}"}} {count}')
+        lines += ["# HELP wordsmith_events_total Pipeline event counters.", "# TYPE wordsmith_events_total counter"]
+        for name, value in sorted(counters.items()):
+            lines.append(f'wordsmith_events_total{{event="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry(recent=int(os.getenv("WORDSMITH_METRICS_RECENT", "50")))
+
+
+def _record(name, seconds):
+    registry.observe(name, seconds)
+    trace = _trace.get()
+    if trace is not None:
+        trace["stages"][name] = trace["stages"].get(name, 0.0) + seconds
+
+
+@contextmanager
+def _timed_stage(name):
+    frame = [name, 0.0]
+    token = _frame.set(frame)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        try:
+            _frame.reset(token)
+        except ValueError:
+            pass
+        parent = _frame.get()
+        if parent is not None:
+            parent[1] += elapsed
+        _record(name, elapsed - frame[1])
+
+
+def stage(name):
+    """Context manager timing one pipeline stage; a shared no-op when disabled."""
+    if not _enabled:
+        return _NULL
+    return _timed_stage(name)
+
+
+def timed_iter(iterable, name):
+    """
+    Yields from iterable, timing only the time spent producing each item, so a
+    generator (e.g. page loading or LLM streaming) is measured without the
+    consumer's work in between.
+    """
+    if not _enabled:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    while True:
+        with _timed_stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def count(name, value=1):
+    """Increments an event counter."""
+    if _enabled:
+        registry.increment(name, value)
+        trace = _trace.get()
+        if trace is not None:
+            trace["counters"][name] = trace["counters"].get(name, 0) + value
+
+
+@contextmanager
+def _traced(kind):
+    trace = {"trace_id": uuid.uuid4().hex[:16], "kind": kind, "started": time.time(),
+             "stages": {}, "counters": {}}
+    token = _trace.set(trace)
+    started = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace["total"] = time.perf_counter() - started
+        try:
+            _trace.reset(token)
+        except ValueError:
+            # A streaming generator finished from another context.
+            pass
+        registry.finish(trace)
+
+
+def trace(kind):
+    """
+    Context manager for one request (a chat turn, an ingestion run). Stages and
+    counters recorded inside it are attached to a trace with its own id.
+    """
+    if not _enabled:
+        return _NULL
+    return _traced(kind)
+
+
+def current_trace_id():
+    """Id of the trace active in this context, or None."""
+    current = _trace.get()
+    return current["trace_id"] if current is not None else None
+
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port=None, host="127.0.0.1"):
+    """
+    Serves registry.render_prometheus() at /metrics on a background thread.
+    Uses WORDSMITH_METRICS_PORT when no port is given; starts at most once.
+    """
+    global _server
+    port = port or int(os.getenv("WORDSMITH_METRICS_PORT", "0"))
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = registry.render_prometheus().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            _server = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=_server.serve_forever, daemon=True, name="metrics-server").start()
+    return _server
@@ -0,0 +1,150 @@
+import asyncio
+import os
+from Utilities import metrics
+from Utilities.Tools import (
+    LLM, load_embeddings, collection_name_of, corpus_version, answer_cache, format_sources
+)
+from Utilities.context import pack_context
+from Utilities.sparse_index import get_sparse_index
+
+
+class ServiceOverloaded(RuntimeError):
+    """Raised when more queries are waiting than the service accepts."""
+
+
+class QueryEmbeddingBatcher:
+    """
+    Collects query embeddings requested concurrently and encodes them in one
+    call: a batch is flushed when max_batch queries are waiting or max_wait
+    seconds after the first one arrived.
+    """
+
+    def __init__(self, embeddings, max_batch=64, max_wait=0.005):
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending = []
+        self._timer = None
+        self.batches = 0
+        self.queries = 0
+
+    async def embed(self, text):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._encode(batch))
+
+    def _embed_many(self, texts):
+        if hasattr(self.embeddings, "embed_queries"):
+            return self.embeddings.embed_queries(texts)
+        return [self.embeddings.embed_query(text) for text in texts]
+
+    async def _encode(self, batch):
+        self.batches += 1
+        self.queries += len(batch)
+        try:
+            vectors = await asyncio.to_thread(self._embed_many, [text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+
+class QueryService:
+    """
+    asyncio-native query API over one vector DB.
+    Queries of the same session are answered in arrival order, at most
+    max_concurrency queries run at once and, beyond max_pending waiting
+    queries, ask() fails fast with ServiceOverloaded. Query embeddings of
+    concurrent requests are batched into one encoder call.
+    """
+
+    def __init__(self, db, llm=None, embeddings=None, max_concurrency=64, max_pending=1024,
+                 fetch_k=12, token_budget=None, max_chunks=None, hybrid=None, use_cache=True):
+        from langchain.chains.question_answering.stuff_prompt import PROMPT_SELECTOR
+
+        if hybrid is None:
+            hybrid = os.getenv("WORDSMITH_HYBRID", "1") == "1"
+        self.db = db
+        self.llm = llm or LLM().model()
+        self.prompt = PROMPT_SELECTOR.get_prompt(self.llm)
+        self.batcher = QueryEmbeddingBatcher(embeddings or load_embeddings())
+        self.fetch_k = fetch_k
+        self.max_chunks = max_chunks
+        self.token_budget = token_budget or int(os.getenv("WORDSMITH_CONTEXT_TOKENS", "768"))
+        self.hybrid = None
+        if hybrid and hasattr(db, "_persist_directory"):
+            from Utilities.retrievers import HybridRetriever
+
+            sparse_index = get_sparse_index(db._persist_directory, collection_name_of(db))
+            self.hybrid = HybridRetriever(vectorstore=db, sparse_index=sparse_index, k=fetch_k)
+        self.use_cache = use_cache
+        self.max_pending = max_pending
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._sessions = {}
+        self._pending = 0
+
+    def _retrieve(self, query, vector):
+        with metrics.stage("retrieve"):
+            dense = self.db.similarity_search_by_vector(vector, k=self.fetch_k)
+            candidates = self.hybrid.fuse(query, dense) if self.hybrid is not None else dense
+            return pack_context(candidates, token_budget=self.token_budget, max_chunks=self.max_chunks)
+
+    async def _answer(self, query):
+        collection = collection_name_of(self.db)
+        version = corpus_version(self.db)
+        if self.use_cache:
+            entry = answer_cache.get_exact(collection, version, query)
+            if entry is not None:
+                return {"answer": entry["answer"], "sources": entry["sources"]}
+        vector = await self.batcher.embed(query)
+        if self.use_cache:
+            entry = answer_cache.get_similar(collection, version, vector)
+            if entry is not None:
+                return {"answer": entry["answer"], "sources": entry["sources"]}
+        documents = await asyncio.to_thread(self._retrieve, query, vector)
+        with metrics.stage("format"):
+            context = "\n\n".join(doc.page_content for doc in documents)
+            prompt = self.prompt.format_prompt(context=context, question=query)
+        with metrics.stage("llm"):
+            message = await self.llm.ainvoke(prompt)
+        with metrics.stage("format"):
+            response = {"answer": message.content, "sources": format_sources(documents)}
+        if self.use_cache:
+            answer_cache.put(collection, version, query, vector, response["answer"], response["sources"])
+        return response
+
+    async def ask(self, session_id, query):
+        """
+        Answers a query for a session; returns {"answer": ..., "sources": [...]}.
+        """
+        if self._pending >= self.max_pending:
+            raise ServiceOverloaded(f"{self._pending} queries already waiting")
+        self._pending += 1
+        lock = self._sessions.setdefault(session_id, [asyncio.Lock(), 0])
+        lock[1] += 1
+        try:
+            async with lock[0]:
+                async with self._semaphore:
+                    with metrics.trace("service"):
+                        return await self._answer(query)
+        finally:
+            self._pending -= 1
+            lock[1] -= 1
+            if not lock[1]:
+                self._sessions.pop(session_id, None)
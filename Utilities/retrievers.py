@@ -0,0 +1,163 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from Utilities import metrics
+from Utilities.sparse_index import reciprocal_rank_fusion
+
+
+def metadata_matches(metadata, where):
+    """True when metadata satisfies a flat equality filter."""
+    return all(metadata.get(key) == value for key, value in (where or {}).items())
+
+
+def vector_filter(vectorstore, where):
+    """A flat equality filter in the form the vector store's search expects."""
+    if not where:
+        return None
+    if len(where) > 1 and not hasattr(vectorstore, "search_slots"):
+        # Chroma wants several conditions combined explicitly.
+        return {"$and": [{key: value} for key, value in where.items()]}
+    return dict(where)
+
+
+def sparse_documents(vectorstore, hits, where=None):
+    """[(Document, score)] of BM25 hits, loaded from the vector store and filtered by where."""
+    if not hits:
+        return []
+    found = vectorstore.get(ids=[doc_id for doc_id, _ in hits])
+    by_id = {
+        doc_id: Document(page_content=text, metadata=metadata or {})
+        for doc_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+    }
+    return [
+        (by_id[doc_id], score) for doc_id, score in hits
+        if doc_id in by_id and metadata_matches(by_id[doc_id].metadata, where)
+    ]
+
+
+def dense_similarities(vectorstore, vector, k, filter=None):
+    """
+    [(Document, cosine similarity)] of the k nearest neighbours of a normalized
+    query vector, whichever store and distance space the collection uses.
+    """
+    if hasattr(vectorstore, "search_slots"):
+        return vectorstore.similarity_search_by_vector_with_score(vector, k=k, filter=filter)
+    space = (vectorstore._collection.metadata or {}).get("hnsw:space", "l2")
+    hits = vectorstore.similarity_search_by_vector_with_relevance_scores(vector, k=k, filter=filter)
+    # Chroma returns distances: squared L2 (2 - 2cos on unit vectors), or 1 - cos / 1 - ip.
+    return [(doc, 1 - distance / 2 if space == "l2" else 1 - distance) for doc, distance in hits]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Dense similarity search over the vector store fused with BM25 hits from the
+    collection's sparse index using reciprocal-rank fusion. Falls back to dense
+    only while the sparse index is empty. With a metadata filter, the vector
+    search is pre-filtered and BM25 hits that do not match are dropped.
+    """
+    vectorstore: Any
+    sparse_index: Any
+    k: int = 3
+    fetch_k: int = 20
+    rrf_k: int = 60
+    filter: Optional[Dict[str, Any]] = None
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        with metrics.stage("retrieve"):
+            dense = self.vectorstore.similarity_search(
+                query, k=self.fetch_k, filter=vector_filter(self.vectorstore, self.filter)
+            )
+            return self.fuse(query, dense)
+
+    def fuse(self, query, dense):
+        """Fuses already retrieved dense results with the BM25 hits for query."""
+        if not len(self.sparse_index):
+            return dense[:self.k]
+        hits = self.sparse_index.search(query, k=self.fetch_k)
+        documents = {doc.page_content: doc for doc in dense}
+        sparse_keys = []
+        for doc, _ in sparse_documents(self.vectorstore, hits, self.filter):
+            documents.setdefault(doc.page_content, doc)
+            sparse_keys.append(doc.page_content)
+        fused = reciprocal_rank_fusion([[doc.page_content for doc in dense], sparse_keys], k=self.rrf_k)
+        return [documents[key] for key in fused[:self.k]]
+
+
+class ContextPackingRetriever(BaseRetriever):
+    """
+    Fetches a larger candidate set from another retriever and packs at most
+    max_chunks of it into a token budget with Utilities.context.pack_context.
+    """
+    base_retriever: Any
+    token_budget: int = 768
+    max_chunks: Optional[int] = None
+    dedupe_threshold: float = 0.85
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        from Utilities.context import pack_context
+
+        with metrics.stage("retrieve"):
+            candidates = self.base_retriever.invoke(query)
+            return pack_context(candidates, token_budget=self.token_budget,
+                                dedupe_threshold=self.dedupe_threshold, max_chunks=self.max_chunks)
+
+
+class FederatedRetriever(BaseRetriever):
+    """
+    Queries several collections as one corpus. The query is embedded once and
+    each selected collection is searched in parallel (dense, plus BM25 where an
+    index exists, pre-filtered by metadata). Rank fusion would interleave the
+    collections regardless of how well each matched, so candidates are ranked
+    on scores that compare across collections instead: dense_weight times the
+    cosine similarity (one embedding model for all) plus the rest times the
+    normalized BM25 score. members maps a source type to its vector store;
+    source_types limits the search to some of them and every hit is tagged with
+    its source_type.
+    """
+    members: Dict[str, Any]
+    k: int = 4
+    fetch_k: int = 12
+    dense_weight: float = 0.5
+    filter: Optional[Dict[str, Any]] = None
+    source_types: Optional[List[str]] = None
+
+    def _search(self, source_type, vectorstore, query, vector):
+        """[(Document, score)] candidates of one collection."""
+        from Utilities.Tools import collection_name_of
+        from Utilities.sparse_index import get_sparse_index
+
+        dense = dense_similarities(vectorstore, vector, self.fetch_k, vector_filter(vectorstore, self.filter))
+        sparse = []
+        if hasattr(vectorstore, "_persist_directory"):
+            sparse_index = get_sparse_index(vectorstore._persist_directory, collection_name_of(vectorstore))
+            sparse = sparse_documents(vectorstore, sparse_index.search(query, k=self.fetch_k, normalize=True),
+                                      self.filter)
+        # A candidate missing from one full list scored at most that list's lowest score.
+        dense_floor = min(score for _, score in dense) if len(dense) >= self.fetch_k else 0.0
+        sparse_floor = min(score for _, score in sparse) if len(sparse) >= self.fetch_k else 0.0
+        candidates = {doc.page_content: [doc, score, sparse_floor] for doc, score in dense}
+        for doc, score in sparse:
+            candidates.setdefault(doc.page_content, [doc, dense_floor, 0.0])[2] = score
+        results = []
+        for doc, dense_score, sparse_score in candidates.values():
+            doc.metadata.setdefault("source_type", source_type)
+            results.append((doc, self.dense_weight * dense_score + (1 - self.dense_weight) * sparse_score))
+        return results
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        selected = [
+            (source_type, vectorstore) for source_type, vectorstore in self.members.items()
+            if self.source_types is None or source_type in self.source_types
+        ]
+        if not selected:
+            return []
+        with metrics.stage("retrieve"):
+            vector = selected[0][1].embeddings.embed_query(query)
+            with ThreadPoolExecutor(max_workers=len(selected)) as pool:
+                results = [
+                    result for member_results in pool.map(lambda member: self._search(*member, query, vector), selected)
+                    for result in member_results
+                ]
+            results.sort(key=lambda result: result[1], reverse=True)
+            return [doc for doc, _ in results[:self.k]]
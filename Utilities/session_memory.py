@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from Utilities.context import count_tokens
+
+
+class SessionMemory:
+    """Running summary plus the recent messages of one conversation."""
+
+    def __init__(self):
+        self.summary = ""
+        self.messages = []
+        self.last_used = time.time()
+        self.summarizing = False
+        self.lock = threading.Lock()
+
+
+class SessionMemoryStore:
+    """
+    Conversation memory keyed by session id.
+    At most max_sessions sessions are kept (least recently used evicted) and
+    sessions idle for idle_ttl seconds are dropped. When a session's messages
+    exceed max_token_limit, the oldest ones are folded into its summary on a
+    background thread, so replies never wait for summarization. Replies built
+    while a session is over the limit with its summary still pending are
+    counted in stats()["summaries_behind"].
+    """
+
+    def __init__(self, llm_factory, max_sessions=1000, idle_ttl=3600, max_token_limit=2000,
+                 tokenizer=count_tokens, workers=2):
+        self.llm_factory = llm_factory
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_token_limit = max_token_limit
+        self.tokenizer = tokenizer
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="memory-summary")
+        self.summaries_run = 0
+        self.summaries_failed = 0
+        self.summaries_behind = 0
+        self.evictions = 0
+
+    def _session(self, session_id):
+        now = time.time()
+        with self._lock:
+            for key in [key for key, s in self._sessions.items() if now - s.last_used > self.idle_ttl]:
+                del self._sessions[key]
+                self.evictions += 1
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = SessionMemory()
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+            session.last_used = now
+            return session
+
+    def _tokens(self, messages):
+        return sum(self.tokenizer(text) for _, text in messages)
+
+    def history(self, session_id):
+        """Summary and recent messages formatted for the prompt."""
+        session = self._session(session_id)
+        with session.lock:
+            if session.summarizing and self._tokens(session.messages) > self.max_token_limit:
+                self.summaries_behind += 1
+            lines = [f"Summary of earlier conversation: {session.summary}"] if session.summary else []
+            lines.extend(f"{role}: {text}" for role, text in session.messages)
+        return "\n".join(lines)
+
+    def add_turn(self, session_id, user_input, ai_output):
+        """Records a turn and schedules summarization if the buffer overflowed."""
+        session = self._session(session_id)
+        with session.lock:
+            session.messages.extend([("Human", user_input), ("AI", ai_output)])
+            if session.summarizing or self._tokens(session.messages) <= self.max_token_limit:
+                return
+            session.summarizing = True
+        self._executor.submit(self._summarize, session)
+
+    def _summarize(self, session):
+        from langchain.memory.prompt import SUMMARY_PROMPT
+
+        try:
+            with session.lock:
+                # Fold the oldest messages until the rest fits in half the limit.
+                keep, tokens = len(session.messages), 0
+                while keep > 0 and tokens + self.tokenizer(session.messages[keep - 1][1]) <= self.max_token_limit // 2:
+                    keep -= 1
+                    tokens += self.tokenizer(session.messages[keep][1])
+                folded = session.messages[:keep]
+                summary = session.summary
+            if not folded:
+                return
+            new_lines = "\n".join(f"{role}: {text}" for role, text in folded)
+            result = self.llm_factory().invoke(SUMMARY_PROMPT.format(summary=summary, new_lines=new_lines))
+            with session.lock:
+                session.summary = getattr(result, "content", result)
+                # Only appends happen meanwhile, so the folded messages are still the prefix.
+                del session.messages[:len(folded)]
+            self.summaries_run += 1
+        except Exception as e:
+            self.summaries_failed += 1
+            print(f"Conversation summarization failed: {e}")
+        finally:
+            session.summarizing = False
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self):
+        with self._lock:
+            sessions = len(self._sessions)
+        return {
+            "sessions": sessions,
+            "summaries_run": self.summaries_run,
+            "summaries_failed": self.summaries_failed,
+            "summaries_behind": self.summaries_behind,
+            "evictions": self.evictions,
+        }
@@ -4,35 +4,22 @@ CHROMA_PATH = 'Chroma'
 
 def create_directory():
     """
-    Create a directory for storing PDF files and Vector. If the directory already exists, remove all files in it.
+    Create the directories for storing PDF files and vectors if they are missing.
+    Existing uploads and collections are kept; cleanup is explicit (see CorpusStore.drop_all).
     """
-    if os.path.exists(PDF_PATH):
-        for file in os.listdir(PDF_PATH):
-            Path = os.path.join(PDF_PATH, file)
-            os.remove(Path)
-        print("Directory Files has been removed successfully")
-
-    if not os.path.exists(PDF_PATH):
-        os.mkdir(PDF_PATH)
-
-    if os.path.exists(CHROMA_PATH):
-        for file in os.listdir(CHROMA_PATH):
-            Path = os.path.join(CHROMA_PATH, file)
-            os.remove(CHROMA_PATH)
-        print("Directory Files has been removed successfully")
-
-    if not os.path.exists(CHROMA_PATH):
-        os.mkdir(CHROMA_PATH)
+    os.makedirs(PDF_PATH, exist_ok=True)
+    os.makedirs(CHROMA_PATH, exist_ok=True)
 
 def process_files(uploaded_files):
     """Simulates processing uploaded files (e.g., chunking, embedding)."""
     return uploaded_files
 
 
-def upload_file(file):
+def upload_file(file, directory=PDF_PATH):
+    """Saves an uploaded file into directory (a namespace's CorpusStore.pdf_dir())."""
     if file is None:
         return "No file provided"
-    file_path = os.path.join(PDF_PATH, file.name)
+    file_path = os.path.join(directory, file.name)
     with open(file_path, "wb") as f:
         f.write(file.getbuffer())
     return file_path
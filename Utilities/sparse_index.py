@@ -0,0 +1,301 @@
+import heapq
+import math
+import os
+import pickle
+import re
+import threading
+from array import array
+from collections import Counter
+
+# Identifiers such as "ERR-404", "XJ9.2" or "part_77" stay whole and are also
+# indexed by their parts, so both exact and partial lookups match.
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.:/][a-z0-9]+)*")
+PART_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        parts = PART_PATTERN.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuses ranked lists of keys; returns keys ordered by sum(1 / (k + rank)).
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+# Changes are appended here and folded into a fresh snapshot once the log
+# outgrows the snapshot (or this many bytes, whichever is larger).
+LOG_COMPACT_BYTES = 1 << 20
+
+
+def log_path(path):
+    return f"{path}.log"
+
+
+def _signature(path):
+    """Identifies the on-disk state of a snapshot and its change log."""
+    signature = []
+    for name in (path, log_path(path)):
+        try:
+            stat = os.stat(name)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+class BM25Index:
+    """
+    Incrementally updated BM25 inverted index.
+    Postings are two parallel array('I') per term (document numbers and term
+    frequencies). Deleted documents are tombstoned and skipped at query time;
+    the index is compacted once tombstones outnumber live documents. Like
+    Lucene, document frequencies count tombstoned documents until compaction,
+    so idf needs no per-query scan of the postings.
+
+    An index opened from a path persists updates as a pickled snapshot plus an
+    append-only change log, and reloads itself before a search or update when
+    another process has written to either file.
+    """
+
+    def __init__(self, k1=1.5, b=0.75, max_df=0.5):
+        self.k1 = k1
+        self.b = b
+        self.max_df = max_df
+        self.doc_ids = []
+        self.doc_lengths = array('I')
+        self.lookup = {}
+        self.postings = {}
+        self.total_length = 0
+        self.path = None
+        self._signature = None
+        self._log_end = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self.lookup)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ("_lock", "path", "_signature", "_log_end"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault("max_df", 0.5)
+        self.__dict__.update(state)
+        self.path = None
+        self._signature = None
+        self._log_end = None
+        self._lock = threading.RLock()
+
+    def add(self, ids, texts):
+        """Indexes (or re-indexes) documents under their external ids."""
+        with self._lock:
+            self.remove([doc_id for doc_id in ids if doc_id in self.lookup])
+            for doc_id, text in zip(ids, texts):
+                number = len(self.doc_ids)
+                counts = Counter(tokenize(text))
+                length = sum(counts.values())
+                self.doc_ids.append(doc_id)
+                self.doc_lengths.append(length)
+                self.lookup[doc_id] = number
+                self.total_length += length
+                for term, tf in counts.items():
+                    if term not in self.postings:
+                        self.postings[term] = (array('I'), array('I'))
+                    docs, tfs = self.postings[term]
+                    docs.append(number)
+                    tfs.append(tf)
+
+    def remove(self, ids):
+        with self._lock:
+            for doc_id in ids:
+                number = self.lookup.pop(doc_id, None)
+                if number is not None:
+                    self.doc_ids[number] = None
+                    self.total_length -= self.doc_lengths[number]
+            if len(self.doc_ids) - len(self.lookup) > max(len(self.lookup), 1024):
+                self.compact()
+
+    def compact(self):
+        """Rebuilds postings without tombstoned documents."""
+        with self._lock:
+            remap = {}
+            doc_ids, doc_lengths = [], array('I')
+            for number, doc_id in enumerate(self.doc_ids):
+                if doc_id is not None:
+                    remap[number] = len(doc_ids)
+                    doc_ids.append(doc_id)
+                    doc_lengths.append(self.doc_lengths[number])
+            postings = {}
+            for term, (docs, tfs) in self.postings.items():
+                new_docs, new_tfs = array('I'), array('I')
+                for number, tf in zip(docs, tfs):
+                    if number in remap:
+                        new_docs.append(remap[number])
+                        new_tfs.append(tf)
+                if new_docs:
+                    postings[term] = (new_docs, new_tfs)
+            self.doc_ids, self.doc_lengths, self.postings = doc_ids, doc_lengths, postings
+            self.lookup = {doc_id: number for number, doc_id in enumerate(doc_ids)}
+
+    def search(self, query, k=10, normalize=False):
+        """
+        Returns [(external_id, score)] of the k best matches. Terms found in
+        more than max_df of the documents are skipped while rarer query terms
+        exist: their postings are the longest to scan and barely move the ranking.
+
+        With normalize=True scores are divided by the score of a document of
+        average length holding every query term once (terms missing from the
+        index included) and capped at 1, so scores of different indexes can be
+        compared: a collection without the query's rare terms scores low.
+        """
+        with self._lock:
+            self._refresh()
+            live = len(self.lookup)
+            if not live:
+                return []
+            average_length = self.total_length / live
+            total = len(self.doc_ids)
+            terms = set(tokenize(query))
+            rare = [term for term in terms if len(self.postings.get(term, ((),))[0]) <= self.max_df * total]
+            scores, bound = {}, 0.0
+            for term in rare or terms:
+                docs, tfs = self.postings.get(term, ((), ()))
+                df = len(docs)
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                bound += idf
+                for number, tf in zip(docs, tfs):
+                    if self.doc_ids[number] is None:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[number] / average_length)
+                    scores[number] = scores.get(number, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            if normalize:
+                return [(self.doc_ids[number], min(1.0, score / bound)) for number, score in best]
+            return [(self.doc_ids[number], score) for number, score in best]
+
+    def save(self, path):
+        """Writes a full snapshot to path and drops its change log."""
+        with self._lock:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            if os.path.exists(log_path(path)):
+                os.remove(log_path(path))
+            if path == self.path:
+                self._signature = _signature(path)
+                self._log_end = 0
+
+    @classmethod
+    def load(cls, path):
+        """Loads the snapshot at path (if any) and replays its change log."""
+        index = cls()
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                index = pickle.load(f)
+        index._log_end = 0
+        if os.path.exists(log_path(path)):
+            with open(log_path(path), "rb") as f:
+                while True:
+                    try:
+                        add, remove = pickle.load(f)
+                    except (EOFError, pickle.UnpicklingError):
+                        # The end of the log, or a record cut short by a crash.
+                        break
+                    index._apply(add, remove)
+                    index._log_end = f.tell()
+        return index
+
+    @classmethod
+    def open(cls, path):
+        """Loads the index at path and keeps it in sync with the files there."""
+        signature = _signature(path)
+        index = cls.load(path)
+        index.path, index._signature = path, signature
+        return index
+
+    def _refresh(self):
+        if self.path is None or _signature(self.path) == self._signature:
+            return
+        signature = _signature(self.path)
+        state = type(self).load(self.path).__dict__
+        for name in ("_lock", "path", "_signature"):
+            state.pop(name, None)
+        self.__dict__.update(state)
+        self._signature = signature
+
+    def _apply(self, add=None, remove=None):
+        if remove:
+            self.remove(remove)
+        if add:
+            self.add(*add)
+
+    def update(self, add=None, remove=None):
+        """
+        Applies additions ((ids, texts)) and removals (ids) and, for an opened
+        index, appends them to the change log, snapshotting once the log has
+        grown past the snapshot.
+        """
+        with self._lock:
+            self._refresh()
+            self._apply(add, remove)
+            if self.path is None:
+                return
+            with open(log_path(self.path), "ab") as f:
+                if self._log_end is not None and f.tell() > self._log_end:
+                    # Drop a record cut short by a crash so this one stays readable.
+                    f.truncate(self._log_end)
+                pickle.dump((add, remove), f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                self._log_end = os.fstat(f.fileno()).st_size
+            snapshot = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            if os.path.getsize(log_path(self.path)) > max(snapshot, LOG_COMPACT_BYTES):
+                self.save(self.path)
+            else:
+                self._signature = _signature(self.path)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def index_path(chroma_path, collection_name):
+    return os.path.join(chroma_path, f"{collection_name}.bm25")
+
+
+def get_sparse_index(chroma_path, collection_name):
+    """
+    Process-wide BM25 index of a collection, loaded from disk on first use.
+    The index reloads itself when another process changes its files.
+    """
+    key = (os.path.abspath(chroma_path), collection_name)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = BM25Index.open(index_path(chroma_path, collection_name))
+        return _indexes[key]
+
+
+def drop_sparse_index(chroma_path, collection_name):
+    with _indexes_lock:
+        _indexes.pop((os.path.abspath(chroma_path), collection_name), None)
+    path = index_path(chroma_path, collection_name)
+    for name in (path, log_path(path)):
+        if os.path.exists(name):
+            os.remove(name)
@@ -0,0 +1,156 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from Utilities.setup import PDF_PATH, CHROMA_PATH
+from Utilities.sparse_index import drop_sparse_index
+
+DEFAULT_NAMESPACE = 'default'
+NAMESPACE_PATTERN = re.compile(r'^[A-Za-z0-9]{1,32}$')
+_registry_lock = threading.Lock()
+
+
+def valid_namespace(namespace):
+    return bool(namespace) and bool(NAMESPACE_PATTERN.match(namespace))
+
+
+class CorpusStore:
+    """
+    Lifecycle of the persistent collections of one namespace.
+    Collections are named '<namespace>-<base>' and recorded in a registry with a
+    version that is bumped on every ingestion, so they can be reopened after a
+    restart instead of rebuilt. Nothing is deleted unless drop() is called.
+    """
+
+    def __init__(self, namespace=DEFAULT_NAMESPACE, root=CHROMA_PATH, pdf_root=PDF_PATH):
+        if not valid_namespace(namespace):
+            raise ValueError(f"Invalid namespace: {namespace!r}")
+        self.namespace = namespace
+        self.root = root
+        self.pdf_root = pdf_root
+        self.registry_path = os.path.join(root, 'registry.json')
+        os.makedirs(root, exist_ok=True)
+
+    def collection_name(self, base):
+        return f"{self.namespace}-{base}"
+
+    def pdf_dir(self):
+        """Upload directory of this namespace."""
+        path = os.path.join(self.pdf_root, self.namespace)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _read_registry(self):
+        if not os.path.exists(self.registry_path):
+            return {}
+        with open(self.registry_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_registry(self, registry):
+        tmp_path = f'{self.registry_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(registry, f, indent=2)
+        os.replace(tmp_path, self.registry_path)
+
+    def collections(self):
+        """Registry entries of this namespace, keyed by base name."""
+        prefix = f"{self.namespace}-"
+        return {
+            name[len(prefix):]: entry for name, entry in self._read_registry().items()
+            if name.startswith(prefix)
+        }
+
+    def register(self, base, source_type):
+        """Records an ingestion into a collection and returns its new version."""
+        name = self.collection_name(base)
+        with _registry_lock:
+            registry = self._read_registry()
+            entry = registry.get(name, {"version": 0, "created": time.time()})
+            entry.update({"version": entry["version"] + 1, "updated": time.time(), "source_type": source_type})
+            registry[name] = entry
+            self._write_registry(registry)
+        return entry["version"]
+
+    def exists(self, base):
+        return self.collection_name(base) in self._read_registry()
+
+    def open(self, base):
+        """Reopens a registered collection, or returns None."""
+        if not self.exists(base):
+            return None
+        from Utilities.Tools import open_vector_db
+        return open_vector_db(self.root, self.collection_name(base))
+
+    def open_unified(self, source_types=None, filter=None):
+        """
+        Opens every registered collection of this namespace as one UnifiedCorpus,
+        or returns None when nothing has been ingested yet.
+        """
+        members = {}
+        for base, entry in sorted(self.collections().items()):
+            db = self.open(base)
+            if db is not None:
+                members[entry.get("source_type", base)] = db
+        return UnifiedCorpus(members, source_types=source_types, filter=filter) if members else None
+
+    def drop(self, base):
+        """Deletes a collection, its manifest or checkpoints and its registry entry."""
+        import chromadb
+
+        name = self.collection_name(base)
+        ann_dir = os.path.join(self.root, f'{name}.ann')
+        if os.path.isdir(ann_dir):
+            shutil.rmtree(ann_dir, ignore_errors=True)
+        else:
+            try:
+                chromadb.PersistentClient(path=self.root).delete_collection(name)
+            except Exception as e:
+                print(f"Collection {name} could not be deleted: {e}")
+        drop_sparse_index(self.root, name)
+        from Utilities.Tools import forget_query_engines
+        forget_query_engines(self.root, name)
+        for suffix in ('.manifest.json', '.urls.json', '.wiki.json', '.version'):
+            path = os.path.join(self.root, f'{name}{suffix}')
+            if os.path.exists(path):
+                os.remove(path)
+        with _registry_lock:
+            registry = self._read_registry()
+            registry.pop(name, None)
+            self._write_registry(registry)
+
+    def drop_all(self):
+        """Explicit cleanup of every collection and upload of this namespace."""
+        for base in self.collections():
+            self.drop(base)
+        shutil.rmtree(os.path.join(self.pdf_root, self.namespace), ignore_errors=True)
+
+
+class UnifiedCorpus:
+    """
+    Read-only view that queries several collections (one per source type) as a
+    single corpus through a FederatedRetriever. It can be passed wherever a
+    vector DB is used for chat; nothing is re-ingested or copied.
+    """
+
+    def __init__(self, members, source_types=None, filter=None):
+        self.members = dict(members)
+        self.source_types = list(source_types) if source_types else None
+        self.filter = dict(filter) if filter else None
+
+    @property
+    def collection_name(self):
+        """Cache key covering the member collections, their versions and the filters."""
+        from Utilities.Tools import collection_name_of, corpus_version
+
+        versions = sorted((collection_name_of(db), corpus_version(db)) for db in self.members.values())
+        key = "+".join(f"{name}@{version}" for name, version in versions)
+        return f"unified:{key}:{sorted(self.source_types or [])}:{sorted((self.filter or {}).items())}"
+
+    def as_retriever(self, search_kwargs=None):
+        from Utilities.retrievers import FederatedRetriever
+
+        k = (search_kwargs or {}).get("k", 4)
+        return FederatedRetriever(members=self.members, k=k, fetch_k=max(k, 12),
+                                  source_types=self.source_types, filter=self.filter)
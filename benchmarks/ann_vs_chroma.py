@@ -0,0 +1,135 @@
+"""
+Compares the embedded IVF/int8 backend (Utilities.ann_store) with Chroma:
+build time, p50/p99 query latency, recall@k against exact search, and peak RSS.
+Each (backend, size) run happens in its own subprocess so RSS is not shared.
+
+    python benchmarks/ann_vs_chroma.py --sizes 100000 1000000 --dim 768
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_vectors(size, dim, queries, seed=0):
+    """Clustered, L2-normalized vectors plus held-out queries from the same clusters."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(16, size // 1000), dim)).astype(np.float32)
+    def sample(n):
+        points = centers[rng.integers(len(centers), size=n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+        return points / np.linalg.norm(points, axis=1, keepdims=True)
+    return sample(size), sample(queries)
+
+
+def exact_top_k(data, queries, k):
+    import numpy as np
+
+    top = []
+    for query in queries:
+        scores = data @ query
+        top.append(set(np.argpartition(-scores, k)[:k].tolist()))
+    return top
+
+
+def run_ann(data, queries, k, directory):
+    from Utilities.ann_store import AnnVectorStore
+
+    store = AnnVectorStore(collection_name="bench", persist_directory=directory, train_threshold=20000)
+    started = time.perf_counter()
+    for start in range(0, len(data), 10000):
+        block = data[start:start + 10000]
+        store.add_embeddings([""] * len(block), block, ids=[str(i) for i in range(start, start + len(block))])
+    build_s = time.perf_counter() - started
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        hits = store.search_slots(query, k)
+        latencies.append(time.perf_counter() - started)
+        results.append({slot for slot, _ in hits})
+    return build_s, latencies, results
+
+
+def run_chroma(data, queries, k, directory):
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=directory).create_collection("bench")
+    started = time.perf_counter()
+    for start in range(0, len(data), 5000):
+        block = data[start:start + 5000]
+        collection.add(ids=[str(i) for i in range(start, start + len(block))], embeddings=block.tolist())
+    build_s = time.perf_counter() - started
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        hits = collection.query(query_embeddings=[query.tolist()], n_results=k)
+        latencies.append(time.perf_counter() - started)
+        results.append({int(i) for i in hits["ids"][0]})
+    return build_s, latencies, results
+
+
+def single_run(backend, size, dim, k, queries):
+    from benchmarks.synthetic import percentile
+
+    data, query_vectors = make_vectors(size, dim, queries)
+    truth = exact_top_k(data, query_vectors, k)
+    with tempfile.TemporaryDirectory() as directory:
+        runner = run_ann if backend == "ann" else run_chroma
+        build_s, latencies, results = runner(data, query_vectors, k, directory)
+    recall = sum(len(found & expected) for found, expected in zip(results, truth)) / (k * len(truth))
+    return {
+        "backend": backend,
+        "size": size,
+        "build_s": build_s,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        f"recall@{k}": recall,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ANN backend vs Chroma benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--backends", nargs="+", default=["ann", "chroma"])
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--single", nargs=2, metavar=("BACKEND", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        result = single_run(args.single[0], int(args.single[1]), args.dim, args.k, args.queries)
+        print(json.dumps(result))
+        return
+
+    results = []
+    for size in args.sizes:
+        for backend in args.backends:
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--single", backend, str(size),
+                 "--dim", str(args.dim), "--k", str(args.k), "--queries", str(args.queries)],
+                capture_output=True, text=True, cwd=ROOT
+            )
+            if completed.returncode != 0:
+                print(f"{backend} @ {size} failed:\n{completed.stderr}")
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Chunk count, chunk sizes, split and embedding time, and recall@k of each
+chunking strategy on structured synthetic manuals (headings, paragraphs and
+one part number per section). Recall is measured for dense and hybrid
+(dense + BM25) retrieval; a chunk counts as a hit when it contains the part
+number the query asks about.
+
+    python benchmarks/chunking.py --docs 200 --k 3
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import FILLER, TOPICS, HashEmbeddings, _pseudo_word
+from Utilities.chunking import STRATEGIES, Chunker, get_length_function, iter_chunks
+from Utilities.sparse_index import BM25Index, reciprocal_rank_fusion
+
+# all-mpnet-base-v2 silently drops tokens past this length.
+MODEL_MAX_TOKENS = 384
+
+
+def make_manuals(count, seed=11):
+    """
+    Returns (documents, queries). Each document is a manual with numbered
+    sections of uneven length; each section holds a unique part number and
+    descriptive terms, and each query names the part number it should find.
+    """
+    rng = random.Random(seed)
+    documents, queries = [], []
+    for i in range(count):
+        topic = TOPICS[i % len(TOPICS)]
+        lines = [f"# {topic.title()} Manual {i}", ""]
+        for number in range(1, rng.randint(3, 7)):
+            part = f"PN-{rng.randint(10000, 99999)}-{chr(65 + number)}"
+            terms = " ".join(_pseudo_word(rng) for _ in range(2))
+            lines += [f"{number}.{rng.randint(1, 9)} {rng.choice(['Installation', 'Wiring', 'Service', 'Inspection'])}", ""]
+            paragraphs = [[rng.choice(FILLER) for _ in range(rng.randint(20, 140))] for _ in range(rng.randint(1, 4))]
+            target = rng.choice(paragraphs)
+            target.insert(rng.randint(0, len(target)), f"{terms} part {part}")
+            lines += ["\n\n".join(" ".join(words) + "." for words in paragraphs), ""]
+            lines += ["WARNING", "Isolate the supply before opening the unit.", ""]
+            queries.append((f"{topic} {terms} {part}", part))
+        documents.append("\n".join(lines))
+    return documents, queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunking strategy benchmark")
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--fetch-k", type=int, default=20)
+    parser.add_argument("--chunk-tokens", type=int, default=256)
+    parser.add_argument("--chunk-overlap", type=int, default=32)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    documents, queries = make_manuals(args.docs)
+    tokenizer_name, count = get_length_function()
+    embeddings = HashEmbeddings()
+    query_vectors = np.array(embeddings.embed_documents([query for query, _ in queries]))
+    results = {"docs": args.docs, "queries": len(queries), "k": args.k, "tokenizer": tokenizer_name}
+    for strategy in STRATEGIES:
+        chunker = Chunker(strategy, args.chunk_tokens, args.chunk_overlap)
+        started = time.perf_counter()
+        chunks = [doc.page_content for doc in iter_chunks(documents, chunker=chunker)]
+        split_s = time.perf_counter() - started
+        started = time.perf_counter()
+        matrix = np.array(embeddings.embed_documents(chunks))
+        embed_s = time.perf_counter() - started
+        sizes = [count(chunk) for chunk in chunks]
+        index = BM25Index()
+        index.add([str(i) for i in range(len(chunks))], chunks)
+        dense = np.argsort(-(query_vectors @ matrix.T), axis=1)[:, :args.fetch_k].tolist()
+        sparse = [[int(i) for i, _ in index.search(query, args.fetch_k)] for query, _ in queries]
+        rankings = {
+            "dense": dense,
+            "hybrid": [reciprocal_rank_fusion([d, b]) for d, b in zip(dense, sparse)],
+        }
+        recall = {
+            f"{name}_recall@{args.k}": round(sum(
+                any(part in chunks[i] for i in ranked[:args.k]) for (_, part), ranked in zip(queries, ranking)
+            ) / len(queries), 4)
+            for name, ranking in rankings.items()
+        }
+        results[strategy] = {
+            "chunks": len(chunks),
+            "split_s": round(split_s, 4),
+            "embed_s": round(embed_s, 4),
+            "mean_tokens": round(sum(sizes) / len(sizes), 1),
+            "max_tokens": max(sizes),
+            f"over_{MODEL_MAX_TOKENS}": sum(size > MODEL_MAX_TOKENS for size in sizes),
+            **recall,
+        }
+        print(f"{strategy:<9} {results[strategy]}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Measures cold-start import time of the app's modules.
+Each module is imported in a fresh interpreter so nothing is cached.
+
+    python benchmarks/cold_start.py --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = [
+    "Utilities.setup",
+    "Utilities.Tools",
+    "Agents.chat_interface",
+    "Agents.Wiki",
+    "Agents.URL",
+    "Agents.RAG",
+    "streamlit",
+]
+SNIPPET = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def import_time(module):
+    result = subprocess.run(
+        [sys.executable, "-c", SNIPPET.format(module=module)],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for module in MODULES:
+        samples = [t for t in (import_time(module) for _ in range(args.repeat)) if t is not None]
+        results[module] = {"median_s": statistics.median(samples)} if samples else {"error": "import failed"}
+        print(f"{module:<28} {results[module]}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Load test for Utilities.query_service.QueryService: many concurrent chat
+sessions against a synthetic collection. The LLM is the app's own LLM().model()
+(the LLM gateway) over the fake backend with injected latency, so gateway
+overhead is part of the measurement. Reports throughput, latency percentiles
+and embedding batch sizes.
+
+    python benchmarks/concurrent_sessions.py --sessions 300 --turns 3 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import HashEmbeddings, make_corpus, percentile
+
+
+async def run(args, service):
+    latencies = []
+
+    async def session(session_id):
+        for turn in range(args.turns):
+            started = time.perf_counter()
+            await service.ask(session_id, f"session {session_id} turn {turn}: how is the pump serviced")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(args.sessions)))
+    return time.perf_counter() - started, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent session load test")
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--llm-rpm", type=float, default=0, help="Gateway rate limit (0: unlimited)")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    os.environ.update({
+        "WORDSMITH_LLM_BACKEND": "fake",
+        "WORDSMITH_FAKE_LLM_LATENCY": str(args.llm_latency),
+        "WORDSMITH_LLM_RPM": str(args.llm_rpm),
+        "WORDSMITH_LLM_CONCURRENCY": str(args.concurrency),
+        "WORDSMITH_LLM_QUEUE": str(args.sessions),
+    })
+    from Utilities.ann_store import AnnVectorStore
+    from Utilities.query_service import QueryService
+    from Utilities.Tools import LLM, update_sparse_index
+
+    documents, _ = make_corpus(args.docs)
+    embeddings = HashEmbeddings()
+    with tempfile.TemporaryDirectory() as directory:
+        db = AnnVectorStore.from_texts(documents, embeddings, ids=[str(i) for i in range(len(documents))],
+                                       collection_name="bench", persist_directory=directory)
+        update_sparse_index(directory, "bench", add=([str(i) for i in range(len(documents))], documents))
+        service = QueryService(db, llm=LLM().model(), embeddings=embeddings,
+                               max_concurrency=args.concurrency, use_cache=False)
+        elapsed, latencies = asyncio.run(run(args, service))
+
+    results = {
+        "sessions": args.sessions,
+        "llm": type(service.llm).__name__,
+        "queries": len(latencies),
+        "elapsed_s": elapsed,
+        "queries_per_s": len(latencies) / elapsed,
+        "p50_s": percentile(latencies, 50),
+        "p99_s": percentile(latencies, 99),
+        "embedding_batches": service.batcher.batches,
+        "mean_batch_size": service.batcher.queries / max(1, service.batcher.batches),
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+End-to-end ingestion and query benchmark on generated PDFs and HTML pages.
+PDFs go through Agents.RAG.document_RAG, HTML pages through Agents.URL.url_RAG
+(served from a local HTTP server), then queries run through the retriever and
+chat_with_bot. Embeddings and the LLM are the offline deterministic stand-ins,
+so numbers measure this code rather than a model. Each size runs in its own
+subprocess so peak RSS is not shared.
+
+    python benchmarks/end_to_end.py --sizes 50 200 1000 --output results.json
+    python benchmarks/end_to_end.py --sizes 50 200 1000 --compare results.json --threshold 0.1
+"""
+import argparse
+import functools
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BENCH_ENV = {
+    "WORDSMITH_EMBEDDING_BACKEND": "hash",
+    "WORDSMITH_LLM_BACKEND": "fake",
+    "WORDSMITH_LLM_RPM": "0",
+    "WORDSMITH_ANSWER_CACHE_SIZE": "0",
+    "NO_PROXY": "127.0.0.1,localhost",
+}
+# Metrics checked by --compare and whether a larger value is better.
+HIGHER_IS_BETTER = ("_per_s", "recall@")
+LOWER_IS_BETTER = ("_ms", "peak_rss_mb")
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(directory):
+    """Serves a directory on a free local port; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def latencies(samples):
+    from benchmarks.synthetic import percentile
+
+    return {f"p{q}_ms": percentile(samples, q) * 1000 for q in (50, 95, 99)}
+
+
+def run_queries(db, queries, relevant, k):
+    """Returns retrieval and chat latencies plus recall@k of the retriever."""
+    from Utilities.Tools import QueryEngine, chat_with_bot
+
+    engine = QueryEngine(db, k=k, token_budget=0)
+    retrieve_s, chat_s, found = [], [], 0
+    for query, target in queries:
+        started = time.perf_counter()
+        documents = engine.retriever.invoke(query)
+        retrieve_s.append(time.perf_counter() - started)
+        found += any(relevant(doc.metadata) == target for doc in documents[:k])
+        started = time.perf_counter()
+        chat_with_bot(query, [], db)
+        chat_s.append(time.perf_counter() - started)
+    return retrieve_s, chat_s, found
+
+
+def single_run(size, k, query_count, pages_per_file, seed=7):
+    from Agents.RAG import document_RAG, load_manifest, manifest_path
+    from Agents.URL import url_RAG
+    from benchmarks.synthetic import make_corpus, write_html, write_pdf
+
+    result = {"size": size}
+    with tempfile.TemporaryDirectory() as root:
+        pdf_dir, html_dir, chroma_dir = (os.path.join(root, name) for name in ("pdf", "html", "chroma"))
+        for directory in (pdf_dir, html_dir, chroma_dir):
+            os.makedirs(directory)
+
+        documents, pdf_queries = make_corpus(size, seed=seed)
+        for start in range(0, size, pages_per_file):
+            write_pdf(os.path.join(pdf_dir, f"doc-{start // pages_per_file:04d}.pdf"), documents[start:start + pages_per_file])
+        started = time.perf_counter()
+        pdf_db = document_RAG(pdf_dir, chroma_dir, "bench_pdf")
+        elapsed = time.perf_counter() - started
+        manifest = load_manifest(manifest_path(chroma_dir, "bench_pdf"))
+        chunks = sum(len(entry["ids"]) for entry in manifest["files"].values())
+        stored = len(pdf_db.get()["ids"])
+        files = -(-size // pages_per_file)
+        if len(manifest["files"]) != files or not chunks or stored != chunks:
+            raise RuntimeError(f"document_RAG ingested {len(manifest['files'])}/{files} files, {stored}/{chunks} chunks")
+        result.update(pdf_pages=size, pdf_chunks=chunks,
+                      pdf_pages_per_s=size / elapsed, pdf_chunks_per_s=chunks / elapsed)
+
+        html_size = max(1, size // 4)
+        html_documents, html_queries = make_corpus(html_size, seed=seed + 1)
+        for i, text in enumerate(html_documents):
+            write_html(os.path.join(html_dir, f"page-{i:04d}.html"), f"Page {i}", text)
+        server, base_url = serve(html_dir)
+        try:
+            urls = [f"{base_url}/page-{i:04d}.html" for i in range(html_size)]
+            started = time.perf_counter()
+            url_db = url_RAG(urls, chroma_dir, "bench_url")
+            elapsed = time.perf_counter() - started
+        finally:
+            server.shutdown()
+        if isinstance(url_db, str):
+            raise RuntimeError(f"url_RAG failed: {url_db}")
+        chunks = len(url_db.get()["ids"])
+        result.update(html_pages=html_size, html_chunks=chunks,
+                      html_pages_per_s=html_size / elapsed, html_chunks_per_s=chunks / elapsed)
+
+        rng = random.Random(seed)
+        pdf_sample = rng.sample(pdf_queries, min(query_count, len(pdf_queries)))
+        html_sample = rng.sample(html_queries, min(max(1, query_count // 4), len(html_queries)))
+        pdf_target = lambda meta: (os.path.basename(meta.get("source", "")), meta.get("page"))
+        retrieve_s, chat_s, found = run_queries(
+            pdf_db, [(q, (f"doc-{i // pages_per_file:04d}.pdf", i % pages_per_file)) for q, i in pdf_sample],
+            pdf_target, k
+        )
+        url_target = lambda meta: meta.get("source", "").rsplit("/", 1)[-1]
+        more_retrieve, more_chat, more_found = run_queries(
+            url_db, [(q, f"page-{i:04d}.html") for q, i in html_sample], url_target, k
+        )
+        total = len(pdf_sample) + len(html_sample)
+        result.update({f"retrieve_{key}": value for key, value in latencies(retrieve_s + more_retrieve).items()})
+        result.update({f"chat_{key}": value for key, value in latencies(chat_s + more_chat).items()})
+        result[f"recall@{k}"] = (found + more_found) / total
+        result["queries"] = total
+
+    peak = max(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+    result["peak_rss_mb"] = peak / 1024
+    return result
+
+
+def compare(results, baseline, threshold):
+    """Returns the metrics that got worse than the baseline by more than threshold."""
+    previous = {run["size"]: run for run in baseline.get("results", [])}
+    regressions = []
+    for run in results:
+        old = previous.get(run["size"])
+        if old is None:
+            continue
+        for metric, value in run.items():
+            base = old.get(metric)
+            if not isinstance(value, (int, float)) or not base:
+                continue
+            if any(tag in metric for tag in HIGHER_IS_BETTER):
+                change = (base - value) / base
+            elif any(metric.endswith(tag) for tag in LOWER_IS_BETTER):
+                change = (value - base) / base
+            else:
+                continue
+            if change > threshold:
+                regressions.append({"size": run["size"], "metric": metric, "baseline": base,
+                                    "current": value, "worse_by": round(change, 4)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end ingestion and query benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000], help="PDF pages per run")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--pages-per-file", type=int, default=25)
+    parser.add_argument("--backend", choices=["chroma", "ann"], default="chroma")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON from an earlier run to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative change counted as a regression (default 0.1 = 10%%)")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(single_run(args.single, args.k, args.queries, args.pages_per_file)))
+        return
+
+    env = dict(os.environ, **BENCH_ENV, WORDSMITH_VECTOR_BACKEND=args.backend)
+    results = []
+    for size in args.sizes:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--single", str(size), "--k", str(args.k),
+             "--queries", str(args.queries), "--pages-per-file", str(args.pages_per_file)],
+            capture_output=True, text=True, cwd=ROOT, env=env
+        )
+        if completed.returncode != 0:
+            print(f"size {size} failed:\n{completed.stderr}")
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(json.dumps(result))
+
+    report = {
+        "config": {"backend": args.backend, "k": args.k, "queries": args.queries,
+                   "pages_per_file": args.pages_per_file},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Recall@k and latency of dense, BM25 and hybrid (reciprocal-rank fusion) retrieval
+on the bundled synthetic corpus.
+
+    python benchmarks/hybrid_recall.py --size 2000 --k 3
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import HashEmbeddings, dense_search, make_corpus, percentile
+from Utilities.sparse_index import BM25Index, reciprocal_rank_fusion
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dense vs BM25 vs hybrid retrieval benchmark")
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--fetch-k", type=int, default=20)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    documents, queries = make_corpus(args.size)
+    embeddings = HashEmbeddings()
+    matrix = embeddings.embed_documents(documents)
+    index = BM25Index()
+    started = time.perf_counter()
+    index.add([str(i) for i in range(len(documents))], documents)
+    build_s = time.perf_counter() - started
+
+    methods = {
+        "dense": lambda q, v: dense_search(matrix, v, args.fetch_k),
+        "bm25": lambda q, v: [int(doc_id) for doc_id, _ in index.search(q, args.fetch_k)],
+    }
+    methods["hybrid"] = lambda q, v: reciprocal_rank_fusion([methods["dense"](q, v), methods["bm25"](q, v)])
+
+    results = {"size": args.size, "k": args.k, "bm25_build_s": build_s}
+    for name, search in methods.items():
+        hits, latencies = 0, []
+        for query, relevant in queries:
+            vector = embeddings.embed_query(query)
+            started = time.perf_counter()
+            ranked = search(query, vector)[:args.k]
+            latencies.append(time.perf_counter() - started)
+            hits += relevant in ranked
+        results[name] = {
+            f"recall@{args.k}": hits / len(queries),
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+        }
+        print(f"{name:<7} {results[name]}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Load test for Utilities.llm_gateway.LLMGateway in front of a FakeChatModel
+with injected latency and failures. Clients send prompts drawn from a small
+pool, so some are identical and in flight at the same time. Reports how many
+backend calls coalescing saved, latency percentiles, retries and rejections.
+
+    python benchmarks/llm_gateway.py --clients 64 --requests 500 --distinct 50 --rpm 6000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import percentile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM gateway load test")
+    parser.add_argument("--clients", type=int, default=64, help="Concurrent callers")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--distinct", type=int, default=50, help="Size of the prompt pool")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--fail-every", type=int, default=10, help="Every n-th backend call fails (0: never)")
+    parser.add_argument("--rpm", type=float, default=6000, help="Requests per minute allowed (0: unlimited)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--queue", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    from Utilities import metrics
+    from Utilities.fakes import FakeChatModel
+    from Utilities.llm_gateway import LLMGateway
+
+    metrics.enable()
+    backend = FakeChatModel(first_token_delay=args.llm_latency, fail_every=args.fail_every)
+    gateway = LLMGateway(backend=backend, requests_per_minute=args.rpm, burst=args.concurrency,
+                         max_concurrency=args.concurrency, max_queue=args.queue, timeout=args.timeout,
+                         backoff_base=0.05)
+    rng = random.Random(7)
+    prompts = [f"question {rng.randrange(args.distinct)}" for _ in range(args.requests)]
+    latencies, errors = [], {}
+
+    def call(prompt):
+        started = time.perf_counter()
+        try:
+            gateway.invoke(prompt)
+            latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        list(pool.map(call, prompts))
+    elapsed = time.perf_counter() - started
+
+    counters = metrics.registry.snapshot()["counters"]
+    results = {
+        "requests": args.requests,
+        "completed": len(latencies),
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "requests_per_s": len(latencies) / elapsed,
+        "p50_s": percentile(latencies, 50),
+        "p99_s": percentile(latencies, 99),
+        "backend_calls": counters.get("llm_calls", 0),
+        "coalesced": counters.get("llm_coalesced", 0),
+        "retries": counters.get("llm_retries", 0),
+        "rejected": counters.get("llm_rejected", 0),
+        "timeouts": counters.get("llm_timeout", 0),
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
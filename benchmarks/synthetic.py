@@ -0,0 +1,110 @@
+"""
+Deterministic synthetic corpus and embedding stand-in shared by the benchmarks,
+plus minimal PDF and HTML writers so ingestion can run on real files.
+"""
+import html
+import random
+import textwrap
+
+from Utilities.fakes import HashEmbeddings  # noqa: F401  (re-exported for the benchmarks)
+
+TOPICS = [
+    "pump", "valve", "turbine", "sensor", "gearbox", "compressor", "inverter", "bearing",
+    "controller", "actuator", "filter", "boiler", "conveyor", "spindle", "relay", "encoder",
+]
+FILLER = [
+    "the", "operator", "should", "before", "after", "maintenance", "procedure", "manual",
+    "safety", "check", "system", "unit", "routine", "service", "interval", "record",
+]
+SUFFIXES = ["ing", "ed", "s", "er"]
+
+
+def _pseudo_word(rng):
+    return "".join(rng.choice("bdfgklmnprstv") + rng.choice("aeiou") for _ in range(4))
+
+
+def make_corpus(size, seed=7):
+    """
+    Returns (documents, queries). Every document has a unique part number and
+    three unique descriptive terms. Half of the queries ask for the part number;
+    the other half use inflected forms of the descriptive terms, which exact
+    term matching misses. Each query knows its relevant doc index.
+    """
+    rng = random.Random(seed)
+    documents, queries = [], []
+    for i in range(size):
+        topic = TOPICS[i % len(TOPICS)]
+        part = f"PN-{rng.randint(10000, 99999)}-{chr(65 + i % 26)}"
+        terms = [_pseudo_word(rng) for _ in range(3)]
+        words = [rng.choice(FILLER) for _ in range(60)]
+        words[rng.randint(0, 59)] = " ".join(terms)
+        words[rng.randint(0, 59)] = f"part {part}"
+        documents.append(f"{topic} guide. " + " ".join(words) + ".")
+        if i % 2:
+            queries.append((f"which document covers {part}?", i))
+        else:
+            inflected = " ".join(term + rng.choice(SUFFIXES) for term in terms)
+            queries.append((f"how is the {topic} {inflected} done", i))
+    return documents, queries
+
+
+def _pdf_text(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages, width=90):
+    """
+    Writes a text-only PDF (Helvetica, one string per page) without any PDF
+    library. Output is byte-for-byte deterministic for the same pages.
+    """
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        lines = textwrap.wrap(text, width) or [""]
+        body = "BT /F1 10 Tf 12 TL 50 780 Td " + " T* ".join(f"({_pdf_text(line)}) Tj" for line in lines) + " ET"
+        stream = body.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        " ".join(f"{kid} 0 R" for kid in kids).encode(), len(kids)
+    )
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_html(path, title, text):
+    """Writes a small HTML page with boilerplate the fetcher has to strip."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            f"<html><head><title>{html.escape(title)}</title>"
+            "<style>body { font-family: sans-serif; }</style>"
+            "<script>var tracking = 'ignored';</script></head>"
+            f"<body><h1>{html.escape(title)}</h1><p>{html.escape(text)}</p></body></html>"
+        )
+
+
+def dense_search(matrix, query_vector, k):
+    """Brute-force inner-product search; returns document indexes."""
+    scores = [(sum(a * b for a, b in zip(row, query_vector)), i) for i, row in enumerate(matrix)]
+    scores.sort(reverse=True)
+    return [i for _, i in scores[:k]]
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
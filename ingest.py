@@ -0,0 +1,161 @@
+"""
+Offline bulk ingestion into a namespace's collections, outside the web app.
+Work is checkpointed after every batch; re-running the same command after a
+crash or Ctrl+C resumes from the last committed batch.
+
+    python ingest.py pdf path/to/pdfs --namespace docs
+    python ingest.py urls urls.txt --namespace docs
+    python ingest.py wiki enwiki-pages-articles.xml.bz2 --namespace docs --titles titles.txt
+
+The app can then serve the result read-only:
+
+    WORDSMITH_READ_ONLY=1 WORDSMITH_NAMESPACE=docs streamlit run App.py
+"""
+import argparse
+import json
+import os
+import sys
+from itertools import islice
+from tqdm import tqdm
+from Agents.RAG import PAGE_BATCH_SIZE, document_RAG, load_manifest, save_manifest
+from Agents.URL import EMBED_BATCH_SIZE, sync_urls
+from Agents.Wiki import iter_dump, sync_articles
+from Utilities.setup import CHROMA_PATH
+from Utilities.store import CorpusStore, DEFAULT_NAMESPACE
+from Utilities.Tools import chunker_version, resolve_backend, EMBEDDING_MODEL, open_vector_db
+
+PDF_COLLECTION = ("Document_Vector", "pdf")
+URL_COLLECTION = ("URL_Vector", "url")
+WIKI_COLLECTION = ("Wiki_Vector", "wiki")
+COLLECTIONS = {"pdf": PDF_COLLECTION, "urls": URL_COLLECTION, "wiki": WIKI_COLLECTION}
+
+
+def url_checkpoint_path(chroma_path, collection_name):
+    return os.path.join(chroma_path, f'{collection_name}.urls.json')
+
+
+def wiki_checkpoint_path(chroma_path, collection_name):
+    return os.path.join(chroma_path, f'{collection_name}.wiki.json')
+
+
+def read_list(path):
+    """One entry per line; blank lines and lines starting with # are ignored."""
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = (line.strip() for line in f)
+        return list(dict.fromkeys(line for line in lines if line and not line.startswith('#')))
+
+
+def ingest_pdfs(store, pdf_dir, workers, batch_size):
+    base, source_type = PDF_COLLECTION
+    with tqdm(unit="page", desc="PDF pages") as bar:
+        def progress(done, total):
+            bar.total = total
+            bar.n = done
+            bar.refresh()
+        result = document_RAG(pdf_dir, store.root, store.collection_name(base),
+                              max_workers=workers, batch_size=batch_size, progress=progress)
+    if isinstance(result, str):
+        print(result)
+        return
+    store.register(base, source_type)
+
+
+def ingest_urls(store, urls, workers, batch_size):
+    """
+    Fetches URLs concurrently and upserts their chunks in batches. A URL is
+    recorded in the checkpoint once its chunks are committed, so a resumed run
+    only fetches the rest.
+    """
+    base, source_type = URL_COLLECTION
+    collection_name = store.collection_name(base)
+    path = url_checkpoint_path(store.root, collection_name)
+    version = {"chunker": chunker_version(), "embedding": EMBEDDING_MODEL,
+               "backend": resolve_backend(store.root, collection_name)}
+    checkpoint = load_manifest(path)
+    if checkpoint.get("version") != version:
+        checkpoint = {"version": version, "urls": {}}
+    done = checkpoint.setdefault("urls", {})
+    pending = [url for url in urls if url not in done]
+    db = open_vector_db(store.root, collection_name)
+
+    with tqdm(total=len(urls), initial=len(urls) - len(pending), unit="url", desc="URLs") as bar:
+        def committed(batch_urls):
+            done.update({url: {"chunks": chunks} for url, chunks in batch_urls.items()})
+            save_manifest(path, checkpoint)
+            bar.update(len(batch_urls))
+        sync_urls(pending, db, max_workers=workers, batch_size=batch_size, on_commit=committed)
+    failed = len([url for url in pending if url not in done])
+    if failed:
+        print(f"{failed} URL(s) could not be fetched; re-run to retry them.")
+    store.register(base, source_type)
+
+
+def ingest_wiki(store, dump, titles, limit, batch_size):
+    """
+    Streams articles from a local Wikipedia dump and upserts them in batches.
+    The checkpoint counts the articles committed so far; a resumed run skips
+    that many articles of the same dump without embedding them again.
+    """
+    base, source_type = WIKI_COLLECTION
+    collection_name = store.collection_name(base)
+    path = wiki_checkpoint_path(store.root, collection_name)
+    version = {"chunker": chunker_version(), "embedding": EMBEDDING_MODEL,
+               "backend": resolve_backend(store.root, collection_name),
+               "dump": os.path.abspath(dump), "titles": sorted(titles) if titles else None, "limit": limit}
+    checkpoint = load_manifest(path)
+    if checkpoint.get("version") != version:
+        checkpoint = {"version": version, "articles": 0}
+    done = checkpoint["articles"]
+    db = open_vector_db(store.root, collection_name)
+
+    with tqdm(total=limit, initial=done, unit="article", desc="Wikipedia") as bar:
+        def committed(count):
+            checkpoint["articles"] = done + count
+            save_manifest(path, checkpoint)
+            bar.n = done + count
+            bar.refresh()
+        sync_articles(islice(iter_dump(dump, titles=titles, limit=limit), done, None), db,
+                      batch_size=batch_size, on_commit=committed)
+    store.register(base, source_type)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk ingestion with checkpoint/resume")
+    parser.add_argument("kind", choices=list(COLLECTIONS), help="What to ingest")
+    parser.add_argument("source", help="Directory of PDFs, a text file with one URL per line, "
+                                       "or a Wikipedia XML/JSONL dump (optionally .bz2/.gz)")
+    parser.add_argument("--namespace", default=os.getenv("WORDSMITH_NAMESPACE", DEFAULT_NAMESPACE))
+    parser.add_argument("--chroma-path", default=CHROMA_PATH)
+    parser.add_argument("--workers", type=int, default=None, help="PDF parser processes / URL fetch threads")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help=f"Pages (default {PAGE_BATCH_SIZE}) or chunks (default {EMBED_BATCH_SIZE}) per committed batch")
+    parser.add_argument("--titles", help="Wikipedia: only ingest the article titles listed in this file")
+    parser.add_argument("--limit", type=int, default=None, help="Wikipedia: stop after this many articles")
+    parser.add_argument("--restart", action="store_true", help="Drop the collection and its checkpoint first")
+    args = parser.parse_args()
+
+    store = CorpusStore(namespace=args.namespace, root=args.chroma_path)
+    base = COLLECTIONS[args.kind][0]
+    if args.restart:
+        store.drop(base)
+    try:
+        if args.kind == "pdf":
+            if not os.path.isdir(args.source):
+                parser.error(f"{args.source} is not a directory")
+            ingest_pdfs(store, args.source, args.workers, args.batch_size or PAGE_BATCH_SIZE)
+        elif args.kind == "urls":
+            ingest_urls(store, read_list(args.source), args.workers or 8, args.batch_size or EMBED_BATCH_SIZE)
+        else:
+            if not os.path.isfile(args.source):
+                parser.error(f"{args.source} is not a file")
+            titles = read_list(args.titles) if args.titles else None
+            ingest_wiki(store, args.source, titles, args.limit, args.batch_size or EMBED_BATCH_SIZE)
+    except KeyboardInterrupt:
+        print("\nInterrupted. Run the same command again to resume from the last committed batch.")
+        sys.exit(130)
+    print(json.dumps({"namespace": store.namespace, "collection": store.collection_name(base),
+                      "registry": store.collections().get(base)}))
+
+
+if __name__ == "__main__":
+    main()
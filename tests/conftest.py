@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Offline stand-ins for the Gemini chat model, the sentence-transformers encoder
+# and its tokenizer.
+os.environ.setdefault("WORDSMITH_LLM_BACKEND", "fake")
+os.environ.setdefault("WORDSMITH_EMBEDDING_BACKEND", "hash")
+os.environ.setdefault("WORDSMITH_WARMUP", "0")
+os.environ.setdefault("WORDSMITH_CHUNK_TOKENIZER", "chars")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
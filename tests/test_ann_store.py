@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from Utilities.ann_store import AnnVectorStore
+from Utilities.fakes import HashEmbeddings
+
+# HashEmbeddings ignores digits, so documents differ by their words.
+TOPICS = ["pump", "valve", "boiler", "turbine", "compressor", "gearbox",
+          "bearing", "filter", "heater", "sensor", "relay", "battery"]
+TEXTS = [f"{topic} maintenance manual: inspect the {topic} and replace a worn {topic}" for topic in TOPICS]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path)
+
+
+def open_store(path, **kwargs):
+    return AnnVectorStore("manuals", HashEmbeddings(), path, **kwargs)
+
+
+def test_add_and_search(path):
+    store = open_store(path)
+    ids = store.add_texts(TEXTS, metadatas=[{"n": i} for i in range(12)], ids=[f"d{i}" for i in range(12)])
+    assert ids == [f"d{i}" for i in range(12)]
+    assert len(store) == 12
+    top = store.similarity_search(TEXTS[7], k=3)
+    assert top[0].page_content == TEXTS[7]
+    assert top[0].metadata == {"n": 7}
+    assert [doc.metadata["n"] for doc in store.similarity_search(TEXTS[7], k=3, filter={"n": 3})] == [3]
+
+
+def test_upsert_replaces_by_id(path):
+    store = open_store(path)
+    store.add_texts(TEXTS[:3], ids=["a", "b", "c"])
+    store.add_texts(["replaced text"], ids=["b"])
+    assert len(store) == 3
+    assert store.get(ids=["b"])["documents"] == ["replaced text"]
+
+
+def test_delete_frees_slots_for_reuse(path):
+    store = open_store(path)
+    store.add_texts(TEXTS[:5], ids=[f"d{i}" for i in range(5)])
+    store.delete(["d1", "d3"])
+    assert sorted(store.get()["ids"]) == ["d0", "d2", "d4"]
+    assert all(doc.page_content not in (TEXTS[1], TEXTS[3]) for doc in store.similarity_search(TEXTS[1], k=5))
+    store.add_texts(TEXTS[5:7], ids=["d5", "d6"])
+    assert store.next_slot == 5
+    assert len(store) == 5
+
+
+def test_reopen_keeps_documents_and_index(path):
+    store = open_store(path, train_threshold=8)
+    store.add_texts(TEXTS, ids=[f"d{i}" for i in range(12)])
+    store.delete(["d0"])
+    assert store.centroids is not None
+    reopened = open_store(path, train_threshold=8, nprobe=100)
+    assert len(reopened) == 11
+    assert reopened.centroids is not None
+    assert reopened.similarity_search(TEXTS[4], k=1)[0].page_content == TEXTS[4]
+    assert not reopened.get(ids=["d0"])["ids"]
+
+
+def test_handles_on_one_collection_stay_consistent(path):
+    first, second = open_store(path), open_store(path)
+    first.add_texts(TEXTS[:5], ids=[f"a{i}" for i in range(5)])
+    second.add_texts(TEXTS[5:8], ids=[f"b{i}" for i in range(3)])
+    first.add_texts(TEXTS[8:9], ids=["a5"])
+    assert len(first) == len(second) == 9
+    assert len(second.get()["ids"]) == 9
+    query = np.asarray(HashEmbeddings().embed_query(TEXTS[0]))
+    assert len(first.search_slots(query, 20)) == len(second.search_slots(query, 20)) == 9
+
+
+def test_delete_collection(path):
+    store = open_store(path)
+    store.add_texts(TEXTS[:2])
+    store.delete_collection()
+    assert len(open_store(path)) == 0
@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+from langchain_core.documents import Document
+from Utilities.Tools import create_vector_db, corpus_version, lookup_cached_answer, store_answer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WRITER = """
+import sys
+from langchain_core.documents import Document
+from Utilities.Tools import open_vector_db, upsert_documents
+db = open_vector_db(sys.argv[1], "manuals")
+upsert_documents(db, [Document(page_content="the impeller is bronze")], ids=["new"])
+"""
+
+
+def test_write_from_another_process_misses_the_answer_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORDSMITH_VECTOR_BACKEND", "ann")
+    db = create_vector_db([Document(page_content="replace the pump seal yearly")], str(tmp_path), "manuals", ids=["old"])
+    query = "how often is the pump seal replaced?"
+    entry, vector, version = lookup_cached_answer(db, query)
+    assert entry is None
+    store_answer(db, query, vector, version, "yearly", [])
+    assert lookup_cached_answer(db, query)[0]["answer"] == "yearly"
+
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    subprocess.run([sys.executable, "-c", WRITER, str(tmp_path)], env=env, cwd=ROOT, check=True)
+
+    assert corpus_version(db) != version
+    assert lookup_cached_answer(db, query)[0] is None
@@ -0,0 +1,66 @@
+import pytest
+from langchain_core.documents import Document
+from Utilities import chunking
+from Utilities.chunking import Chunker, iter_chunks, line_offsets
+
+WORDS = ("chars", len)
+PARAGRAPH = "The pump seal is replaced every six months.\nCheck the impeller for wear."
+
+
+def assert_spans_match(text, chunks):
+    offsets = line_offsets(text)
+    for chunk in chunks:
+        start, end = chunk.metadata["char_start"], chunk.metadata["char_end"]
+        assert text[start:end] == chunk.page_content
+        assert text.count("\n", 0, start) + 1 == chunk.metadata["line_number"]
+        assert text.count("\n", 0, end - 1) + 1 == chunk.metadata["end_line_number"]
+        assert offsets[chunk.metadata["line_number"] - 1] <= start
+
+
+@pytest.mark.parametrize("strategy", ["recursive", "structure"])
+@pytest.mark.parametrize("separator", ["\n\n", "\n"])
+def test_repeated_paragraphs_get_their_own_offsets(strategy, separator):
+    text = separator.join([PARAGRAPH] * 6)
+    chunker = Chunker(strategy, chunk_tokens=160, chunk_overlap=80, length_function=WORDS)
+    chunks = list(iter_chunks(Document(page_content=text), metadata=True, chunker=chunker))
+    assert_spans_match(text, chunks)
+    starts = [chunk.metadata["char_start"] for chunk in chunks]
+    assert starts == sorted(set(starts))
+    assert chunks[-1].metadata["char_end"] == len(text)
+
+
+def test_overlapping_repeats_map_to_the_right_occurrence():
+    seal, pump = "Check the seal.", "Replace the pump."
+    text = "\n\n".join([seal, f"{seal}\n{pump}", f"{seal}\n{pump}", seal, pump,
+                         f"{seal}\n{pump}", pump, f"{seal}\n{pump}"])
+    chunker = Chunker(chunk_tokens=40, chunk_overlap=20, length_function=WORDS)
+    covered = set()
+    for start, piece, _ in chunker.split(text):
+        assert text[start:start + len(piece)] == piece
+        covered.update(range(start, start + len(piece)))
+    # Every word lands in some chunk: no span points back at an earlier repeat.
+    assert covered >= {i for i, char in enumerate(text) if not char.isspace()}
+
+
+def test_page_and_line_numbers_follow_the_source():
+    pages = [Document(page_content="intro\r\nsecond line\rthird line\n\n" + PARAGRAPH, metadata={"page": 4})]
+    chunker = Chunker(chunk_tokens=30, chunk_overlap=0, length_function=WORDS)
+    chunks = list(iter_chunks(pages, metadata=True, chunker=chunker))
+    assert {chunk.metadata["page_number"] for chunk in chunks} == {5}
+    offsets = line_offsets(pages[0].page_content)
+    seal = next(chunk for chunk in chunks if chunk.page_content.startswith("The pump seal"))
+    assert seal.metadata["line_number"] == 5
+    assert seal.metadata["char_start"] == offsets[4]
+    assert [chunk.metadata["chunk_id"] for chunk in chunks] == list(range(len(chunks)))
+
+
+def test_version_follows_the_configured_tokenizer(monkeypatch):
+    monkeypatch.setattr(chunking, "_length_function", None)
+    monkeypatch.setenv("WORDSMITH_CHUNK_TOKENIZER", "chars")
+    assert Chunker().version.startswith(f"recursive-{chunking.DEFAULT_CHUNK_TOKENS}-")
+    assert "-chars-" in Chunker().version
+    monkeypatch.setattr(chunking, "_length_function", None)
+    monkeypatch.setenv("WORDSMITH_CHUNK_TOKENIZER", "unknown")
+    with pytest.raises(ValueError):
+        chunking.get_length_function()
+    monkeypatch.setattr(chunking, "_length_function", None)
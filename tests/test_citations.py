@@ -0,0 +1,28 @@
+import bisect
+from langchain_core.documents import Document
+from Utilities.chunking import line_offsets
+from Utilities.Tools import create_chunks, create_vector_db, format_sources
+
+PAGES = [
+    "Pump manual\n\nThe pump seal is replaced every twelve months. Check the seal for leaks.\n"
+    "The impeller is made of bronze.\n\nSafety\nStop the pump before opening the casing.",
+    "Maintenance log\nThe bearings are greased every quarter.\nThe inlet filter is cleaned weekly. " * 6,
+]
+
+
+def test_cited_page_line_and_text_match_the_source(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORDSMITH_VECTOR_BACKEND", "ann")
+    pages = [Document(page_content=text, metadata={"source": "manual.pdf", "page": i}) for i, text in enumerate(PAGES)]
+    chunks = create_chunks(pages, metadata=True)
+    assert all("exact_words" not in chunk.metadata for chunk in chunks)
+    db = create_vector_db(chunks, str(tmp_path), "manuals", ids=[str(i) for i in range(len(chunks))])
+
+    documents = db.similarity_search("bearings greased inlet filter impeller", k=len(chunks))
+    assert len(documents) == len(chunks)
+    for doc, source in zip(documents, format_sources(documents)):
+        page_text = PAGES[source["page"] - 1]
+        start, end = doc.metadata["char_start"], doc.metadata["char_end"]
+        assert source["file"] == "manual.pdf"
+        assert source["text"] == page_text[start:end]
+        assert source["line"] == bisect.bisect_right(line_offsets(page_text), start)
+        assert source["text"].split("\n")[0] in page_text.split("\n")[source["line"] - 1]
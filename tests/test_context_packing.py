@@ -0,0 +1,38 @@
+from langchain_core.documents import Document
+from Utilities.context import count_tokens, pack_context
+from Utilities.Tools import QueryEngine, create_vector_db
+
+FACTS = [
+    "The pump seal is replaced every twelve months.",
+    "The impeller of the pump is made of bronze.",
+    "The pump motor draws four kilowatts at full load.",
+    "The pump casing is tested at sixteen bar.",
+    "The pump bearings are greased every quarter.",
+    "The pump inlet filter is cleaned weekly.",
+]
+
+
+def test_packing_fills_the_budget_beyond_k():
+    documents = [Document(page_content=fact, metadata={"source": f"{i}.pdf"}) for i, fact in enumerate(FACTS)]
+    packed = pack_context(documents, token_budget=768)
+    assert [doc.page_content for doc in packed] == FACTS
+    assert len(pack_context(documents, token_budget=768, max_chunks=3)) == 3
+
+
+def test_packing_stops_at_the_token_budget():
+    documents = [Document(page_content=" ".join([fact] * 20)) for fact in FACTS]
+    budget = count_tokens(documents[0].page_content) * 2 + 1
+    packed = pack_context(documents, token_budget=budget)
+    assert len(packed) == 2
+    assert sum(count_tokens(doc.page_content) for doc in packed) <= budget
+
+
+def test_query_engine_packs_more_relevant_context_than_k(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORDSMITH_VECTOR_BACKEND", "ann")
+    db = create_vector_db([Document(page_content=fact, metadata={"source": "pump.pdf", "page_number": i})
+                           for i, fact in enumerate(FACTS)], str(tmp_path), "pumps", ids=[str(i) for i in range(6)])
+    packed = QueryEngine(db, k=3, token_budget=768).retriever.invoke("pump")
+    unpacked = QueryEngine(db, k=3, token_budget=0).retriever.invoke("pump")
+    assert len(unpacked) == 3
+    assert {doc.page_content for doc in unpacked} < {doc.page_content for doc in packed} == set(FACTS)
+    assert sum(count_tokens(doc.page_content) for doc in packed) <= 768
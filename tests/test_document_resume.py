@@ -0,0 +1,73 @@
+import pytest
+import Agents.RAG as RAG
+from Agents.RAG import document_RAG, load_manifest, manifest_path
+from benchmarks.synthetic import write_pdf
+
+COLLECTION = "manuals"
+UPSERT = RAG.upsert_documents
+
+
+class Crash(Exception):
+    pass
+
+
+@pytest.fixture
+def pdf_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORDSMITH_VECTOR_BACKEND", "ann")
+    directory = tmp_path / "pdf"
+    directory.mkdir()
+    for name, topic in (("a.pdf", "pump"), ("b.pdf", "valve")):
+        write_pdf(str(directory / name), [f"{topic} manual page {page}: inspect the {topic} seals" for page in range(10)])
+    return str(directory)
+
+
+def count_upserts(monkeypatch, crash_after=None):
+    """Wraps the upsert used by document_RAG; returns the list of pages embedded per call."""
+    calls = []
+
+    def counting(db, documents, ids=None):
+        if crash_after is not None and len(calls) == crash_after:
+            raise Crash()
+        calls.append({doc.metadata["page"] for doc in documents})
+        return UPSERT(db, documents, ids=ids)
+
+    monkeypatch.setattr(RAG, "upsert_documents", counting)
+    return calls
+
+
+def ingest(pdf_dir, chroma_dir):
+    return document_RAG(pdf_dir, chroma_dir, COLLECTION, max_workers=1, batch_size=4)
+
+
+def test_crash_and_resume(pdf_dir, tmp_path, monkeypatch):
+    chroma_dir = str(tmp_path / "chroma")
+    count_upserts(monkeypatch, crash_after=3)
+    with pytest.raises(Crash):
+        ingest(pdf_dir, chroma_dir)
+
+    manifest = load_manifest(manifest_path(chroma_dir, COLLECTION))
+    assert list(manifest["files"]) == ["a.pdf"]
+    assert manifest["partial"]["b.pdf"]["next_page"] == 2
+
+    calls = count_upserts(monkeypatch)
+    db = ingest(pdf_dir, chroma_dir)
+    resumed_pages = sum(len(pages) for pages in calls)
+    assert resumed_pages == 8
+
+    manifest = load_manifest(manifest_path(chroma_dir, COLLECTION))
+    assert sorted(manifest["files"]) == ["a.pdf", "b.pdf"]
+    assert not manifest["partial"]
+
+    reference_calls = count_upserts(monkeypatch)
+    reference = ingest(pdf_dir, str(tmp_path / "reference"))
+    assert sum(len(pages) for pages in reference_calls) == 20
+    assert sorted(db.get()["ids"]) == sorted(reference.get()["ids"])
+
+
+def test_unchanged_files_are_not_embedded_again(pdf_dir, tmp_path, monkeypatch):
+    chroma_dir = str(tmp_path / "chroma")
+    ingest(pdf_dir, chroma_dir)
+    calls = count_upserts(monkeypatch)
+    db = ingest(pdf_dir, chroma_dir)
+    assert not calls
+    assert len(db.get()["ids"]) == len(set(db.get()["ids"]))
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+from Utilities.embedding_cache import EmbeddingCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WRITER = """
+import sys
+from Utilities.embedding_cache import EmbeddingCache
+cache = EmbeddingCache(sys.argv[1], max_bytes=400 * 16)
+for batch in range(20):
+    cache.put_many({f"{sys.argv[2]}-{batch}-{i}": [float(batch), float(i), 1.0, 0.0] for i in range(5)})
+"""
+
+
+def vector(i):
+    return [float(i), 0.0, 1.0, -1.0]
+
+
+def test_hits_and_misses(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_bytes=4 * 16)
+    assert cache.get_many(["a"]) == {}
+    cache.put_many({"a": vector(1), "b": vector(2)})
+    assert cache.get_many(["a", "b", "c"]) == {"a": vector(1), "b": vector(2)}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 2, 2)
+
+
+def test_least_recently_used_rows_are_evicted_at_capacity(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_bytes=4 * 16)
+    cache.put_many({key: vector(i) for i, key in enumerate("abcd")})
+    assert cache.capacity == 4
+    cache.get_many(["a"])
+    cache.put_many({"e": vector(5), "f": vector(6)})
+    found = cache.get_many(list("abcdef"))
+    assert set(found) == {"a", "d", "e", "f"}
+    assert found["e"] == vector(5) and found["a"] == vector(0)
+    assert cache.stats()["evictions"] == 2
+
+
+def test_vectors_survive_a_restart(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_bytes=4 * 16)
+    cache.put_many({"a": vector(1), "b": vector(2)})
+    cache._db.close()
+    reopened = EmbeddingCache(str(tmp_path), max_bytes=4 * 16)
+    assert reopened.get_many(["a", "b"]) == {"a": vector(1), "b": vector(2)}
+    reopened.put_many({"c": vector(3)})
+    assert reopened.get_many(["a", "b", "c"])["c"] == vector(3)
+
+
+def test_processes_sharing_a_cache_never_share_a_row(tmp_path):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    writers = [subprocess.Popen([sys.executable, "-c", WRITER, str(tmp_path), name], env=env, cwd=ROOT)
+               for name in ("w0", "w1", "w2")]
+    assert all(writer.wait() == 0 for writer in writers)
+    cache = EmbeddingCache(str(tmp_path), max_bytes=400 * 16)
+    keys = [f"w{w}-{batch}-{i}" for w in range(3) for batch in range(20) for i in range(5)]
+    found = cache.get_many(keys)
+    assert len(found) == 300
+    assert all(found[key][:2] == [float(key.split("-")[1]), float(key.split("-")[2])] for key in keys)
+    slots = cache._db.execute("SELECT slot FROM entries").fetchall()
+    assert len(set(slots)) == len(slots) == 300
@@ -0,0 +1,43 @@
+import pytest
+from langchain_core.documents import Document
+from Utilities.retrievers import FederatedRetriever
+from Utilities.Tools import create_vector_db, format_citation
+
+
+@pytest.fixture
+def members(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORDSMITH_VECTOR_BACKEND", "ann")
+    root = str(tmp_path)
+    pdf = create_vector_db(
+        [Document(page_content=f"pump manual page {i}: replace the pump seal and check the impeller",
+                  metadata={"source": "pump.pdf", "page_number": i}) for i in range(20)],
+        root, "pdfs", ids=[f"p{i}" for i in range(20)]
+    )
+    wiki = create_vector_db(
+        [Document(page_content="Valve actuators. The gate valve actuator with part number PN-40213-B is rated for 16 bar.",
+                  metadata={"source": "https://en.wikipedia.org/wiki/Valve", "section": "Actuators"}),
+         Document(page_content="Valve history. Valves were used by the Romans in aqueducts.",
+                  metadata={"source": "https://en.wikipedia.org/wiki/Valve", "section": "History"})],
+        root, "wikis", ids=["w0", "w1"]
+    )
+    return {"pdf": pdf, "wiki": wiki}
+
+
+def test_exact_identifier_outranks_other_collections(members):
+    results = FederatedRetriever(members=members, k=3).invoke("pump valve PN-40213-B")
+    assert results[0].metadata["section"] == "Actuators"
+    assert results[0].metadata["source_type"] == "wiki"
+
+
+def test_source_types_restrict_the_search(members):
+    results = FederatedRetriever(members=members, k=3, source_types=["pdf"]).invoke("PN-40213-B")
+    assert {doc.metadata["source_type"] for doc in results} == {"pdf"}
+
+
+def test_citations_use_section_or_page():
+    assert format_citation({"file": "https://w/Valve", "type": "wiki", "section": "Actuators",
+                            "page": "N/A", "line": "N/A"}) == "[wiki] https://w/Valve (Actuators)"
+    assert format_citation({"file": "pump.pdf", "type": "pdf", "section": "N/A",
+                            "page": 3, "line": 7}) == "[pdf] pump.pdf (Page 3, Line 7)"
+    assert format_citation({"file": "https://example.com", "type": "url", "section": "N/A",
+                            "page": "N/A", "line": "N/A"}) == "[url] https://example.com"
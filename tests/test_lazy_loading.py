@@ -0,0 +1,97 @@
+import os
+import subprocess
+import sys
+import threading
+import numpy as np
+from Utilities import embeddings
+from Utilities.embedding_cache import QueryVectorCache
+from Utilities.embeddings import EmbeddingEngine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("torch", "InstructorEmbedding", "sentence_transformers", "transformers", "chromadb",
+         "langchain_community", "langchain_google_genai")
+IMPORTS = """
+import sys
+import Utilities.Tools, Utilities.embeddings, Utilities.store, Utilities.query_service
+import Agents.RAG, Agents.URL, Agents.Wiki, Agents.chat_interface
+print(",".join(name for name in sys.argv[1:] if name in sys.modules))
+"""
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, pairs, **kwargs):
+        self.calls.append([text for _, text in pairs])
+        return np.array([[float(len(text)), 1.0] for _, text in pairs])
+
+
+def engine_with(client):
+    engine = object.__new__(EmbeddingEngine)
+    engine.model_name, engine.embed_instruction, engine.query_instruction = "model", "doc:", "query:"
+    engine.batch_size, engine.client, engine._encode_lock = 8, client, threading.Lock()
+    engine.cache, engine.query_cache, engine.warmed_up = None, QueryVectorCache(), False
+    return engine
+
+
+def test_importing_the_app_modules_loads_no_model_stack():
+    env = {key: value for key, value in os.environ.items() if not key.startswith("WORDSMITH_")}
+    env["PYTHONPATH"] = ROOT
+    result = subprocess.run([sys.executable, "-c", IMPORTS, *HEAVY], env=env, cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
+
+
+def test_warm_up_is_opt_out_and_runs_once(monkeypatch):
+    started = []
+
+    class Engine:
+        def warm_up(self):
+            started.append(threading.current_thread().name)
+
+    monkeypatch.setattr(embeddings, "EmbeddingEngine", Engine)
+    monkeypatch.setattr(embeddings, "_warm_up_started", False)
+    monkeypatch.setenv("WORDSMITH_WARMUP", "0")
+    embeddings.warm_up_in_background()
+    assert not embeddings._warm_up_started
+
+    monkeypatch.setenv("WORDSMITH_WARMUP", "1")
+    monkeypatch.delenv("WORDSMITH_EMBEDDING_BACKEND", raising=False)
+    embeddings.warm_up_in_background()
+    embeddings.warm_up_in_background()
+    for thread in threading.enumerate():
+        if thread.name == "embedding-warm-up":
+            thread.join(5)
+    assert started == ["embedding-warm-up"]
+
+
+def test_repeated_queries_skip_the_encoder():
+    client = FakeClient()
+    engine = engine_with(client)
+    first = engine.embed_query("How often is the pump seal replaced?")
+    assert engine.embed_query("  how often is the PUMP seal replaced? ") == first
+    assert engine.embed_queries(["How often is the pump seal replaced?", "What is the impeller made of?"])[0] == first
+    assert client.calls == [["How often is the pump seal replaced?"], ["What is the impeller made of?"]]
+    stats = engine.query_cache_stats()
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+
+
+def test_warm_up_bypasses_the_query_cache():
+    client = FakeClient()
+    engine = engine_with(client)
+    engine.warm_up()
+    engine.warm_up()
+    assert client.calls == [["warm-up document"], ["warm-up question?"]]
+    assert engine.query_cache_stats()["entries"] == 0
+
+
+def test_query_cache_is_bounded_by_bytes():
+    cache = QueryVectorCache(max_bytes=3 * 2 * 4)
+    for i in range(5):
+        cache.put(cache.key("query:", f"question {i}"), [float(i), 0.0], encode_seconds=0.1)
+    assert cache.get(cache.key("query:", "question 0")) is None
+    assert cache.get(cache.key("query:", "QUESTION 4")) == [4.0, 0.0]
+    stats = cache.stats()
+    assert (stats["entries"], stats["evictions"], stats["bytes_stored"]) == (3, 2, 24)
+    assert abs(stats["saved_seconds"] - 0.1) < 1e-9
@@ -0,0 +1,126 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from Utilities.fakes import FakeChatModel
+from Utilities.llm_gateway import GatewayOverloaded, GatewayTimeout, LLMGateway, is_retryable
+
+
+def gateway(backend, **kwargs):
+    kwargs.setdefault("requests_per_minute", 0)
+    kwargs.setdefault("backoff_base", 0.01)
+    return LLMGateway(backend=backend, **kwargs)
+
+
+def test_single_flight_coalesces_identical_prompts():
+    backend = FakeChatModel(first_token_delay=0.2)
+    llm = gateway(backend)
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        answers = list(pool.map(lambda _: llm.invoke("same question").content, range(10)))
+    assert backend._calls == 1
+    assert set(answers) == {"This is a fake answer generated offline."}
+    assert llm.stats() == {"waiting": 0, "running": 0, "in_flight_prompts": 0}
+
+
+def test_single_flight_async_and_streams():
+    backend = FakeChatModel(first_token_delay=0.1, token_delay=0.01)
+    llm = gateway(backend)
+
+    async def consume():
+        return "".join([chunk.content async for chunk in llm.astream("same question")])
+
+    async def main():
+        return await asyncio.gather(*[consume() for _ in range(5)])
+
+    assert set(asyncio.run(main())) == {"This is a fake answer generated offline."}
+    assert backend._calls == 1
+
+
+def test_distinct_prompts_are_not_coalesced():
+    backend = FakeChatModel()
+    llm = gateway(backend)
+    llm.invoke("first")
+    llm.invoke("second")
+    assert backend._calls == 2
+
+
+def test_transient_errors_are_retried():
+    backend = FakeChatModel(fail_every=2)
+    llm = gateway(backend)
+    assert [llm.invoke(f"q{i}").content for i in range(3)]
+    assert backend._calls == 5
+
+
+def test_retries_give_up_after_max_retries():
+    backend = FakeChatModel(fail_every=1)
+    with pytest.raises(ConnectionError):
+        gateway(backend, max_retries=2).invoke("q")
+    assert backend._calls == 3
+
+
+def test_is_retryable():
+    assert is_retryable(ConnectionError())
+    assert not is_retryable(ValueError())
+
+
+def test_async_retries():
+    backend = FakeChatModel(fail_every=2)
+    llm = gateway(backend)
+
+    async def main():
+        return await asyncio.gather(*[llm.ainvoke(f"q{i}") for i in range(3)])
+
+    assert len(asyncio.run(main())) == 3
+    assert backend._calls == 5
+
+
+def test_timeout_waiting_for_a_slot():
+    llm = gateway(FakeChatModel(first_token_delay=0.5), max_concurrency=1, timeout=0.2)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(llm.invoke, f"q{i}") for i in range(2)]
+        errors = [future.exception() for future in futures]
+    assert sum(isinstance(error, GatewayTimeout) for error in errors) == 1
+
+
+def test_async_timeout_waiting_for_a_slot():
+    llm = gateway(FakeChatModel(first_token_delay=0.5), max_concurrency=1, timeout=0.2)
+
+    async def main():
+        return await asyncio.gather(*[llm.ainvoke(f"q{i}") for i in range(3)], return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert sum(isinstance(result, GatewayTimeout) for result in results) == 2
+
+
+def test_rate_limit_timeout():
+    llm = gateway(FakeChatModel(), requests_per_minute=6, burst=1, timeout=0.2)
+    llm.invoke("first")
+    with pytest.raises(GatewayTimeout):
+        llm.invoke("second")
+
+
+def test_rate_limit_spaces_calls():
+    llm = gateway(FakeChatModel(), requests_per_minute=600, burst=2)
+    started = time.perf_counter()
+    for i in range(4):
+        llm.invoke(f"q{i}")
+    assert time.perf_counter() - started >= 0.15
+
+
+def test_full_queue_fails_fast():
+    llm = gateway(FakeChatModel(first_token_delay=0.3), max_concurrency=1, max_queue=1, timeout=5)
+
+    async def main():
+        return await asyncio.gather(*[llm.ainvoke(f"q{i}") for i in range(4)], return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert sum(isinstance(result, GatewayOverloaded) for result in results) == 2
+
+
+def test_abandoned_stream_releases_its_slot():
+    llm = gateway(FakeChatModel(token_delay=0.01), max_concurrency=1, timeout=1)
+    stream = llm.stream("abandoned")
+    next(stream)
+    stream.close()
+    assert llm.stats() == {"waiting": 0, "running": 0, "in_flight_prompts": 0}
+    assert llm.invoke("next").content
@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import Agents.RAG as RAG
+from Agents.RAG import document_RAG, iter_pdf_pages
+from benchmarks.synthetic import write_pdf
+
+READER = RAG.PdfReader
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """Runs page workers in threads and records every PDF that gets parsed."""
+    paths = []
+
+    def reader(path, *args, **kwargs):
+        paths.append(path)
+        return READER(path, *args, **kwargs)
+
+    monkeypatch.setattr(RAG, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(RAG, "PdfReader", reader)
+    return paths
+
+
+@pytest.fixture
+def pdfs(tmp_path):
+    paths = []
+    for name, pages in (("a.pdf", 10), ("b.pdf", 3), ("c.pdf", 7)):
+        paths.append(str(tmp_path / name))
+        write_pdf(paths[-1], [f"{name} page {page}" for page in range(pages)])
+    return paths
+
+
+def test_pages_arrive_in_order_with_one_parse_per_range(pdfs, opened):
+    counts = {}
+    pages = list(iter_pdf_pages(pdfs, max_workers=2, pages_per_task=4,
+                                on_count=lambda path, count: counts.setdefault(path, count)))
+    assert [(doc.metadata["source"], doc.metadata["page"]) for doc in pages] == \
+        [(path, page) for path, count in zip(pdfs, (10, 3, 7)) for page in range(count)]
+    assert all(f"page {doc.metadata['page']}" in doc.page_content for doc in pages)
+    assert counts == dict(zip(pdfs, (10, 3, 7)))
+    assert sorted(opened) == sorted([pdfs[0]] * 3 + [pdfs[1]] + [pdfs[2]] * 2)
+
+
+def test_resumed_and_unreadable_files(pdfs, opened, tmp_path):
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+    pages = list(iter_pdf_pages([str(broken)] + pdfs, max_workers=1, start_pages={pdfs[0]: 8, pdfs[1]: 3}))
+    assert [(doc.metadata["source"], doc.metadata["page"]) for doc in pages] == \
+        [(pdfs[0], 8), (pdfs[0], 9)] + [(pdfs[2], page) for page in range(7)]
+
+
+def test_ingestion_counts_pages_without_parsing_twice(pdfs, opened, tmp_path, monkeypatch):
+    monkeypatch.setenv("WORDSMITH_VECTOR_BACKEND", "ann")
+    reports = []
+    document_RAG(str(tmp_path), str(tmp_path / "chroma"), "manuals", max_workers=2,
+                 progress=lambda done, total: reports.append((done, total)))
+    assert sorted(opened) == sorted(pdfs)
+    assert reports[-1] == (20, 20)
+    assert all(done <= total for done, total in reports)
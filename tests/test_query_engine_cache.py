@@ -0,0 +1,34 @@
+import pytest
+from langchain_core.documents import Document
+from Utilities.store import CorpusStore
+from Utilities.Tools import chat_with_bot, create_vector_db, get_query_engine, open_vector_db
+
+BASE = "Document_Vector"
+
+
+@pytest.fixture(params=["chroma", "ann"])
+def store(request, tmp_path, monkeypatch):
+    monkeypatch.setenv("WORDSMITH_VECTOR_BACKEND", request.param)
+    return CorpusStore("test", root=str(tmp_path / "chroma"), pdf_root=str(tmp_path / "pdf"))
+
+
+def ingest(store, text):
+    db = create_vector_db([Document(page_content=text, metadata={"source": "manual.pdf"})],
+                          store.root, store.collection_name(BASE))
+    store.register(BASE, "pdf")
+    return db
+
+
+def test_reopened_collection_reuses_its_engine(store):
+    db = ingest(store, "pumps need new seals every year")
+    assert get_query_engine(open_vector_db(store.root, store.collection_name(BASE))) is get_query_engine(db)
+
+
+def test_drop_and_reingest_then_query(store):
+    db = ingest(store, "pumps need new seals every year")
+    assert not chat_with_bot("pump seals", [], db)[0].startswith("Error")
+    store.drop_all()
+    db = ingest(store, "valves need new seats every year")
+    answer, _ = chat_with_bot("valve seats", [], db)
+    assert not answer.startswith("Error"), answer
+    assert get_query_engine(db).retriever.invoke("valve seats")[0].page_content.startswith("valves")
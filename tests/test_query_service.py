@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage
+from Utilities.fakes import HashEmbeddings
+from Utilities.query_service import QueryService, ServiceOverloaded
+from Utilities.Tools import create_vector_db
+
+
+class EchoLLM:
+    """Answers with the question it was asked, after a delay."""
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.started = []
+
+    async def ainvoke(self, prompt):
+        question = prompt.to_string().split("Question:")[-1].split("\n")[0].strip()
+        self.started.append(question)
+        await asyncio.sleep(self.delay)
+        return AIMessage(content=f"answer to {question}")
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORDSMITH_VECTOR_BACKEND", "ann")
+    return create_vector_db([Document(page_content=f"pump manual page about topic {word}")
+                             for word in ("seal", "impeller", "bearing", "casing")],
+                            str(tmp_path), "manuals", ids=["0", "1", "2", "3"])
+
+
+def service(db, **kwargs):
+    kwargs.setdefault("llm", EchoLLM())
+    return QueryService(db, embeddings=HashEmbeddings(), use_cache=False, **kwargs)
+
+
+def test_concurrent_queries_share_embedding_batches_and_get_their_own_answers(db):
+    svc = service(db)
+    questions = [f"what about the pump part number {chr(97 + i)}{chr(97 + i)}?" for i in range(20)]
+
+    async def run():
+        return await asyncio.gather(*(svc.ask(f"session-{i}", q) for i, q in enumerate(questions)))
+
+    answers = asyncio.run(run())
+    assert [answer["answer"] for answer in answers] == [f"answer to {q}" for q in questions]
+    assert all(answer["sources"] for answer in answers)
+    assert svc.batcher.queries == 20
+    assert svc.batcher.batches < 5
+
+
+def test_queries_of_one_session_run_in_order(db):
+    llm = EchoLLM()
+    svc = service(db, llm=llm)
+    questions = [f"question {word}" for word in ("one", "two", "three", "four")]
+
+    async def run():
+        return await asyncio.gather(*(svc.ask("same", q) for q in questions))
+
+    answers = asyncio.run(run())
+    assert llm.started == questions
+    assert [answer["answer"] for answer in answers] == [f"answer to {q}" for q in questions]
+
+
+def test_full_queue_rejects_new_queries_until_it_drains(db):
+    svc = service(db, llm=EchoLLM(delay=0.2), max_pending=2)
+
+    async def run():
+        first = [asyncio.ensure_future(svc.ask(f"s{i}", f"question {i}")) for i in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(ServiceOverloaded):
+            await svc.ask("s2", "question 2")
+        done = await asyncio.gather(*first)
+        again = await svc.ask("s2", "question 2")
+        return done, again
+
+    done, again = asyncio.run(run())
+    assert [answer["answer"] for answer in done] == ["answer to question 0", "answer to question 1"]
+    assert again["answer"] == "answer to question 2"
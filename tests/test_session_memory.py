@@ -0,0 +1,98 @@
+import threading
+import time
+from Utilities.session_memory import SessionMemoryStore
+
+
+class Summarizer:
+    """Stands in for the chat model: returns a fixed summary, optionally after a wait."""
+
+    def __init__(self, release=None, fail=False):
+        self.release = release
+        self.fail = fail
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        if self.release is not None:
+            self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        return "the user asked about pump seals"
+
+
+def words(text):
+    return len(text.split())
+
+
+def memory(llm, **kwargs):
+    kwargs.setdefault("max_token_limit", 20)
+    return SessionMemoryStore(llm_factory=lambda: llm, tokenizer=words, **kwargs)
+
+
+def wait_for_summary(store, session_id="s"):
+    store._executor.submit(lambda: None).result(5)
+    while store._session(session_id).summarizing:
+        time.sleep(0.01)
+
+
+def test_short_conversations_are_kept_verbatim():
+    llm = Summarizer()
+    store = memory(llm)
+    store.add_turn("s", "how often is the seal replaced", "every year")
+    assert store.history("s") == "Human: how often is the seal replaced\nAI: every year"
+    assert llm.prompts == []
+
+
+def test_oldest_messages_are_folded_into_a_summary():
+    llm = Summarizer()
+    store = memory(llm)
+    for i in range(3):
+        store.add_turn("s", f"question {i} about the pump seal", f"answer {i} about the seal")
+    wait_for_summary(store)
+    history = store.history("s")
+    assert history.startswith("Summary of earlier conversation: the user asked about pump seals")
+    assert "question 0" not in history and "answer 2 about the seal" in history
+    assert "question 0" in llm.prompts[0]
+    assert words("\n".join(text for _, text in store._session("s").messages)) <= 10
+    assert store.stats()["summaries_run"] == 1
+
+
+def test_replies_do_not_wait_for_summarization():
+    release = threading.Event()
+    store = memory(Summarizer(release=release))
+    for i in range(3):
+        store.add_turn("s", f"question {i} about the pump seal", f"answer {i} about the seal")
+    started = time.perf_counter()
+    store.add_turn("s", "one more question", "one more answer")
+    history = store.history("s")
+    assert time.perf_counter() - started < 0.5
+    assert "question 0" in history
+    assert store.stats()["summaries_behind"] == 1
+    release.set()
+    wait_for_summary(store)
+    assert "one more answer" in store.history("s")
+    assert "question 0" not in store.history("s")
+
+
+def test_failed_summaries_keep_the_messages():
+    store = memory(Summarizer(fail=True))
+    for i in range(3):
+        store.add_turn("s", f"question {i} about the pump seal", f"answer {i} about the seal")
+    wait_for_summary(store)
+    assert "question 0" in store.history("s")
+    assert store.stats()["summaries_failed"] == 1
+    assert not store._session("s").summarizing
+
+
+def test_idle_and_least_recently_used_sessions_are_evicted(monkeypatch):
+    store = memory(Summarizer(), max_sessions=2, idle_ttl=60)
+    store.add_turn("a", "hello", "hi")
+    store.add_turn("b", "hello", "hi")
+    store.history("a")
+    store.add_turn("c", "hello", "hi")
+    assert list(store._sessions) == ["a", "c"]
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    store.history("c")
+    assert list(store._sessions) == ["c"] and store.history("c") == ""
+    assert store.stats()["evictions"] == 3
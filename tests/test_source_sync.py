@@ -0,0 +1,56 @@
+import pytest
+from langchain_core.documents import Document
+from Utilities import Tools
+from Utilities.Tools import open_vector_db, source_chunk_ids, source_vector_ids, sync_sources
+
+SOURCE = "https://example.org/pump"
+DELETE = Tools.delete_documents
+
+
+def page(paragraphs):
+    text = "\n\n".join(f"Paragraph {word}: " + " ".join([word] * 60) for word in paragraphs)
+    return [Document(page_content=text, metadata={"source": SOURCE})]
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORDSMITH_VECTOR_BACKEND", "ann")
+    return open_vector_db(str(tmp_path), "pages")
+
+
+def test_resync_keeps_new_chunks_and_drops_only_the_rest(db, monkeypatch):
+    committed = []
+    sync_sources([page(["alpha", "beta", "gamma", "delta"])], db, on_commit=committed.append)
+    old = set(source_vector_ids(db, SOURCE))
+    assert committed == [{SOURCE: len(old)}] and len(old) > 2
+
+    new_page = page(["epsilon"])
+    new = set(source_chunk_ids(SOURCE, len(Tools.create_chunks(new_page))))
+    assert len(new) < len(old)
+    deleted = []
+
+    def delete_after_upsert(db, ids):
+        # Every new chunk is already stored when the old ones are removed.
+        assert new <= set(source_vector_ids(db, SOURCE))
+        deleted.extend(ids)
+        DELETE(db, ids)
+
+    monkeypatch.setattr(Tools, "delete_documents", delete_after_upsert)
+    sync_sources([new_page], db)
+    assert set(source_vector_ids(db, SOURCE)) == new
+    assert set(deleted) == old - new
+    texts = " ".join(doc.page_content for doc in db.similarity_search("epsilon", k=10))
+    assert "epsilon" in texts and "alpha" not in texts
+
+
+def test_failed_upsert_leaves_the_old_chunks(db, monkeypatch):
+    sync_sources([page(["alpha", "beta", "gamma"])], db)
+    old = set(source_vector_ids(db, SOURCE))
+
+    def failing_upsert(db, documents, ids=None):
+        raise RuntimeError("embedding backend down")
+
+    monkeypatch.setattr(Tools, "upsert_documents", failing_upsert)
+    with pytest.raises(RuntimeError):
+        sync_sources([page(["delta"])], db)
+    assert set(source_vector_ids(db, SOURCE)) == old
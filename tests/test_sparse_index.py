@@ -0,0 +1,106 @@
+import os
+import subprocess
+import sys
+from Utilities import sparse_index
+from Utilities.sparse_index import BM25Index, log_path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WRITER = """
+import sys
+from Utilities.sparse_index import BM25Index
+BM25Index.open(sys.argv[1]).update(add=(["other"], ["valve actuator PN-40213-B from another process"]), remove=["a"])
+"""
+
+DOCS = {
+    "a": "replace the pump seal every year",
+    "b": "the impeller is bronze",
+    "c": "error ERR-404 means the pump seal leaks",
+}
+
+
+def ids(results):
+    return [doc_id for doc_id, _ in results]
+
+
+def filled(index):
+    index.update(add=(list(DOCS), list(DOCS.values())))
+    return index
+
+
+def test_removed_documents_are_tombstoned_until_compaction():
+    index = filled(BM25Index())
+    index.remove(["a"])
+    assert ids(index.search("pump seal")) == ["c"]
+    assert len(index) == 2 and len(index.doc_ids) == 3
+    assert index.doc_ids[0] is None
+    index.compact()
+    assert index.doc_ids == ["b", "c"]
+    assert ids(index.search("pump seal")) == ["c"]
+    assert ids(index.search("bronze")) == ["b"]
+
+
+def test_compaction_runs_once_tombstones_outnumber_live_documents():
+    index = BM25Index()
+    index.add([str(i) for i in range(3000)], ["pump seal"] * 3000)
+    index.remove([str(i) for i in range(2100)])
+    assert len(index.doc_ids) == len(index) == 900
+    assert sorted(ids(index.search("seal", k=2000)), key=int) == [str(i) for i in range(2100, 3000)]
+
+
+def test_identifiers_match_whole_and_by_parts():
+    index = filled(BM25Index())
+    assert ids(index.search("ERR-404"))[0] == "c"
+    assert ids(index.search("404")) == ["c"]
+
+
+def test_updates_replay_from_snapshot_and_change_log(tmp_path):
+    path = str(tmp_path / "docs.bm25")
+    index = filled(BM25Index.open(path))
+    assert not os.path.exists(path) and os.path.exists(log_path(path))
+    index.save(path)
+    assert not os.path.exists(log_path(path))
+    index.update(add=(["d"], ["a new pump casing"]), remove=["b"])
+    assert os.path.exists(log_path(path))
+
+    reopened = BM25Index.open(path)
+    assert sorted(reopened.lookup) == ["a", "c", "d"]
+    assert ids(reopened.search("casing")) == ["d"]
+    assert reopened.search("pump seal") == index.search("pump seal")
+
+
+def test_log_is_folded_into_a_snapshot_once_it_grows(tmp_path, monkeypatch):
+    monkeypatch.setattr(sparse_index, "LOG_COMPACT_BYTES", 512)
+    path = str(tmp_path / "docs.bm25")
+    index = BM25Index.open(path)
+    for i in range(40):
+        index.update(add=([f"doc{i}"], [f"pump part {i} with seal number {i}"]))
+    assert os.path.exists(path)
+    assert not os.path.exists(log_path(path)) or os.path.getsize(log_path(path)) <= max(512, os.path.getsize(path))
+    assert len(BM25Index.open(path)) == 40
+
+
+def test_restart_in_the_middle_of_a_log_record(tmp_path):
+    path = str(tmp_path / "docs.bm25")
+    filled(BM25Index.open(path)).update(add=(["d"], ["a new pump casing " * 50]))
+    with open(log_path(path), "r+b") as f:
+        f.truncate(os.path.getsize(log_path(path)) - 40)
+
+    reopened = BM25Index.open(path)
+    assert sorted(reopened.lookup) == ["a", "b", "c"]
+    for name in ("e", "f"):
+        reopened.update(add=([name], [f"bronze bearing cage {name}"]))
+    restarted = BM25Index.open(path)
+    assert sorted(restarted.lookup) == ["a", "b", "c", "e", "f"]
+    assert ids(restarted.search("bronze bearing cage f"))[0] == "f"
+
+
+def test_open_index_picks_up_another_process_writes(tmp_path):
+    path = str(tmp_path / "docs.bm25")
+    index = filled(BM25Index.open(path))
+    assert index.search("PN-40213-B") == []
+
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    subprocess.run([sys.executable, "-c", WRITER, path], env=env, cwd=ROOT, check=True)
+
+    assert ids(index.search("PN-40213-B")) == ["other"]
+    assert "a" not in index.lookup and len(index) == 3
@@ -0,0 +1,83 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from Agents.URL import URLFetcher
+
+PAGE = b"""<html><head><title> Widget Guide </title><style>p {color: red}</style></head>
+<body><script>var hidden = 1;</script><p>Widgets
+are   assembled in   three steps.</p></body></html>"""
+
+
+class Handler(BaseHTTPRequestHandler):
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with Handler.lock:
+            Handler.active += 1
+            Handler.peak = max(Handler.peak, Handler.active)
+        try:
+            if self.path.startswith("/slow"):
+                time.sleep(0.2)
+            if self.path.startswith("/hang"):
+                time.sleep(1)
+            if self.path.startswith("/missing"):
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(PAGE)))
+            self.end_headers()
+            self.wfile.write(PAGE)
+        finally:
+            with Handler.lock:
+                Handler.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients that gave up (timeouts) leave broken pipes behind.
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = QuietServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    Handler.active = Handler.peak = 0
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_cleans_page(server):
+    doc = URLFetcher().fetch(f"{server}/guide")
+    assert doc.page_content == "Widget Guide Widgets are assembled in three steps."
+    assert doc.metadata == {"source": f"{server}/guide", "title": "Widget Guide", "source_type": "url"}
+
+
+def test_fetch_failure_returns_none(server):
+    assert URLFetcher().fetch(f"{server}/missing") is None
+
+
+def test_fetch_timeout_returns_none(server):
+    started = time.perf_counter()
+    assert URLFetcher(timeout=0.3).fetch(f"{server}/hang") is None
+    assert time.perf_counter() - started < 0.9
+
+
+def test_fetch_all_skips_failures(server):
+    urls = [f"{server}/page{i}" for i in range(5)] + [f"{server}/missing"]
+    docs = list(URLFetcher(max_workers=4).fetch_all(urls))
+    assert sorted(doc.metadata["source"] for doc in docs) == sorted(urls[:5])
+
+
+def test_per_host_limit(server):
+    urls = [f"{server}/slow{i}" for i in range(6)]
+    list(URLFetcher(max_workers=6, per_host=2).fetch_all(urls))
+    assert Handler.peak == 2
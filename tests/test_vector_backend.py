@@ -0,0 +1,21 @@
+from Agents.RAG import document_RAG, load_manifest, manifest_path
+from Utilities.Tools import resolve_backend
+from benchmarks.synthetic import write_pdf
+
+COLLECTION = "manuals"
+
+
+def test_existing_collection_keeps_its_backend(tmp_path, monkeypatch):
+    pdf_dir, chroma_dir = tmp_path / "pdf", str(tmp_path / "chroma")
+    pdf_dir.mkdir()
+    write_pdf(str(pdf_dir / "a.pdf"), [f"pump manual page {page}: inspect the pump seals" for page in range(3)])
+    monkeypatch.setenv("WORDSMITH_VECTOR_BACKEND", "chroma")
+    ids = document_RAG(str(pdf_dir), chroma_dir, COLLECTION, max_workers=1).get()["ids"]
+    assert ids
+
+    monkeypatch.setenv("WORDSMITH_VECTOR_BACKEND", "ann")
+    assert resolve_backend(chroma_dir, COLLECTION) == "chroma"
+    assert resolve_backend(chroma_dir, "new_collection") == "ann"
+    db = document_RAG(str(pdf_dir), chroma_dir, COLLECTION, max_workers=1)
+    assert sorted(db.get()["ids"]) == sorted(ids)
+    assert load_manifest(manifest_path(chroma_dir, COLLECTION))["version"]["backend"] == "chroma"
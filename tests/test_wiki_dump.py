@@ -0,0 +1,87 @@
+import bz2
+import json
+import pytest
+from xml.sax.saxutils import escape
+from Agents.Wiki import clean_wikitext, iter_dump
+
+PUMP_WIKITEXT = """A '''centrifugal pump''' moves [[fluid|fluids]] by rotation.<ref name="a">Smith, p. 4</ref>
+{{Infobox machine|name={{PAGENAME}}}}
+== History ==
+First built in 1475.<ref>Jones 1999</ref>
+=== Early designs ===
+Early pumps used a [[bronze]] impeller.<!-- citation needed -->
+== Parts ==
+The seal keeps water in.<ref group="note"/> [[File:Pump.png|thumb|A pump]]
+[[Category:Pumps]]"""
+
+
+def page(title, namespace, text, redirect=None):
+    redirect = f'<redirect title="{redirect}" />' if redirect else ""
+    return (f"<page><title>{escape(title)}</title><ns>{namespace}</ns>{redirect}"
+            f'<revision><text xml:space="preserve">{escape(text)}</text></revision></page>')
+
+
+# Wikitext is XML-escaped in real exports, so <ref> tags arrive as text.
+XML_DUMP = "\n".join([
+    '<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/" version="0.10">',
+    page("Centrifugal pump", 0, PUMP_WIKITEXT),
+    page("Centrifugal pumps", 0, "#REDIRECT [[Centrifugal pump]]", redirect="Centrifugal pump"),
+    page("Talk:Centrifugal pump", 1, "== Sources ==\nNeeds more sources."),
+    page("Valve", 0, "A valve regulates flow."),
+    "</mediawiki>",
+])
+
+JSONL_RECORDS = [
+    {"title": "Gate valve", "text": "A gate valve opens by lifting a gate.\n\n== Actuators ==\nPart PN-40213-B.",
+     "url": "https://example.org/Gate_valve"},
+    {"title": "Empty", "text": ""},
+    {"title": "Ball valve", "text": "A ball valve uses a rotating ball."},
+]
+
+
+@pytest.fixture(params=["xml", "xml.bz2"])
+def xml_dump(tmp_path, request):
+    path = tmp_path / f"dump.{request.param}"
+    data = XML_DUMP.encode("utf-8")
+    path.write_bytes(bz2.compress(data) if request.param.endswith(".bz2") else data)
+    return str(path)
+
+
+def sections_by_title(dump, **kwargs):
+    return {sections[0].metadata["title"]: sections for sections in iter_dump(dump, **kwargs)}
+
+
+def test_xml_dump_skips_redirects_and_other_namespaces(xml_dump):
+    assert list(sections_by_title(xml_dump)) == ["Centrifugal pump", "Valve"]
+
+
+def test_xml_dump_keeps_nested_sections_without_markup(xml_dump):
+    sections = sections_by_title(xml_dump)["Centrifugal pump"]
+    assert [doc.metadata["section"] for doc in sections] == ["Introduction", "History", "History > Early designs", "Parts"]
+    assert sections[0].page_content == "# Centrifugal pump\n\nA centrifugal pump moves fluids by rotation."
+    assert sections[2].page_content == "## Centrifugal pump: History > Early designs\n\nEarly pumps used a bronze impeller."
+    text = "\n".join(doc.page_content for doc in sections)
+    for markup in ("<ref", "Smith", "Jones", "{{", "[[", "Category", "Pump.png", "citation needed"):
+        assert markup not in text
+    assert {doc.metadata["source"] for doc in sections} == {"https://en.wikipedia.org/wiki/Centrifugal_pump"}
+
+
+def test_titles_and_limit_restrict_the_dump(xml_dump):
+    assert list(sections_by_title(xml_dump, titles=["valve"])) == ["Valve"]
+    assert list(sections_by_title(xml_dump, limit=1)) == ["Centrifugal pump"]
+
+
+def test_jsonl_dump(tmp_path):
+    path = tmp_path / "dump.jsonl"
+    path.write_text("\n".join(json.dumps(record) for record in JSONL_RECORDS) + "\n\n")
+    articles = sections_by_title(str(path))
+    assert list(articles) == ["Gate valve", "Ball valve"]
+    gate = articles["Gate valve"]
+    assert [doc.metadata["section"] for doc in gate] == ["Introduction", "Actuators"]
+    assert {doc.metadata["source"] for doc in gate} == {"https://example.org/Gate_valve"}
+    assert articles["Ball valve"][0].metadata["source"] == "https://en.wikipedia.org/wiki/Ball_valve"
+
+
+def test_self_closing_and_grouped_references_are_stripped():
+    text = 'Seals leak.<ref name="x"/> Pumps wear.<ref group="n">note</ref> Done.'
+    assert clean_wikitext(text) == "Seals leak. Pumps wear. Done."